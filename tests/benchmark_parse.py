@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+"""
+Parse throughput benchmarks over synthetic TraceX buffers.
+Run from the repository root, with tracex_parser installed (poetry run) or on the path:
+    poetry run python tests/benchmark_parse.py --events 1e3 1e5 1e6
+    PYTHONPATH=. python3 tests/benchmark_parse.py --events 1e3 1e5 1e6
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from trx_writer import build_trx, default_event_ids, write_trx
+
+from tracex_parser.events import EventDecoder, EventFilter, tracex_event_factory
+from tracex_parser.stats import get_tracex_stats
+from tracex_parser.file_parser import get_endian_str, get_control_header, get_object_registry, parse_tracex_buffer, \
+    _get_tracex_header, _iter_event_entry_values
+
+try:
+    from tracex_parser.table import parse_tracex_table, np
+except ImportError:
+    np = None
+
+parser = argparse.ArgumentParser(description="""
+Benchmark each stage of parsing synthetic TraceX buffers""")
+parser.add_argument('--events', nargs='+', default=['1e3', '1e4', '1e5'],
+                    help='Number of events in each benchmarked buffer, e.g. 1e3 1e6 1e7')
+parser.add_argument('--endian', choices=['<', '>', 'both'], default='<', help='Byte order of the buffers')
+parser.add_argument('--wrap', type=float, default=0.5,
+                    help='Position of the oldest event in the circular buffer, as a fraction of the buffer size')
+parser.add_argument('--custom-ids', type=int, default=0,
+                    help='Number of custom event ids (5000+) to mix into the events and the custom events map')
+parser.add_argument('--repeat', type=int, default=3, help='Number of times to time each stage, the best is reported')
+parser.add_argument('--no-memory', action='store_true', help="Don't measure peak memory (it's slow)")
+
+
+class StageResult(NamedTuple):
+    stage: str
+    num_events: int
+    seconds: float
+    peak_bytes: Optional[int]
+
+
+def time_stage(stage_fn: Callable, repeat: int) -> float:
+    best_time = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        stage_fn()
+        best_time = min(best_time, time.perf_counter() - start_time)
+    return best_time
+
+
+def peak_memory_stage(stage_fn: Callable) -> int:
+    gc.collect()
+    tracemalloc.start()
+    stage_result = stage_fn()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del stage_result
+    return peak
+
+
+def get_stages(trx_filepath: str, trx_bytes: bytes, custom_events_map: Dict) -> Dict[str, Callable]:
+    endian_str, header_id_end_idx = get_endian_str(trx_bytes)
+    control_header, control_header_end_idx = get_control_header(endian_str, trx_bytes, header_id_end_idx)
+    _endian_str, _control_header, obj_reg_map, obj_reg_end_idx = _get_tracex_header(trx_bytes)
+    entries_values = list(_iter_event_entry_values(endian_str, trx_bytes, obj_reg_end_idx, control_header))
+    decode_event = EventDecoder(custom_events_map, control_header['timer_valid_mask'], obj_reg_map.names).get_decoder()
+
+    def render():
+        # Decoding is included, as events cache their object registry lookups
+        return [repr(decode_event(entry_values)) for entry_values in entries_values]
+
+    stages = {
+        'header': lambda: get_control_header(endian_str, trx_bytes, get_endian_str(trx_bytes)[1]),
+        'registry': lambda: get_object_registry(endian_str, trx_bytes, control_header_end_idx, control_header),
+        'events': lambda: list(_iter_event_entry_values(endian_str, trx_bytes, obj_reg_end_idx, control_header)),
+        'convert': lambda: [decode_event(entry_values) for entry_values in entries_values],
+        'render': render,
+        'end_to_end': lambda: parse_tracex_buffer(trx_filepath, custom_events_map),
+        # Keeps 1 in 10 of the generated events
+        'filtered': lambda: parse_tracex_buffer(trx_filepath, custom_events_map, event_filter=EventFilter([52])),
+        'stats': lambda: get_tracex_stats(trx_filepath, unwrap_timestamps=True),
+    }
+    if np is not None:
+        stages['table'] = lambda: parse_tracex_table(trx_filepath)
+    return stages
+
+
+def run_benchmarks(num_events: int, endian_str: str, args) -> List[StageResult]:
+    custom_ids = list(range(5000, 5000 + args.custom_ids))
+    custom_events_map = {
+        custom_id: tracex_event_factory(f'CustomEvent{custom_id}', f'custom{custom_id}', ['a', 'b', 'c', '_4'])
+        for custom_id in custom_ids
+    }
+    trx_bytes = build_trx(num_events, oldest_idx=int(num_events * args.wrap), endian_str=endian_str,
+                          event_ids=default_event_ids + custom_ids)
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        trx_filepath = os.path.join(temp_dir, 'benchmark.trx')
+        write_trx(trx_filepath, trx_bytes)
+        for stage, stage_fn in get_stages(trx_filepath, trx_bytes, custom_events_map).items():
+            seconds = time_stage(stage_fn, args.repeat)
+            peak_bytes = None if args.no_memory else peak_memory_stage(stage_fn)
+            results.append(StageResult(stage, num_events, seconds, peak_bytes))
+    return results
+
+
+def print_results(results: List[StageResult], endian_str: str):
+    print(f'{"stage":<12}{"events":>10}{"endian":>8}{"seconds":>12}{"events/sec":>14}{"peak MiB":>10}')
+    for result in results:
+        events_per_sec = result.num_events / result.seconds if result.seconds > 0 else float('inf')
+        peak_str = '-' if result.peak_bytes is None else f'{result.peak_bytes / 2 ** 20:.2f}'
+        print(f'{result.stage:<12}{result.num_events:>10}{endian_str:>8}{result.seconds:>12.5f}'
+              f'{events_per_sec:>14,.0f}{peak_str:>10}')
+
+
+def main():
+    args = parser.parse_args()
+    endian_strs = ['<', '>'] if args.endian == 'both' else [args.endian]
+    for endian_str in endian_strs:
+        for num_events_str in args.events:
+            num_events = int(float(num_events_str))
+            print_results(run_benchmarks(num_events, endian_str, args), endian_str)
+            print()
+
+
+if __name__ == '__main__':
+    main()
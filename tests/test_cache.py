@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from trx_writer import build_trx, event_tuples
+
+from tracex_parser.cache import ParseCache
+from tracex_parser.events import tracex_event_factory
+from tracex_parser.file_parser import parse_tracex_buffer
+
+
+def cache_files(cache):
+    return sorted(os.listdir(cache.cache_dir))
+
+
+@pytest.mark.parametrize('trx_source', [
+    './demo_threadx.trx',
+    build_trx(100, num_entries=150),
+    build_trx(100, oldest_idx=33, endian_str='>', timer_valid_mask=0xFF),
+])
+def test_cached_parse_matches_uncached(tmp_path, trx_source):
+    cache = ParseCache(tmp_path)
+    events, obj_reg_map = parse_tracex_buffer(trx_source)
+
+    miss_events, miss_obj_reg_map = parse_tracex_buffer(trx_source, cache=cache)
+    assert len(cache_files(cache)) == 1
+    hit_events, hit_obj_reg_map = parse_tracex_buffer(trx_source, cache=cache)
+    assert len(cache_files(cache)) == 1
+
+    assert event_tuples(miss_events) == event_tuples(hit_events) == event_tuples(events)
+    assert miss_obj_reg_map == hit_obj_reg_map == obj_reg_map
+
+
+def test_key_depends_on_contents(tmp_path):
+    cache = ParseCache(tmp_path)
+    assert cache.get_key(build_trx(10)) == cache.get_key(build_trx(10))
+    assert cache.get_key(build_trx(10)) != cache.get_key(build_trx(10, start_timestamp=1))
+
+
+def test_custom_events_are_applied_on_cache_hit(tmp_path):
+    cache = ParseCache(tmp_path)
+    trx_bytes = build_trx(20, event_ids=[5000])
+    custom_events_map = {5000: tracex_event_factory('CustomEvent', 'custom', ['a', 'b', 'c', 'd'])}
+    parse_tracex_buffer(trx_bytes, custom_events_map, cache=cache)
+    events, _obj_reg_map = parse_tracex_buffer(trx_bytes, custom_events_map, cache=cache)
+    assert {e.fn_name for e in events} == {'custom'}
+    events, _obj_reg_map = parse_tracex_buffer(trx_bytes, cache=cache)
+    assert {e.fn_name for e in events} == {None}
+    # The same entry is used with and without the custom events
+    assert len(cache_files(cache)) == 1
+
+
+def test_lru_eviction(tmp_path):
+    trx_sources = [build_trx(100, start_timestamp=idx) for idx in range(3)]
+    cache = ParseCache(tmp_path)
+    keys = [cache.get_key(trx_source) for trx_source in trx_sources]
+    parse_tracex_buffer(trx_sources[0], cache=cache)
+    cache.max_bytes = os.path.getsize(cache._entry_path(keys[0])) * 2
+
+    for last_used_ns, (key, trx_source) in enumerate(zip(keys[:2], trx_sources[:2])):
+        parse_tracex_buffer(trx_source, cache=cache)
+        os.utime(cache._entry_path(key), ns=(last_used_ns, last_used_ns))
+    # Loading the oldest entry makes it the most recently used one
+    assert cache.load(keys[0]) is not None
+    parse_tracex_buffer(trx_sources[2], cache=cache)
+    assert cache_files(cache) == sorted(os.path.basename(cache._entry_path(key)) for key in [keys[0], keys[2]])
+
+    cache.clear()
+    assert cache_files(cache) == []
+
+
+def test_corrupt_entry_is_discarded(tmp_path):
+    cache = ParseCache(tmp_path)
+    trx_bytes = build_trx(10)
+    events, _obj_reg_map = parse_tracex_buffer(trx_bytes, cache=cache)
+    entry_path = cache._entry_path(cache.get_key(trx_bytes))
+    with open(entry_path, 'r+b') as fp:
+        fp.truncate(os.path.getsize(entry_path) - 4)
+
+    assert cache.load(cache.get_key(trx_bytes)) is None
+    assert not os.path.exists(entry_path)
+    reparsed_events, _obj_reg_map = parse_tracex_buffer(trx_bytes, cache=cache)
+    assert event_tuples(reparsed_events) == event_tuples(events)
+
+
+def test_unwritable_cache_dir(tmp_path):
+    not_a_dir = tmp_path / 'file'
+    not_a_dir.write_bytes(b'')
+    events, _obj_reg_map = parse_tracex_buffer(build_trx(10), cache=ParseCache(not_a_dir / 'cache'))
+    assert len(events) == 10
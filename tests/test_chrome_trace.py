@@ -0,0 +1,117 @@
+import gzip
+import io
+import json
+import shutil
+import sys
+
+import pytest
+from trx_writer import build_trx_events, TrxEvent
+
+from tracex_parser import file_parser
+from tracex_parser.chrome_trace import export_chrome_trace
+from tracex_parser.file_parser import main, parse_tracex_buffer
+from tracex_parser.locks import analyze_locks
+from tracex_parser.timeline import analyze_thread_timeline, interrupt_ptr
+
+thread_a = 0x20001000
+thread_b = 0x20001100
+sem = 0x20001300
+
+demo_trx_files = ['./demo_filex.trx', './demo_netx_tcp.trx', './demo_netx_udp.trx', './demo_threadx.trx']
+
+
+def export_to_json(filepath, **export_kwargs) -> dict:
+    output_fp = io.StringIO()
+    export_chrome_trace(filepath, output_fp, **export_kwargs)
+    return json.loads(output_fp.getvalue())
+
+
+def test_trace_events():
+    events = [
+        TrxEvent(thread_a, 1, 83, 0, [sem, 0xFFFFFFFF, 1, 0]),
+        TrxEvent(thread_a, 1, 2, 10, [thread_a, 5, 0, thread_b]),  # threadSuspend, B runs
+        TrxEvent(interrupt_ptr, 0, 3, 20, [0, 7, 0, 0]),
+        TrxEvent(interrupt_ptr, 0, 88, 22, [sem, 0, 1, 0]),
+        TrxEvent(interrupt_ptr, 0, 4, 30, [0, 7, 0, 0]),
+        TrxEvent(thread_b, 2, 69, 40, [0, 0, 0, 0]),
+    ]
+    trace_events = export_to_json(build_trx_events(events), tick_hz=2000000)['traceEvents']
+    by_phase = {}
+    for trace_event in trace_events:
+        by_phase.setdefault(trace_event['ph'], []).append(trace_event)
+
+    assert {(m['tid'], m['args']['name']) for m in by_phase['M'] if m['name'] == 'thread_name'} == \
+        {(thread_a, 'main thread'), (thread_b, 'rx thread'), (interrupt_ptr, 'INTERRUPT')}
+    assert [(i['name'], i['tid'], i['ts']) for i in by_phase['i']] == [
+        ('semGet', thread_a, 0), ('threadSuspend', thread_a, 5), ('isrEnter', interrupt_ptr, 10),
+        ('semPut', interrupt_ptr, 11), ('isrExit', interrupt_ptr, 15), ('queueSend', thread_b, 20)]
+    assert by_phase['i'][0]['args'] == {'obj_id': 'txBufferLock', 'timeout': 'WaitForever', 'cur_cnt': 1,
+                                        'stack_ptr': 0}
+    # Timestamps are in microseconds at 2MHz
+    assert [(x['name'], x['tid'], x['ts'], x['dur']) for x in by_phase['X']] == [
+        ('main thread', thread_a, 0, 5), ('rx thread', thread_b, 5, 5), ('ISR 7', interrupt_ptr, 10, 5),
+        ('rx thread', thread_b, 15, 5)]
+    # The semaphore is held from the semGet to the semPut in the ISR
+    assert [(async_event['ph'], async_event['name'], async_event['ts']) for async_event in
+            by_phase['b'] + by_phase['e']] == [('b', 'txBufferLock', 0), ('e', 'txBufferLock', 11)]
+    assert by_phase['b'][0]['args'] == {'thread': 'main thread', 'wait_us': 0}
+
+
+@pytest.mark.parametrize('filepath', demo_trx_files)
+def test_demos(filepath):
+    timer_counts_down = filepath == './demo_threadx.trx'
+    trace_events = export_to_json(filepath, timer_counts_down=timer_counts_down)['traceEvents']
+    events, _ = parse_tracex_buffer(filepath)
+    timeline = analyze_thread_timeline(filepath, timer_counts_down=timer_counts_down)
+    lock_analyzer = analyze_locks(filepath, timer_counts_down=timer_counts_down)
+
+    assert len([e for e in trace_events if e['ph'] == 'i']) == len(events)
+    assert sum(e['dur'] for e in trace_events if e['ph'] == 'X') == timeline.total_ticks - timeline.unknown_ticks
+    num_holds = sum(lock_stats.hold.count for lock_stats in lock_analyzer.locks.values())
+    assert len([e for e in trace_events if e['ph'] == 'b']) == len([e for e in trace_events if e['ph'] == 'e']) == \
+        num_holds
+
+    slices_only = export_to_json(filepath, timer_counts_down=timer_counts_down, with_events=False)['traceEvents']
+    assert not [e for e in slices_only if e['ph'] == 'i']
+
+
+def test_compressed_file_is_read_once(tmp_path, monkeypatch):
+    gz_path = tmp_path / 'demo_threadx.trx.gz'
+    with open('./demo_threadx.trx', 'rb') as trx_fp, gzip.open(gz_path, 'wb') as gz_fp:
+        gz_fp.write(trx_fp.read())
+    read_stream = file_parser._read_tracex_stream
+    decompressed_fps = []
+
+    def counting_read_stream(fp):
+        decompressed_fps.append(fp)
+        return read_stream(fp)
+
+    monkeypatch.setattr(file_parser, '_read_tracex_stream', counting_read_stream)
+    assert export_to_json(gz_path, timer_counts_down=True) == export_to_json('./demo_threadx.trx',
+                                                                             timer_counts_down=True)
+    assert len(decompressed_fps) == 1
+
+
+def test_cli(monkeypatch, capsys, tmp_path):
+    trx_path = tmp_path / 'demo_threadx.trx'
+    shutil.copy('./demo_threadx.trx', trx_path)
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '--export', 'chrome', '--timer-counts-down', str(trx_path)])
+    main()
+    assert capsys.readouterr().out == f'Exporting {trx_path} to {tmp_path / "demo_threadx.trace.json"}\n'
+    with open(tmp_path / 'demo_threadx.trace.json') as trace_fp:
+        assert trace_fp.read() == io_export(str(trx_path))
+
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '--export', 'chrome', '--timer-counts-down', '-o', '-',
+                                      str(trx_path)])
+    main()
+    assert capsys.readouterr().out == io_export(str(trx_path))
+
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '--export', 'chrome', '-o', 'out.json'] + demo_trx_files)
+    with pytest.raises(SystemExit):
+        main()
+
+
+def io_export(filepath: str) -> str:
+    output_fp = io.StringIO()
+    export_chrome_trace(filepath, output_fp, timer_counts_down=True, process_name=filepath)
+    return output_fp.getvalue()
@@ -0,0 +1,110 @@
+import gzip
+import json
+import sys
+
+import pytest
+from trx_writer import build_trx
+
+from tracex_parser import file_parser
+from tracex_parser.file_parser import main, summarize_tracex_file
+
+demo_trx_files = ['./demo_filex.trx', './demo_netx_tcp.trx', './demo_netx_udp.trx', './demo_threadx.trx']
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    # parse-trx caches by default, keep it out of the real cache directory
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    return tmp_path
+
+
+def run_main(monkeypatch, capsys, argv):
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '-n'] + argv)
+    main()
+    return capsys.readouterr().out
+
+
+@pytest.mark.parametrize('verbose_arg', ['-v', '-vv'])
+def test_jobs_output_matches_serial(monkeypatch, capsys, verbose_arg):
+    serial_out = run_main(monkeypatch, capsys, [verbose_arg] + demo_trx_files)
+    parallel_out = run_main(monkeypatch, capsys, [verbose_arg, '--jobs', '2'] + demo_trx_files)
+    assert parallel_out == serial_out
+    # Files are reported in the order they were given
+    parsing_lines = [line for line in serial_out.splitlines() if line.startswith('Parsing ')]
+    assert parsing_lines == [f'Parsing {trx_file}' for trx_file in demo_trx_files]
+
+
+def test_fleet_histogram(monkeypatch, capsys):
+    out = run_main(monkeypatch, capsys, ['--fleet-histogram'] + demo_trx_files)
+    fleet_lines = out.split('Fleet Event Histogram (4 files):\n')[1].splitlines()
+    fleet_counts = {line.split()[0]: int(line.split()[1]) for line in fleet_lines}
+
+    expected_counts = {}
+    for trx_file in demo_trx_files:
+        for event_name, count in summarize_tracex_file(trx_file, with_histogram=True).events_histogram.items():
+            expected_counts[event_name] = expected_counts.get(event_name, 0) + count
+    assert fleet_counts == expected_counts
+    assert sum(fleet_counts.values()) == 950 * 3 + 974
+
+
+def test_summary_of_empty_buffer():
+    file_summary = summarize_tracex_file(build_trx(0, num_entries=4), with_histogram=True)
+    assert file_summary.total_events == 0
+    assert file_summary.delta_ticks == 0
+    assert file_summary.events_histogram == {}
+
+
+def test_cache_is_opt_in(monkeypatch, capsys, cache_home):
+    uncached_out = run_main(monkeypatch, capsys, ['-vv'] + demo_trx_files)
+    assert not (cache_home / 'tracex_parser').exists()
+
+    first_out = run_main(monkeypatch, capsys, ['-vv', '--cache'] + demo_trx_files)
+    assert len(list((cache_home / 'tracex_parser').glob('*.trxc'))) == len(demo_trx_files)
+    cached_out = run_main(monkeypatch, capsys, ['-vv', '--cache'] + demo_trx_files)
+    assert uncached_out == first_out == cached_out
+
+
+def test_cache_dir(monkeypatch, capsys, tmp_path):
+    # Only parsing the events goes through the cache, the summary alone is counted without it
+    run_main(monkeypatch, capsys, ['--cache-dir', str(tmp_path / 'trx_cache'), demo_trx_files[0]])
+    assert not (tmp_path / 'trx_cache').exists()
+    run_main(monkeypatch, capsys, ['-vv', '--cache-dir', str(tmp_path / 'trx_cache'), demo_trx_files[0]])
+    assert len(list((tmp_path / 'trx_cache').glob('*.trxc'))) == 1
+
+
+@pytest.fixture
+def corrupt_trx_files(tmp_path):
+    (tmp_path / 'garbage.trx').write_bytes(b'not a trace' * 100)
+    (tmp_path / 'truncated.trx.gz').write_bytes(gzip.compress(build_trx(100))[:200])
+    return [str(tmp_path / 'garbage.trx'), str(tmp_path / 'missing.trx'), str(tmp_path / 'truncated.trx.gz')]
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_corrupt_files_are_reported(monkeypatch, capsys, corrupt_trx_files, jobs):
+    trx_files = [demo_trx_files[0]] + corrupt_trx_files + demo_trx_files[1:]
+    out_lines = run_main(monkeypatch, capsys, ['--jobs', jobs, '--fleet-histogram'] + trx_files).splitlines()
+    assert [line for line in out_lines if line.startswith('Parsing ')] == [
+        f'Parsing {trx_file}' for trx_file in trx_files]
+    assert [line.split(':')[0] for line in out_lines if line.startswith('Could not parse ')] == [
+        f'Could not parse {trx_file}' for trx_file in corrupt_trx_files]
+    assert [line for line in out_lines if line.startswith('total events')] == ['total events: 950'] * 3 + [
+        'total events: 974']
+    assert 'Fleet Event Histogram (4 files, 3 could not be parsed):' in out_lines
+
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '--json', '--jobs', jobs, '--fleet-histogram'] + trx_files)
+    main()
+    json_lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [json_line['filepath'] for json_line in json_lines[:-1]] == trx_files
+    assert [json_line['filepath'] for json_line in json_lines if 'error' in json_line] == corrupt_trx_files
+    assert (json_lines[-1]['files'], json_lines[-1]['failed_files']) == (4, 3)
+
+
+def test_name_is_printed_before_parsing(monkeypatch, capsys):
+    def printing_summarize(input_source, **kwargs):
+        print(f'Summarizing {input_source}')
+        return summarize_tracex_file(input_source, **kwargs)
+    monkeypatch.setattr(file_parser, 'summarize_tracex_file', printing_summarize)
+    out_lines = run_main(monkeypatch, capsys, demo_trx_files[:2]).splitlines()
+    assert [line for line in out_lines if line.startswith(('Parsing ', 'Summarizing '))] == [
+        f'Parsing {demo_trx_files[0]}', f'Summarizing {demo_trx_files[0]}',
+        f'Parsing {demo_trx_files[1]}', f'Summarizing {demo_trx_files[1]}']
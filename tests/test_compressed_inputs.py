@@ -0,0 +1,148 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import subprocess
+import sys
+import tarfile
+import zipfile
+
+import pytest
+from trx_writer import build_trx, write_trx, event_tuples
+
+from tracex_parser import file_parser
+from tracex_parser.file_parser import ArchiveMember, get_export_filepath, iter_archive_members, main, \
+    parse_tracex_buffer
+
+compressors = {
+    'gz': gzip.compress,
+    'xz': lzma.compress,
+    'bz2': bz2.compress,
+}
+
+
+@pytest.fixture(scope='module')
+def demo_trx_bytes():
+    with open('./demo_threadx.trx', 'rb') as fp:
+        return fp.read()
+
+
+@pytest.mark.parametrize('compression', compressors.keys())
+def test_compressed_file(tmp_path, demo_trx_bytes, compression):
+    trx_filepath = tmp_path / f'demo_threadx.trx.{compression}'
+    write_trx(trx_filepath, compressors[compression](demo_trx_bytes))
+    events, obj_reg_map = parse_tracex_buffer(trx_filepath)
+    expected_events, expected_obj_reg_map = parse_tracex_buffer(demo_trx_bytes)
+    assert event_tuples(events) == event_tuples(expected_events)
+    assert obj_reg_map == expected_obj_reg_map
+
+
+def test_large_compressed_file_is_spooled(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_parser, 'max_in_memory_decompressed_bytes', 1000)
+    monkeypatch.setattr(file_parser, 'decompress_chunk_bytes', 300)
+    trx_bytes = build_trx(500, oldest_idx=123)
+    trx_filepath = tmp_path / 'big.trx.gz'
+    write_trx(trx_filepath, gzip.compress(trx_bytes))
+    with file_parser.open_tracex_buffer(trx_filepath) as tracex_buf:
+        assert not isinstance(tracex_buf, bytearray)
+        assert tracex_buf[:] == trx_bytes
+    events, _obj_reg_map = parse_tracex_buffer(trx_filepath)
+    assert event_tuples(events) == event_tuples(parse_tracex_buffer(trx_bytes)[0])
+
+
+def make_archives(tmp_path, trx_members):
+    tar_filepath = tmp_path / 'dumps.tar.gz'
+    with tarfile.open(tar_filepath, 'w:gz') as tar_archive:
+        subdir_info = tarfile.TarInfo('subdir')
+        subdir_info.type = tarfile.DIRTYPE
+        tar_archive.addfile(subdir_info)
+        for member_name, member_bytes in trx_members.items():
+            tar_info = tarfile.TarInfo(member_name)
+            tar_info.size = len(member_bytes)
+            tar_archive.addfile(tar_info, io.BytesIO(member_bytes))
+    zip_filepath = tmp_path / 'dumps.zip'
+    with zipfile.ZipFile(zip_filepath, 'w', compression=zipfile.ZIP_DEFLATED) as zip_archive:
+        for member_name, member_bytes in trx_members.items():
+            zip_archive.writestr(member_name, member_bytes)
+    return tar_filepath, zip_filepath
+
+
+def test_archive_members(tmp_path, demo_trx_bytes):
+    trx_members = {
+        'a.trx': build_trx(10),
+        'subdir/threadx.trx.xz': lzma.compress(demo_trx_bytes),
+    }
+    expected_events = [parse_tracex_buffer(build_trx(10))[0], parse_tracex_buffer(demo_trx_bytes)[0]]
+    for archive_filepath in make_archives(tmp_path, trx_members):
+        archive_members = list(iter_archive_members(archive_filepath))
+        assert [(member.archive_path, member.member_name) for member in archive_members] == \
+            [(str(archive_filepath), member_name) for member_name in trx_members]
+        for archive_member, member_expected_events in zip(archive_members, expected_events):
+            events, _obj_reg_map = parse_tracex_buffer(archive_member)
+            assert event_tuples(events) == event_tuples(member_expected_events)
+            # Members that are only named are opened from the archive
+            events, _obj_reg_map = parse_tracex_buffer(ArchiveMember(archive_member.archive_path,
+                                                                     archive_member.member_name))
+            assert event_tuples(events) == event_tuples(member_expected_events)
+    assert list(iter_archive_members('./demo_threadx.trx')) == ['./demo_threadx.trx']
+
+
+def test_tar_is_read_once(tmp_path, monkeypatch):
+    tar_filepath, _zip_filepath = make_archives(tmp_path, {f'{idx}.trx': build_trx(idx) for idx in range(20)})
+    tar_open = tarfile.open
+    tar_modes = []
+
+    def counting_tar_open(*args, **kwargs):
+        tar_modes.append(args[1] if len(args) > 1 else kwargs.get('mode', 'r'))
+        return tar_open(*args, **kwargs)
+
+    monkeypatch.setattr(tarfile, 'open', counting_tar_open)
+    for archive_member in iter_archive_members(tar_filepath):
+        assert len(parse_tracex_buffer(archive_member)[0]) == int(archive_member.member_name.split('.')[0])
+    # Opened once to list it, in streaming mode, and never again for the members
+    assert tar_modes[tar_modes.index('r|*'):] == ['r|*']
+    assert '<' in repr(archive_member) and archive_member.data[:4] == b'BTXT'
+
+
+def test_cli_expands_archives(tmp_path, monkeypatch, capsys, demo_trx_bytes):
+    tar_filepath, zip_filepath = make_archives(tmp_path, {'threadx.trx': demo_trx_bytes, 'b.trx': build_trx(10)})
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '-n', '--jobs', '2', str(tar_filepath),
+                                      str(zip_filepath), './demo_threadx.trx'])
+    main()
+    out_lines = capsys.readouterr().out.splitlines()
+    assert [line for line in out_lines if line.startswith('Parsing ')] == [
+        f'Parsing {tar_filepath}:threadx.trx',
+        f'Parsing {tar_filepath}:b.trx',
+        f'Parsing {zip_filepath}:threadx.trx',
+        f'Parsing {zip_filepath}:b.trx',
+        'Parsing ./demo_threadx.trx',
+    ]
+    assert [line for line in out_lines if line.startswith('total events')] == [
+        'total events: 974', 'total events: 10', 'total events: 974', 'total events: 10', 'total events: 974']
+
+
+def test_run_as_module_expands_archives(tmp_path, demo_trx_bytes):
+    # ArchiveMember is created by the __main__ module, and has to be understood by the rest of the package
+    tar_filepath, _zip_filepath = make_archives(tmp_path, {'threadx.trx': demo_trx_bytes})
+    for extra_args in [['-n'], ['--export', 'chrome']]:
+        subprocess.run([sys.executable, '-m', 'tracex_parser.file_parser'] + extra_args + [str(tar_filepath)],
+                       check=True, stdout=subprocess.DEVNULL)
+    assert os.path.exists(get_export_filepath(ArchiveMember(str(tar_filepath), 'threadx.trx')))
+
+
+def test_truncated_tar_keeps_read_members(tmp_path, caplog):
+    trx_bytes = build_trx(100)
+    tar_fp = io.BytesIO()
+    # Uncompressed, so that half the file is half the members
+    with tarfile.open(fileobj=tar_fp, mode='w') as tar_archive:
+        for idx in range(5):
+            tar_info = tarfile.TarInfo(f'{idx}.trx')
+            tar_info.size = len(trx_bytes)
+            tar_archive.addfile(tar_info, io.BytesIO(trx_bytes))
+    truncated_filepath = tmp_path / 'truncated.tar'
+    truncated_filepath.write_bytes(tar_fp.getvalue()[:len(tar_fp.getvalue()) // 2])
+    archive_members = list(iter_archive_members(truncated_filepath))
+    assert 0 < len(archive_members) < 5
+    assert all(len(parse_tracex_buffer(archive_member)[0]) == 100 for archive_member in archive_members)
+    assert 'Could not read the rest of' in caplog.text
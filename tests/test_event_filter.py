@@ -0,0 +1,108 @@
+import pytest
+from trx_writer import build_trx, default_event_ids, default_objects, event_tuples
+
+from tracex_parser.cache import ParseCache
+from tracex_parser.events import EventFilter, tracex_event_factory
+from tracex_parser.file_parser import parse_tracex_buffer, iter_tracex_events
+
+thread_ptrs = [obj.ptr for obj in default_objects if obj.obj_type == 1]
+
+
+def keep_matching(events, event_ids=None, threads=None, start=None, end=None, use_timestamp64=False):
+    kept = []
+    for e in events:
+        timestamp = e.timestamp64 if use_timestamp64 else e.timestamp
+        if event_ids is not None and e.id not in event_ids:
+            continue
+        if threads is not None and e.thread_ptr not in threads:
+            continue
+        if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+            continue
+        kept.append(e)
+    return kept
+
+
+@pytest.mark.parametrize('filepath', ['./demo_threadx.trx', './demo_filex.trx'])
+@pytest.mark.parametrize('event_ids,threads', [
+    ({1, 2}, None),
+    ({52, 57, 83, 88}, None),
+    (set(), None),
+    (None, set()),
+])
+def test_filter_ids_threads(filepath, event_ids, threads):
+    all_events, _obj_reg_map = parse_tracex_buffer(filepath)
+    expected = keep_matching(all_events, event_ids, threads)
+    filtered_events, _obj_reg_map = parse_tracex_buffer(filepath, event_filter=EventFilter(event_ids, threads))
+    assert event_tuples(filtered_events) == event_tuples(expected)
+    # Streaming gives the same events
+    assert event_tuples(iter_tracex_events(filepath, event_filter=EventFilter(event_ids, threads))) == \
+        event_tuples(expected)
+
+
+def test_filter_threads():
+    all_events, _obj_reg_map = parse_tracex_buffer('./demo_threadx.trx')
+    some_threads = {e.thread_ptr for e in all_events[:5]}
+    expected = keep_matching(all_events, threads=some_threads)
+    assert 0 < len(expected) < len(all_events)
+    filtered_events, _obj_reg_map = parse_tracex_buffer('./demo_threadx.trx',
+                                                        event_filter=EventFilter(thread_ptrs=some_threads))
+    assert event_tuples(filtered_events) == event_tuples(expected)
+
+    # Both have to match
+    expected = keep_matching(all_events, {1, 2}, some_threads)
+    filtered_events, _obj_reg_map = parse_tracex_buffer('./demo_threadx.trx',
+                                                        event_filter=EventFilter({1, 2}, some_threads))
+    assert event_tuples(filtered_events) == event_tuples(expected)
+
+
+def test_filter_custom_events():
+    custom_events_map = {
+        5000: tracex_event_factory('CustomEvent5000', 'custom5000', ['a', 'b', 'c', '_4']),
+        5001: tracex_event_factory('CustomEvent5001', 'custom5001', ['a', 'b', 'c', '_4']),
+    }
+    trx_bytes = build_trx(200, oldest_idx=50, event_ids=default_event_ids + [5000, 5001])
+    all_events, _obj_reg_map = parse_tracex_buffer(trx_bytes, custom_events_map)
+    filtered_events, _obj_reg_map = parse_tracex_buffer(trx_bytes, custom_events_map,
+                                                        event_filter=EventFilter([5001]))
+    assert event_tuples(filtered_events) == event_tuples(keep_matching(all_events, {5001}))
+    assert len(filtered_events) == len(range(11, 200, 12))
+    assert all(e.fn_name == 'custom5001' for e in filtered_events)
+
+
+def test_filter_time_range_unwrapped():
+    # Timer wraps about every 36 events, the filtered out events still have to be unwrapped
+    trx_bytes = build_trx(500, oldest_idx=44, timer_valid_mask=0xFF)
+    all_events, _obj_reg_map = parse_tracex_buffer(trx_bytes, unwrap_timestamps=True, tick_hz=1000)
+    for start, end in [(None, 700), (1000, 2000), (2000, None), (3493, 10000)]:
+        for event_ids in [None, {3, 4}]:
+            event_filter = EventFilter(event_ids, time_range=(start, end))
+            expected = keep_matching(all_events, event_ids, start=start, end=end, use_timestamp64=True)
+            filtered_events, _obj_reg_map = parse_tracex_buffer(trx_bytes, unwrap_timestamps=True, tick_hz=1000,
+                                                                event_filter=event_filter)
+            assert event_tuples(filtered_events) == event_tuples(expected)
+            assert filtered_events.time_range(start, end) == filtered_events
+
+
+def test_filter_time_range_masked():
+    # Without unwrapping the range is of the masked timestamps
+    trx_bytes = build_trx(500, oldest_idx=44, timer_valid_mask=0xFF)
+    all_events, _obj_reg_map = parse_tracex_buffer(trx_bytes)
+    filtered_events, _obj_reg_map = parse_tracex_buffer(trx_bytes, event_filter=EventFilter(time_range=(10, 20)))
+    assert event_tuples(filtered_events) == event_tuples(keep_matching(all_events, start=10, end=20))
+    assert len(filtered_events) > 1
+
+
+def test_filter_and_cache(tmp_path):
+    trx_path = tmp_path / 'filter.trx'
+    trx_path.write_bytes(build_trx(3000, oldest_idx=1000))
+    event_filter = EventFilter({52, 57}, thread_ptrs[:2])
+    expected, _obj_reg_map = parse_tracex_buffer(str(trx_path), event_filter=event_filter)
+    assert len(expected) > 0
+
+    cache = ParseCache(tmp_path / 'cache')
+    for _ in range(2):
+        cached_events, _obj_reg_map = parse_tracex_buffer(str(trx_path), cache=cache, event_filter=event_filter)
+        assert event_tuples(cached_events) == event_tuples(expected)
+    # The whole buffer was cached, not just the filtered events
+    all_events, _obj_reg_map = parse_tracex_buffer(str(trx_path), cache=cache)
+    assert len(all_events) == 3000
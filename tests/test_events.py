@@ -0,0 +1,132 @@
+import logging
+import struct
+import pytest
+
+from tracex_parser.events import TraceXEvent, ObjectRegistryNames, EventDecoder, tracex_event_factory, event_id_map, \
+    CommonArg
+from tracex_parser.helpers import TraceXEventException
+from tracex_parser.file_parser import parse_tracex_buffer
+
+
+def test_event_has_no_instance_dict():
+    event = event_id_map[52](0x1234, 5, 52, 1000, [0x5678, 0xFFFFFFFF, 0, 0])
+    assert not hasattr(event, '__dict__')
+
+
+def test_mapped_args_view():
+    event = event_id_map[52](0x1234, 5, 52, 1000, [0x5678, 0xFFFFFFFF, 0, 0])
+    event.apply_object_registry({})
+
+    assert dict(event.mapped_args) == {CommonArg.obj_id: 0x5678, CommonArg.timeout: 'WaitForever', '_3': 0, '_4': 0}
+    assert event.mapped_args[CommonArg.timeout] == 'WaitForever'
+    assert list(event.mapped_args.keys()) == event.arg_map
+    assert event.raw_args == [0x5678, 0xFFFFFFFF, 0, 0]
+
+    event.mapped_args[CommonArg.obj_id] = 'myMutex'
+    assert event.mapped_args[CommonArg.obj_id] == 'myMutex'
+    assert event.raw_args[0] == 0x5678
+
+
+def test_custom_event_arg_map_length():
+    with pytest.raises(TraceXEventException):
+        tracex_event_factory('BadEvent', 'badEvent', ['_1', '_2', '_3'])
+
+
+def test_base_event_args():
+    event = TraceXEvent(0x1234, 5, 5000, 1000, [1, 2, 3, 4])
+    assert dict(event.mapped_args) == {'arg1': 1, 'arg2': 2, 'arg3': 3, 'arg4': 4}
+
+
+def test_object_registry_is_lazy():
+    obj_reg_names = ObjectRegistryNames({0x1234: {'thread_reg_entry_obj_name': b'myThread'},
+                                         0x5678: {'thread_reg_entry_obj_name': b'myMutex'}})
+    event = event_id_map[52](0x1234, 5, 52, 1000, [0x5678, 0, 0, 0])
+    event.defer_object_registry(obj_reg_names)
+    # Nothing has been mapped yet
+    assert event._mapped_vals == (0x5678, 0, 0, 0)
+
+    assert event.thread_name == 'myThread'
+    assert event.mapped_args[CommonArg.obj_id] == 'myMutex'
+    assert event.mapped_args[CommonArg.timeout] == 'NoWait'
+
+
+def test_apply_registry_twice(caplog):
+    caplog.set_level(logging.DEBUG)
+    obj_reg_names = ObjectRegistryNames({0x1234: {'thread_reg_entry_obj_name': b'myThread'},
+                                         0x5678: {'thread_reg_entry_obj_name': b'myMutex'}})
+    event = event_id_map[52](0x1234, 5, 52, 1000, [0x5678, 0xFFFFFFFF, 0, 0])
+    for _ in range(2):
+        event.apply_object_registry(obj_reg_names)
+        assert dict(event.mapped_args) == {CommonArg.obj_id: 'myMutex', CommonArg.timeout: 'WaitForever', '_3': 0,
+                                           '_4': 0}
+        assert event.thread_name == 'myThread'
+    # The names weren't looked up as pointers the second time
+    assert not obj_reg_names.diagnostics.unresolved_ptrs
+
+
+def test_lazy_registry_uses_overrides():
+    class RenamedEvent(TraceXEvent):
+        arg_map = [CommonArg.obj_id, '_2', '_3', '_4']
+
+        def apply_object_registry(self, obj_reg_map):
+            super().apply_object_registry(obj_reg_map)
+            self.thread_name = f'renamed {self.thread_name}'
+
+    obj_reg_names = ObjectRegistryNames({0x1234: {'thread_reg_entry_obj_name': b'myThread'},
+                                         0x5678: {'thread_reg_entry_obj_name': b'myMutex'}})
+    event = RenamedEvent(0x1234, 5, 5000, 1000, [0x5678, 0, 0, 0])
+    event.defer_object_registry(obj_reg_names)
+    assert event.mapped_args[CommonArg.obj_id] == 'myMutex'
+    assert event.thread_name == 'renamed myThread'
+    # Only applied once
+    assert event.thread_name == 'renamed myThread'
+
+
+@pytest.mark.parametrize('decoding_name_tup', [
+    ('ascii', None),
+    ('latin-1', 'caf\xe9'),
+    ('replace', 'caf\ufffd'),
+])
+def test_obj_name_decoding(decoding_name_tup):
+    obj_name_decoding, expected_name = decoding_name_tup
+    obj_reg_names = ObjectRegistryNames({0x1234: {'thread_reg_entry_obj_name': b'caf\xe9'}}, obj_name_decoding)
+    assert obj_reg_names.get(0x1234) == expected_name
+
+
+def test_obj_names_are_shared():
+    events, obj_map = parse_tracex_buffer('./demo_threadx.trx')
+    thread_names = {}
+    for event in events:
+        # The same name is always the same string object
+        assert thread_names.setdefault(event.thread_name, event.thread_name) is event.thread_name
+
+
+def test_unresolved_pointer_diagnostics(capsys):
+    with open('./demo_threadx.trx', 'rb') as fp:
+        trx_buf = bytearray(fp.read())
+    # Move the System Timer Thread's registry entry to an address that no event uses
+    struct.pack_into('<L', trx_buf, 52, 0xDEAD)
+
+    events, obj_map = parse_tracex_buffer(trx_buf)
+    assert not obj_map.diagnostics  # Nothing has been resolved yet
+    assert all(e.thread_name is not None or e.thread_ptr == 0xEEA4 for e in events)
+    # No per-event output, only counters
+    assert capsys.readouterr().out == ''
+    assert obj_map.diagnostics.unresolved_ptrs == {0xEEA4: 10}
+    assert obj_map.diagnostics.unresolved_args == {CommonArg.thread_ptr: 10}
+
+
+def test_event_decoder_lookup():
+    custom_event = tracex_event_factory('CustomEvent', 'customEvent', ['_1', '_2', '_3', '_4'])
+    big_id_event = tracex_event_factory('BigIdEvent', 'bigIdEvent', ['_1', '_2', '_3', '_4'])
+    event_decoder = EventDecoder({52: custom_event, 0x12345: big_id_event}, timer_valid_mask=0xFFFF)
+    decode_event = event_decoder.get_decoder()
+
+    # Custom events take priority over the built in ones
+    assert type(decode_event((0x1234, 5, 52, 0x10001, 1, 2, 3, 4))) is custom_event
+    assert type(decode_event((0x1234, 5, 0x12345, 0x10001, 1, 2, 3, 4))) is big_id_event
+    assert type(decode_event((0x1234, 5, 83, 0x10001, 1, 2, 3, 4))) is event_id_map[83]
+    unknown_event = decode_event((0x1234, 5, 4242, 0x10001, 1, 2, 3, 4))
+    assert type(unknown_event) is TraceXEvent
+    assert unknown_event.timestamp == 1
+    assert unknown_event.raw_args == [1, 2, 3, 4]
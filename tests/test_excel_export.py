@@ -0,0 +1,98 @@
+import re
+import zipfile
+
+import pytest
+from trx_writer import build_trx, build_trx_events, TrxEvent
+
+from tracex_parser.excel_export import export_excel, MetaPattern, hash_colour, shift_hue
+from tracex_parser.patterns import EventPattern, EventStep, Var
+
+xlsxwriter = pytest.importorskip('xlsxwriter')
+
+thread_a = 0x20001000
+mutex = 0x20001340
+unnamed_mutex = 0x20001380
+
+
+def read_sheets(xlsx_path) -> dict:
+    """
+    :return: Worksheet XML file -> {cell reference: cell text}
+    """
+    sheets = {}
+    with zipfile.ZipFile(xlsx_path) as xlsx_zip:
+        for name in xlsx_zip.namelist():
+            if name.startswith('xl/worksheets/sheet'):
+                sheet_xml = xlsx_zip.read(name).decode()
+                sheets[name] = {cell_ref: ''.join(re.findall(r'<t[^>]*>([^<]*)</t>', cell_xml)) or
+                                ''.join(re.findall(r'<v>([^<]*)</v>', cell_xml))
+                                for cell_ref, cell_xml in re.findall(r'<c r="([A-Z]+\d+)"[^>]*>(.*?)</c>', sheet_xml)}
+    return sheets
+
+
+def count_formats(xlsx_path) -> int:
+    with zipfile.ZipFile(xlsx_path) as xlsx_zip:
+        styles_xml = xlsx_zip.read('xl/styles.xml').decode()
+    return int(re.search(r'<cellXfs count="(\d+)"', styles_xml).group(1))
+
+
+def test_formats_are_shared(tmp_path):
+    small_xlsx, big_xlsx = tmp_path / 'small.xlsx', tmp_path / 'big.xlsx'
+    # Both cycle through every object, formats only depend on the distinct names
+    small_exporter = export_excel(build_trx(100), small_xlsx)
+    excel_exporter = export_excel(build_trx(2000), big_xlsx)
+    assert excel_exporter.num_events == 2000
+    assert len(small_exporter.formats) == len(excel_exporter.formats) < 10
+    assert count_formats(small_xlsx) == count_formats(big_xlsx)
+
+    cells = read_sheets(big_xlsx)['xl/worksheets/sheet1.xml']
+    assert [cells['A1'], cells['B1'], cells['C1']] == ['time', 'actor', 'event']
+    assert cells['B2'] == 'main thread'
+    assert cells['C2'].startswith('threadResume(')
+
+
+def test_sheet_splitting(tmp_path):
+    xlsx_path = tmp_path / 'split.xlsx'
+    excel_exporter = export_excel(build_trx(10), xlsx_path, max_rows=5)
+    assert len(excel_exporter.worksheets) == 3
+    sheets = read_sheets(xlsx_path)
+    # Header and 4 events, header and 4 events, header and 2 events
+    assert [len([ref for ref in sheets[f'xl/worksheets/sheet{sheet_num}.xml'] if ref.startswith('A')])
+            for sheet_num in (1, 2, 3)] == [5, 5, 3]
+    assert sheets['xl/worksheets/sheet2.xml']['A2'] == str(4 * 7)
+
+    with pytest.raises(ValueError):
+        export_excel(build_trx(10), xlsx_path, max_rows=1)
+
+
+def test_meta_sections(tmp_path):
+    events = [
+        TrxEvent(thread_a, 1, 52, 0, [mutex, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 52, 1, [unnamed_mutex, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 68, 2, [0, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 57, 3, [mutex, thread_a, 1, 0]),
+        TrxEvent(thread_a, 1, 57, 4, [unnamed_mutex, thread_a, 1, 0]),
+    ]
+    meta_patterns = [
+        MetaPattern(EventPattern('{mutex}', [EventStep('mtxGet', obj_id=Var('mutex')), ...,
+                                             EventStep('mtxPut', obj_id=Var('mutex'))]), '#800080'),
+        MetaPattern(EventPattern('queue', [EventStep('queueReceive')]), '#008000'),
+    ]
+    xlsx_path = tmp_path / 'meta.xlsx'
+    # Split mid section, it carries on in the next sheet
+    export_excel(build_trx_events(events), xlsx_path, meta_patterns=meta_patterns,
+                 obj_names={unnamed_mutex: 'other mutex'}, max_rows=4)
+    sheets = read_sheets(xlsx_path)
+    sheet_1, sheet_2 = sheets['xl/worksheets/sheet1.xml'], sheets['xl/worksheets/sheet2.xml']
+    assert [sheet_1.get(ref) for ref in ['D2', 'E2', 'D3', 'E3', 'D4', 'E4', 'F4']] == \
+        ['uart mutex|0', None, 'uart mutex|0', 'other mutex|1', 'uart mutex|0', 'other mutex|1', 'queue|2']
+    assert [sheet_2.get(ref) for ref in ['D2', 'E2', 'D3', 'E3']] == ['uart mutex|0', 'other mutex|1',
+                                                                      'other mutex|1', None]
+    assert sheet_1['C3'] == 'mtxGet(obj_id=other mutex,timeout=NoWait)'
+
+
+def test_colours():
+    assert hash_colour('main thread') == hash_colour('main thread')
+    assert hash_colour('main thread') != hash_colour('rx thread')
+    assert re.fullmatch(r'#[0-9a-f]{6}', hash_colour(0x20001000))
+    assert shift_hue('#ff0000', 1 / 3) == '#00ff00'
+    assert shift_hue('#808080', 0.03) == '#808080'
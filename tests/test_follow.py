@@ -0,0 +1,101 @@
+import sys
+
+import pytest
+from trx_writer import build_trx_events, default_objects, TrxEvent, TrxObject
+
+from tracex_parser.file_parser import main
+from tracex_parser.follow import TraceXFollower
+
+num_entries = 16
+
+
+def target_snapshot(num_written: int, objects=None) -> bytes:
+    """
+    Buffer of a target that has written num_written events since it started, info_field_3 is the event's number
+    """
+    first_kept = max(0, num_written - num_entries)
+    events = [TrxEvent(default_objects[idx % 3].ptr, 1, 3 + idx % 2, idx * 10, [0, 0, idx, 0])
+              for idx in range(first_kept, num_written)]
+    return build_trx_events(events, num_entries=num_entries, oldest_idx=num_written % num_entries, objects=objects)
+
+
+def event_numbers(events):
+    return [e.raw_args[2] for e in events]
+
+
+@pytest.mark.parametrize('num_written_steps', [
+    [0, 5, 10, 16, 20, 31, 31, 40],  # Filling up, then wrapping around at buf_end_ptr
+    [3, 18],  # Wraps in one step
+    [20, 35],  # Exactly one entry short of a whole buffer
+])
+def test_follow_returns_only_new_events(num_written_steps):
+    follower = TraceXFollower()
+    num_seen = 0
+    for num_written in num_written_steps:
+        new_events = follower.update(target_snapshot(num_written))
+        expected_first = max(num_seen, num_written - num_entries)
+        assert event_numbers(new_events) == list(range(expected_first, num_written))
+        num_seen = num_written
+    assert follower.snapshots == len(num_written_steps)
+    assert follower.overruns == 0
+
+
+@pytest.mark.parametrize('num_written_steps', [[20, 36], [20, 50], [5, 30]])
+def test_follow_overrun(num_written_steps):
+    follower = TraceXFollower()
+    follower.update(target_snapshot(num_written_steps[0]))
+    new_events = follower.update(target_snapshot(num_written_steps[1]))
+    # Everything in the buffer is new, but some events were lost
+    assert event_numbers(new_events) == list(range(num_written_steps[1] - num_entries, num_written_steps[1]))
+    assert follower.overruns == 1
+
+
+def test_follow_target_restart():
+    follower = TraceXFollower()
+    follower.update(target_snapshot(10))
+    assert event_numbers(follower.update(target_snapshot(4))) == [0, 1, 2, 3]
+    # A different buffer layout is a different buffer
+    objects = default_objects + [TrxObject(0x20001400, b'new thread')]
+    assert event_numbers(follower.update(target_snapshot(6, objects))) == list(range(6))
+    follower.reset()
+    assert event_numbers(follower.update(target_snapshot(6, objects))) == list(range(6))
+
+
+def test_follow_cli(tmp_path, monkeypatch, capsys):
+    trx_filepath = tmp_path / 'live.trx'
+    snapshots = iter([target_snapshot(num_written) for num_written in [3, 5, 19]])
+    trx_filepath.write_bytes(next(snapshots))
+
+    def next_snapshot(_interval):
+        try:
+            trx_filepath.write_bytes(next(snapshots))
+        except StopIteration:
+            raise KeyboardInterrupt
+    monkeypatch.setattr('time.sleep', next_snapshot)
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '-n', '--follow', str(trx_filepath)])
+    main()
+    event_lines = capsys.readouterr().out.splitlines()
+    assert len(event_lines) == 19
+    assert [line.split(':')[0] for line in event_lines] == [str(idx * 10) for idx in range(19)]
+
+
+def test_follow_cli_timestamp_options(tmp_path, monkeypatch):
+    trx_filepath = tmp_path / 'live.trx'
+    trx_filepath.write_bytes(target_snapshot(3))
+    followers = []
+
+    class RecordingFollower(TraceXFollower):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            followers.append(self)
+
+    def stop(_interval):
+        raise KeyboardInterrupt
+    monkeypatch.setattr('tracex_parser.follow.TraceXFollower', RecordingFollower)
+    monkeypatch.setattr('time.sleep', stop)
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '-n', '--follow', '--unwrap', '--tick-hz', '1000',
+                                      '--timer-counts-down', str(trx_filepath)])
+    main()
+    assert len(followers) == 1
+    follower = followers[0]
+    assert (follower.unwrap_timestamps, follower.tick_hz, follower.timer_counts_down) == (True, 1000, True)
@@ -0,0 +1,67 @@
+import mmap
+import pathlib
+import pytest
+
+from tracex_parser.file_parser import parse_tracex_buffer, iter_tracex_events
+from tracex_parser.helpers import TraceXParseException
+
+trx_filenames = [
+    'demo_filex.trx',
+    'demo_netx_tcp.trx',
+    'demo_netx_udp.trx',
+    'demo_threadx.trx',
+]
+
+
+def _as_bytes(filepath: str):
+    with open(filepath, 'rb') as fp:
+        return fp.read()
+
+
+source_converters = [
+    pytest.param(pathlib.Path, id='pathlib'),
+    pytest.param(_as_bytes, id='bytes'),
+    pytest.param(lambda p: bytearray(_as_bytes(p)), id='bytearray'),
+    pytest.param(lambda p: memoryview(_as_bytes(p)), id='memoryview'),
+]
+
+
+@pytest.mark.parametrize('source_converter', source_converters)
+@pytest.mark.parametrize('trx_filename', trx_filenames)
+def test_sources_match_file_path(trx_filename: str, source_converter):
+    filepath = f'./{trx_filename}'
+    path_events, path_obj_map = parse_tracex_buffer(filepath)
+    events, obj_map = parse_tracex_buffer(source_converter(filepath))
+
+    assert obj_map == path_obj_map
+    assert [repr(e) for e in events] == [repr(e) for e in path_events]
+
+
+def test_mmap_source_can_be_closed():
+    with open('./demo_threadx.trx', 'rb') as fp:
+        trx_mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        events, obj_map = parse_tracex_buffer(trx_mmap)
+        # Would raise BufferError if the parser left any views of the mmap alive
+        trx_mmap.close()
+    assert len(events) == 974
+
+
+def test_empty_buffer():
+    with pytest.raises(TraceXParseException):
+        parse_tracex_buffer(b'')
+
+
+@pytest.mark.parametrize('trx_filename', trx_filenames)
+def test_iter_events_matches_parse(trx_filename: str):
+    filepath = f'./{trx_filename}'
+    events, obj_map = parse_tracex_buffer(filepath)
+    assert [repr(e) for e in iter_tracex_events(filepath)] == [repr(e) for e in events]
+
+
+def test_iter_events_stop_early():
+    events, obj_map = parse_tracex_buffer('./demo_filex.trx')
+    event_gen = iter_tracex_events('./demo_filex.trx')
+    first_events = [next(event_gen) for _ in range(10)]
+    # Closing the generator closes the underlying mmap
+    event_gen.close()
+    assert [repr(e) for e in first_events] == [repr(e) for e in events[:10]]
@@ -0,0 +1,102 @@
+from trx_writer import build_trx_events, TrxEvent, TrxObject, default_objects
+
+from tracex_parser.locks import analyze_locks, LockHold, DurationStats
+
+thread_a = 0x20001000
+thread_b = 0x20001100
+thread_c = 0x20001200
+isr = 0xFFFFFFFF
+mutex = 0x20001340
+sem = 0x20001300
+wait_forever = 0xFFFFFFFF
+no_wait = 0
+
+demo_trx_files = ['./demo_filex.trx', './demo_netx_tcp.trx', './demo_netx_udp.trx', './demo_threadx.trx']
+
+
+def run_analyzer(events):
+    holds = []
+    lock_analyzer = analyze_locks(build_trx_events(events), on_hold=holds.append)
+    return lock_analyzer, holds
+
+
+def test_mutex():
+    lock_analyzer, holds = run_analyzer([
+        TrxEvent(thread_a, 1, 52, 0, [mutex, wait_forever, 0, 0]),  # Free
+        TrxEvent(thread_b, 1, 52, 5, [mutex, wait_forever, thread_a, 1]),  # Waits for A
+        TrxEvent(thread_c, 1, 52, 7, [mutex, no_wait, thread_a, 1]),  # Fails
+        TrxEvent(thread_a, 1, 52, 8, [mutex, wait_forever, thread_a, 1]),  # Nested
+        TrxEvent(thread_a, 1, 68, 8, [0, 0, 0, 0]),  # Not a lock event
+        TrxEvent(thread_a, 1, 57, 9, [mutex, thread_a, 2, 0]),
+        TrxEvent(thread_a, 1, 57, 10, [mutex, thread_a, 1, 0]),  # Released, B gets it
+        TrxEvent(thread_b, 1, 57, 30, [mutex, thread_b, 1, 0]),
+    ])
+    assert holds == [
+        LockHold(mutex, thread_a, 0, 0, 10, thread_a),
+        LockHold(mutex, thread_b, 5, 10, 30, thread_b),
+    ]
+    assert [(hold.wait_ticks, hold.hold_ticks) for hold in holds] == [(0, 10), (5, 20)]
+
+    lock_stats = lock_analyzer.locks[mutex]
+    assert (lock_stats.obj_name, lock_stats.kind) == ('uart mutex', 'mutex')
+    assert (lock_stats.acquisitions, lock_stats.contended, lock_stats.failed, lock_stats.unmatched_releases) == \
+        (2, 1, 1, 0)
+    assert (lock_stats.hold.count, lock_stats.hold.total, lock_stats.hold.max) == (2, 30, 20)
+    assert lock_stats.wait.distribution() == {0: 1, 7: 1}
+    assert lock_analyzer.get_top_contended() == [lock_stats]
+
+
+def test_semaphore():
+    lock_analyzer, holds = run_analyzer([
+        TrxEvent(thread_a, 1, 83, 0, [sem, wait_forever, 1, 0]),  # Count was 1
+        TrxEvent(thread_b, 1, 83, 2, [sem, wait_forever, 0, 0]),  # Waits
+        TrxEvent(isr, 0, 88, 6, [sem, 0, 1, 0]),  # Put by an ISR, wakes B
+        TrxEvent(thread_b, 1, 80, 9, [sem, 0, 0, 1]),  # semCeilPut
+        TrxEvent(isr, 0, 88, 12, [sem, 1, 0, 0]),  # Nothing to release
+    ])
+    assert holds == [
+        LockHold(sem, thread_a, 0, 0, 6, isr),
+        LockHold(sem, thread_b, 2, 6, 9, thread_b),
+    ]
+    lock_stats = lock_analyzer.locks[sem]
+    assert (lock_stats.obj_name, lock_stats.kind) == ('txBufferLock', 'semaphore')
+    assert (lock_stats.acquisitions, lock_stats.contended, lock_stats.unmatched_releases) == (2, 1, 1)
+    assert lock_stats.hold.mean == 4.5
+
+
+def test_top_contended():
+    other_sem = 0x20001380
+    objects = default_objects + [TrxObject(other_sem, b'other sem', obj_type=3)]
+    events = [
+        TrxEvent(thread_a, 1, 83, 0, [sem, wait_forever, 1, 0]),
+        TrxEvent(thread_a, 1, 83, 0, [other_sem, wait_forever, 1, 0]),
+        TrxEvent(thread_b, 1, 83, 1, [sem, wait_forever, 0, 0]),
+        TrxEvent(thread_b, 1, 83, 1, [other_sem, wait_forever, 0, 0]),
+        TrxEvent(thread_a, 1, 88, 5, [other_sem, 0, 1, 0]),
+        TrxEvent(thread_a, 1, 88, 50, [sem, 0, 1, 0]),
+    ]
+    lock_analyzer = analyze_locks(build_trx_events(events, objects=objects))
+    assert [lock_stats.obj_name for lock_stats in lock_analyzer.get_top_contended()] == ['txBufferLock', 'other sem']
+    assert [lock_stats.obj_name for lock_stats in lock_analyzer.get_top_contended(1)] == ['txBufferLock']
+
+
+def test_duration_stats():
+    duration_stats = DurationStats()
+    for ticks in [0, 1, 2, 3, 4, 100]:
+        duration_stats.add(ticks)
+    assert duration_stats.distribution() == {0: 1, 1: 1, 3: 2, 7: 1, 127: 1}
+    assert duration_stats.max == 100
+
+
+def test_demos():
+    for filepath in demo_trx_files:
+        holds = []
+        lock_analyzer = analyze_locks(filepath, timer_counts_down=filepath == './demo_threadx.trx',
+                                      on_hold=holds.append)
+        assert len(holds) == sum(lock_stats.hold.count for lock_stats in lock_analyzer.locks.values())
+        assert all(hold.wait_ticks >= 0 and hold.hold_ticks >= 0 for hold in holds)
+
+    lock_analyzer = analyze_locks('./demo_netx_tcp.trx')
+    top_contended = lock_analyzer.get_top_contended()
+    assert [lock_stats.obj_name for lock_stats in top_contended] == ['NetX IP Instance 0']
+    assert top_contended[0].contended == 11
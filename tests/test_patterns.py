@@ -0,0 +1,133 @@
+import pytest
+from trx_writer import build_trx_events, TrxEvent
+
+from tracex_parser.events import CommonArg
+from tracex_parser.file_parser import parse_tracex_buffer
+from tracex_parser.patterns import match_patterns, PatternMatcher, EventPattern, EventStep, Var, PatternMatch
+
+thread_a = 0x20001000
+thread_b = 0x20001100
+sem = 0x20001300
+mutex = 0x20001340
+other_mutex = 0x20001380
+
+critical_section = EventPattern('criticalSection', [
+    EventStep('semGet', obj_id='txBufferLock'),
+    EventStep('threadIdentify'),
+    EventStep('preemptionChange'),
+    EventStep('threadIdentify'),
+    EventStep('preemptionChange'),
+    EventStep('semCeilPut', obj_id='txBufferLock'),
+])
+mutex_lock = EventPattern('mutexLock', [
+    EventStep('mtxGet', obj_id=Var('mutex')),
+    ...,
+    EventStep('mtxPut', obj_id=Var('mutex')),
+])
+
+
+def critical_section_events(timestamp: int) -> list:
+    return [
+        TrxEvent(thread_a, 1, 83, timestamp, [sem, 0, 1, 0]),
+        TrxEvent(thread_a, 1, 103, timestamp + 1, [0, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 107, timestamp + 2, [0, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 103, timestamp + 3, [0, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 107, timestamp + 4, [0, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 80, timestamp + 5, [sem, 1, 0, 1]),
+    ]
+
+
+def test_consecutive():
+    events = critical_section_events(0)
+    # Broken up by another event
+    events += critical_section_events(10)[:3] + [TrxEvent(thread_a, 1, 68, 13, [0, 0, 0, 0])] + \
+        critical_section_events(10)[3:]
+    events += critical_section_events(20)
+    matches = list(match_patterns(build_trx_events(events), [critical_section]))
+    assert matches == [PatternMatch('criticalSection', 0, 5, {}), PatternMatch('criticalSection', 13, 18, {})]
+
+
+def test_gap_and_vars():
+    events = [
+        TrxEvent(thread_a, 1, 52, 0, [mutex, 0, 0, 0]),
+        TrxEvent(thread_b, 1, 52, 1, [other_mutex, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 68, 2, [0, 0, 0, 0]),
+        TrxEvent(thread_b, 1, 57, 3, [other_mutex, thread_b, 1, 0]),
+        TrxEvent(thread_a, 1, 52, 4, [mutex, 0xFFFFFFFF, thread_a, 1]),  # Nested, overlaps the first match
+        TrxEvent(thread_a, 1, 57, 5, [mutex, thread_a, 2, 0]),  # Ends both open matches of the mutex
+        TrxEvent(thread_a, 1, 57, 6, [mutex, thread_a, 1, 0]),
+        TrxEvent(thread_a, 1, 52, 7, [mutex, 0, 0, 0]),  # Never put
+    ]
+    matches = list(match_patterns(build_trx_events(events), [mutex_lock]))
+    # The mutex that isn't in the registry is bound to its pointer
+    assert matches == [
+        PatternMatch('mutexLock', 1, 3, {'mutex': other_mutex}),
+        PatternMatch('mutexLock', 0, 5, {'mutex': 'uart mutex'}),
+        PatternMatch('mutexLock', 4, 5, {'mutex': 'uart mutex'}),
+    ]
+
+
+def test_unmatched_starts_are_merged():
+    # Every mtxGet waits for a mtxPut by thread B, which never comes
+    put_by_b = EventPattern('putByB', [EventStep('mtxGet', obj_id=Var('mutex')), ...,
+                                       EventStep('mtxPut', obj_id=Var('mutex'), owning_thread=thread_b)])
+    num_starts = 20000
+    events, _ = parse_tracex_buffer(build_trx_events(
+        [TrxEvent(thread_a, 1, 52 if event_idx % 2 == 0 else 57, event_idx, [mutex, thread_a, 1, 0])
+         for event_idx in range(num_starts * 2)] +
+        [TrxEvent(thread_b, 1, 57, num_starts * 2, [mutex, thread_b, 1, 0])]))
+    pattern_matcher = PatternMatcher([put_by_b])
+    matches = list(pattern_matcher.match(events))
+    assert len(pattern_matcher._waiting_keys) == 0
+    assert [match.start_idx for match in matches] == list(range(0, num_starts * 2, 2))
+    assert {match.end_idx for match in matches} == {num_starts * 2}
+
+    pattern_matcher.reset()
+    for tracex_event in events[:-1]:
+        pattern_matcher.feed(tracex_event)
+    # Only one partial match is waiting, and checked against each mtxPut
+    assert len(pattern_matcher._waiting_keys) == 1
+
+
+def test_all_patterns_in_one_pass():
+    events = [TrxEvent(thread_a, 1, 52, 0, [mutex, 0, 0, 0])] + critical_section_events(1) + \
+        [TrxEvent(thread_a, 1, 57, 7, [mutex, thread_a, 1, 0])]
+    rx_lock = EventPattern('semLock', [EventStep(83, obj_id=sem, timeout=0), ..., EventStep(80)])
+    pattern_matcher = PatternMatcher([mutex_lock, critical_section, rx_lock])
+    events, _ = parse_tracex_buffer(build_trx_events(events))
+    matches = [(event_idx, pattern_matcher.feed(tracex_event)) for event_idx, tracex_event in enumerate(events)]
+    assert [(event_idx, event_matches) for event_idx, event_matches in matches if event_matches] == [
+        (6, [PatternMatch('criticalSection', 1, 6, {}), PatternMatch('semLock', 1, 6, {})]),
+        (7, [PatternMatch('mutexLock', 0, 7, {'mutex': 'uart mutex'})]),
+    ]
+
+    # Positions start from 0 again after a reset
+    pattern_matcher.reset()
+    assert [match.start_idx for match in pattern_matcher.match(events)] == [1, 1, 0]
+
+
+def test_invalid_patterns():
+    with pytest.raises(ValueError):
+        EventPattern('gap', [..., EventStep('mtxGet')])
+    with pytest.raises(ValueError):
+        EventPattern('empty', [])
+    with pytest.raises(ValueError):
+        PatternMatcher([EventPattern('unknown', [EventStep('notAnEvent')])])
+    with pytest.raises(ValueError):
+        PatternMatcher([EventPattern('arg', [EventStep('mtxGet', count=1)])])
+
+
+def test_demo():
+    semaphore_lock = EventPattern('semLock', [
+        EventStep('semGet', obj_id=Var('sem')),
+        ...,
+        EventStep('semPut', obj_id=Var('sem')),
+    ])
+    events, _ = parse_tracex_buffer('./demo_threadx.trx')
+    matches = list(match_patterns('./demo_threadx.trx', [semaphore_lock, mutex_lock]))
+    assert matches
+    for match in matches:
+        start_event, end_event = events[match.start_idx], events[match.end_idx]
+        assert start_event.fn_name in ['semGet', 'mtxGet']
+        assert start_event.mapped_args[CommonArg.obj_id] == end_event.mapped_args[CommonArg.obj_id]
+        assert match.start_idx < match.end_idx
@@ -0,0 +1,100 @@
+import random
+import struct
+
+import pytest
+from trx_writer import build_trx, write_trx, event_tuples
+
+from tracex_parser.file_parser import parse_tracex_buffer
+from tracex_parser.helpers import TraceXParseException
+from tracex_parser.scanner import MemorySegment, check_tracex_header, iter_magic_offsets, parse_tracex_dump, \
+    scan_tracex_buffers
+
+ram_address = 0x20000000
+
+
+def build_dump():
+    """
+    A RAM image with two TraceX buffers at ram_address + their offset, and some things that look like them
+    """
+    rng = random.Random(1234)
+    dump = bytearray(rng.getrandbits(8) for _ in range(0x8000))
+    # Just the magic
+    dump[0x10:0x14] = b'BTXT'
+    # A copy of a buffer from somewhere else in memory
+    foreign_trx_bytes = build_trx(20, base_address=0x30000000)
+    dump[0x100:0x100 + len(foreign_trx_bytes)] = foreign_trx_bytes
+    # A buffer that's been cut off by the end of the dump
+    dump[-0x100:] = build_trx(20, base_address=ram_address + len(dump) - 0x100)[:0x100]
+    trx_buffers = {
+        0x1000: build_trx(50, oldest_idx=17, base_address=ram_address + 0x1000),
+        0x4004: build_trx(30, num_entries=40, endian_str='>', base_address=ram_address + 0x4004),
+    }
+    for offset, trx_bytes in trx_buffers.items():
+        dump[offset:offset + len(trx_bytes)] = trx_bytes
+    return bytes(dump), trx_buffers
+
+
+def test_iter_magic_offsets():
+    assert list(iter_magic_offsets(b'TXTB..BTXT..TXTBTXTB')) == [0, 6, 12, 15, 16]
+    assert list(iter_magic_offsets(memoryview(b'..BTXT'))) == [2]
+    assert list(iter_magic_offsets(b'nothing here')) == []
+
+
+def test_scan_finds_valid_buffers():
+    dump, trx_buffers = build_dump()
+    buffer_locations = scan_tracex_buffers(dump, ram_address)
+    assert [buffer_location.offset for buffer_location in buffer_locations] == list(trx_buffers.keys())
+    assert [buffer_location.endian_str for buffer_location in buffer_locations] == ['<', '>']
+    assert [buffer_location.num_entries for buffer_location in buffer_locations] == [50, 40]
+
+    # Without an address map the copy can't be told apart from the real buffers
+    assert [buffer_location.offset for buffer_location in scan_tracex_buffers(dump)] == [0x100] + list(trx_buffers)
+
+
+def test_address_map():
+    dump, trx_buffers = build_dump()
+    with pytest.raises(TraceXParseException):
+        check_tracex_header(dump, 0x1000, ram_address + 4)
+    # The dump is two segments of a core file
+    address_map = [MemorySegment(0, ram_address, 0x4000), MemorySegment(0x4000, 0x10000000, 0x4000)]
+    assert [buffer_location.offset for buffer_location in scan_tracex_buffers(dump, address_map)] == [0x1000]
+
+
+@pytest.mark.parametrize('from_file', [False, True])
+def test_parse_dump_in_place(tmp_path, from_file):
+    dump, trx_buffers = build_dump()
+    dump_source = dump
+    if from_file:
+        dump_source = tmp_path / 'ram.bin'
+        write_trx(dump_source, dump)
+
+    tracex_buffers = parse_tracex_dump(dump_source, address_map=ram_address)
+    assert len(tracex_buffers) == len(trx_buffers)
+    for (buffer_location, events, obj_reg_map), trx_bytes in zip(tracex_buffers, trx_buffers.values()):
+        expected_events, expected_obj_reg_map = parse_tracex_buffer(trx_bytes)
+        assert event_tuples(events) == event_tuples(expected_events)
+        assert obj_reg_map == expected_obj_reg_map
+        assert buffer_location.size == len(trx_bytes)
+
+
+@pytest.mark.parametrize('obj_reg_end, buf_end, buf_cur', [
+    # Registry that runs past the end of the buffer, and the dump
+    (48 + 48 * 20000, 200, 200),
+    # Current pointer past the end of the buffer
+    (48, 240, 272),
+])
+def test_inconsistent_header(obj_reg_end, buf_end, buf_cur):
+    base_address = 0x1000
+    dump = b'BTXT' + struct.pack('<LLLHHLLLLLLL', 0xffffffff, base_address, base_address + 48, 0, 32,
+                                 base_address + obj_reg_end, base_address + obj_reg_end, base_address + buf_end,
+                                 base_address + buf_cur, 0, 0, 0) + bytes(400)
+    with pytest.raises(TraceXParseException):
+        check_tracex_header(dump, 0)
+    assert scan_tracex_buffers(dump) == []
+
+
+def test_demo_file_is_found():
+    with open('./demo_threadx.trx', 'rb') as fp:
+        trx_bytes = fp.read()
+    buffer_locations = scan_tracex_buffers(bytes(100) + trx_bytes)
+    assert [buffer_location.offset for buffer_location in buffer_locations] == [100]
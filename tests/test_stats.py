@@ -0,0 +1,87 @@
+import json
+import sys
+
+import pytest
+from trx_writer import build_trx, default_event_ids
+
+from tracex_parser import stats
+from tracex_parser.file_parser import parse_tracex_buffer, summarize_tracex_file, main
+from tracex_parser.stats import get_tracex_stats, get_events_histogram
+
+demo_trx_files = ['./demo_filex.trx', './demo_netx_tcp.trx', './demo_netx_udp.trx', './demo_threadx.trx']
+
+
+@pytest.fixture(params=['numpy', 'no numpy'])
+def with_numpy(request, monkeypatch):
+    if request.param == 'no numpy':
+        monkeypatch.setattr(stats, 'np', None)
+    elif stats.np is None:
+        pytest.skip('numpy is not installed')
+
+
+def expected_stats(filepath, **parse_kwargs):
+    events, obj_reg_map = parse_tracex_buffer(filepath, **parse_kwargs)
+    id_counts = {}
+    for e in events:
+        id_counts[e.id] = id_counts.get(e.id, 0) + 1
+    return events, obj_reg_map, id_counts
+
+
+@pytest.mark.parametrize('filepath', demo_trx_files)
+@pytest.mark.parametrize('unwrap', [False, True])
+def test_stats_match_events(with_numpy, filepath, unwrap):
+    timer_counts_down = filepath == './demo_threadx.trx'
+    events, obj_reg_map, id_counts = expected_stats(filepath, unwrap_timestamps=unwrap,
+                                                    timer_counts_down=timer_counts_down)
+    tracex_stats = get_tracex_stats(filepath, unwrap_timestamps=unwrap, timer_counts_down=timer_counts_down)
+    assert tracex_stats.total_events == len(events)
+    assert tracex_stats.obj_reg_size == len(obj_reg_map.keys())
+    assert tracex_stats.event_id_counts == id_counts
+    assert tracex_stats.first_timestamp == events[0].timestamp64
+    assert tracex_stats.last_timestamp == events[-1].timestamp64
+    if unwrap and timer_counts_down:
+        assert tracex_stats.delta_ticks == 156206
+
+
+@pytest.mark.parametrize('trx_kwargs', [
+    # Not full yet, so has empty entries
+    dict(num_events=100, num_entries=160),
+    dict(num_events=0, num_entries=4),
+    # Wrapping timer, custom ids outside of the event class table
+    dict(num_events=500, oldest_idx=44, timer_valid_mask=0xFF, event_ids=default_event_ids + [5000, 0x12345]),
+])
+def test_stats_synthetic(with_numpy, trx_kwargs):
+    trx_bytes = build_trx(**trx_kwargs)
+    for unwrap in [False, True]:
+        events, _obj_reg_map, id_counts = expected_stats(trx_bytes, unwrap_timestamps=unwrap)
+        tracex_stats = get_tracex_stats(trx_bytes, unwrap_timestamps=unwrap)
+        assert tracex_stats.total_events == len(events)
+        assert tracex_stats.event_id_counts == id_counts
+        assert tracex_stats.delta_ticks == (events[-1].timestamp64 - events[0].timestamp64 if events else 0)
+
+
+@pytest.mark.parametrize('filepath', demo_trx_files)
+def test_summary_histogram_matches_events(filepath):
+    stats_summary = summarize_tracex_file(filepath, with_histogram=True, tick_hz=1000)
+    events_summary = summarize_tracex_file(filepath, with_histogram=True, with_events=True, tick_hz=1000)
+    assert stats_summary._replace(event_strs=events_summary.event_strs) == events_summary
+
+
+def test_events_histogram_names():
+    assert get_events_histogram({1: 3, 52: 2, 4096: 1, 5000: 7}) == {'threadResume': 3, 'mtxGet': 2, '4096': 1,
+                                                                     '5000': 7}
+
+
+def test_json_output(monkeypatch, capsys, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '-c', '-v', '--json', '--fleet-histogram'] + demo_trx_files)
+    main()
+    json_lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(json_lines) == len(demo_trx_files) + 1
+    for filepath, file_summary in zip(demo_trx_files, json_lines):
+        assert 'event_strs' not in file_summary
+        expected_summary = summarize_tracex_file(filepath, with_histogram=True)._asdict()
+        del expected_summary['event_strs']
+        assert file_summary == json.loads(json.dumps(expected_summary))
+    assert json_lines[-1]['files'] == len(demo_trx_files)
+    assert sum(json_lines[-1]['fleet_histogram'].values()) == 950 * 3 + 974
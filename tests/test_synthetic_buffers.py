@@ -0,0 +1,60 @@
+import pytest
+from typing import Tuple
+
+from trx_writer import build_trx, build_trx_events, TrxEvent, default_objects
+
+from tracex_parser.events import tracex_event_factory, CommonArg
+from tracex_parser.file_parser import parse_tracex_buffer, iter_tracex_events, _get_chunk_entry_ranges
+
+
+@pytest.mark.parametrize('num_entries, oldest_idx', [(10, 0), (10, 3), (10, 9), (10, 10)])
+def test_chunk_entry_ranges_cover_buffer_in_order(num_entries, oldest_idx):
+    buffer_idxs = []
+    for chunk_start in range(0, num_entries, 3):
+        for range_start, range_end in _get_chunk_entry_ranges(num_entries, oldest_idx % num_entries, chunk_start,
+                                                              min(chunk_start + 3, num_entries)):
+            buffer_idxs.extend(range(range_start, range_end))
+    assert buffer_idxs == [(oldest_idx + idx) % num_entries for idx in range(num_entries)]
+
+
+@pytest.mark.parametrize('endian_str', ['<', '>'])
+@pytest.mark.parametrize('entries_tup', [
+    (100, 100, 0),
+    (100, 100, 1),
+    (100, 100, 57),
+    (100, 100, 99),
+    (40, 100, 0),  # Buffer that hasn't wrapped yet
+    (0, 10, 0),
+])
+def test_buffer_order(endian_str: str, entries_tup: Tuple[int, int, int]):
+    num_events, num_entries, oldest_idx = entries_tup
+    trx_bytes = build_trx(num_events, num_entries=num_entries, oldest_idx=oldest_idx, endian_str=endian_str)
+
+    events, obj_map = parse_tracex_buffer(trx_bytes)
+    assert len(events) == num_events
+    # The writer numbers the events in chronological order in the 3rd info field
+    assert [e.raw_args[2] for e in events] == list(range(num_events))
+    assert [repr(e) for e in iter_tracex_events(trx_bytes)] == [repr(e) for e in events]
+    assert len(obj_map) == len(default_objects)
+
+
+def test_timer_valid_mask():
+    trx_bytes = build_trx(100, timer_valid_mask=0xFF, ticks_per_event=10)
+    events, obj_map = parse_tracex_buffer(trx_bytes)
+    assert [e.timestamp for e in events] == [(idx * 10) & 0xFF for idx in range(100)]
+
+
+def test_custom_events():
+    custom_events_map = {
+        5000: tracex_event_factory('CustomEvent', 'customEvent', [CommonArg.obj_id, 'count', '_3', '_4']),
+    }
+    thread_ptr = default_objects[0].ptr
+    mutex_ptr = default_objects[-1].ptr
+    trx_bytes = build_trx_events([
+        TrxEvent(thread_ptr, 3, 5000, 10, [mutex_ptr, 42, 0, 0]),
+        TrxEvent(thread_ptr, 3, 5001, 20, [1, 2, 3, 4]),
+    ])
+
+    events, obj_map = parse_tracex_buffer(trx_bytes, custom_events_map)
+    assert repr(events[0]) == '10:main thread customEvent(obj_id=uart mutex,count=0x2a)'
+    assert repr(events[1]) == '20:main thread <TX ID#5001>(arg1=0x1,arg2=0x2,arg3=0x3,arg4=0x4)'
@@ -0,0 +1,29 @@
+import pytest
+
+from tracex_parser.file_parser import parse_tracex_buffer
+
+np = pytest.importorskip('numpy')
+from tracex_parser.table import parse_tracex_table  # noqa: E402
+
+trx_filenames = [
+    'demo_filex.trx',
+    'demo_netx_tcp.trx',
+    'demo_netx_udp.trx',
+    'demo_threadx.trx',
+]
+
+
+@pytest.mark.parametrize('trx_filename', trx_filenames)
+def test_table_matches_events(trx_filename: str):
+    events, obj_map = parse_tracex_buffer(f'./{trx_filename}')
+    table = parse_tracex_table(f'./{trx_filename}')
+
+    assert len(table) == len(events)
+    assert table.obj_reg_map == obj_map
+    assert table.events['event_id'].tolist() == [e.id for e in events]
+    assert table.events['time_stamp'].tolist() == [e.timestamp for e in events]
+    assert table.events['thread_ptr'].tolist() == [e.thread_ptr for e in events]
+    assert table.events['thread_priority'].tolist() == [e.thread_priority for e in events]
+    for arg_idx in range(4):
+        assert table.events[f'info_field_{arg_idx + 1}'].tolist() == [e.raw_args[arg_idx] for e in events]
+    assert [table.thread_name_of(code) for code in table.events['thread_name']] == [e.thread_name for e in events]
@@ -0,0 +1,105 @@
+import pytest
+from trx_writer import build_trx_events, TrxEvent
+
+from tracex_parser.timeline import analyze_thread_timeline, ThreadTimeline, TimelineInterval, interrupt_ptr, \
+    idle_ptr
+
+thread_a = 0x20001000
+thread_b = 0x20001100
+isr = interrupt_ptr
+
+demo_trx_files = ['./demo_filex.trx', './demo_netx_tcp.trx', './demo_netx_udp.trx', './demo_threadx.trx']
+
+
+def scheduling_trx() -> bytes:
+    events = [
+        TrxEvent(thread_a, 1, 69, 0, [0, 0, 0, 0]),  # queueSend
+        TrxEvent(thread_a, 1, 2, 10, [thread_a, 5, 0, thread_b]),  # threadSuspend, B runs
+        TrxEvent(thread_b, 2, 68, 15, [0, 0, 0, 0]),
+        TrxEvent(isr, 0, 3, 20, [0, 7, 0, 0]),  # isrEnter
+        TrxEvent(isr, 0, 3, 22, [0, 8, 0, 0]),  # Nested isrEnter
+        TrxEvent(isr, 0, 4, 25, [0, 8, 0, 0]),
+        TrxEvent(isr, 0, 1, 28, [thread_a, 5, 0, thread_a]),  # threadResume, A preempts B
+        TrxEvent(isr, 0, 4, 30, [0, 7, 0, 0]),
+        TrxEvent(thread_a, 1, 2, 40, [thread_a, 5, 0, 0]),  # threadSuspend, nothing ready
+        TrxEvent(isr, 0, 3, 50, [0, 7, 0, 0]),
+        TrxEvent(isr, 0, 4, 52, [0, 7, 0, 0]),  # Back to idle
+        TrxEvent(isr, 0, 3, 60, [0, 7, 0, 0]),
+        TrxEvent(isr, 0, 1, 62, [thread_b, 5, 0, thread_b]),
+        TrxEvent(isr, 0, 4, 64, [0, 7, 0, 0]),
+        TrxEvent(thread_b, 2, 5, 70, [thread_a, 0, 0, 0]),  # timeSlice to A
+        TrxEvent(thread_a, 1, 1, 80, [thread_b, 5, 0, 0]),  # threadResume that doesn't preempt
+        TrxEvent(thread_a, 1, 69, 100, [0, 0, 0, 0]),
+    ]
+    return build_trx_events(events)
+
+
+def test_scheduling():
+    timeline = analyze_thread_timeline(scheduling_trx(), keep_intervals=True)
+    assert timeline.intervals == [
+        TimelineInterval(thread_a, 0, 10),
+        TimelineInterval(thread_b, 10, 20),
+        TimelineInterval(isr, 20, 30, 7),
+        TimelineInterval(thread_a, 30, 40),
+        TimelineInterval(idle_ptr, 40, 50),
+        TimelineInterval(isr, 50, 52, 7),
+        TimelineInterval(idle_ptr, 52, 60),
+        TimelineInterval(isr, 60, 64, 7),
+        TimelineInterval(thread_b, 64, 70),
+        TimelineInterval(thread_a, 70, 100),
+    ]
+    assert timeline.thread_ticks == {thread_a: 50, thread_b: 16}
+    assert timeline.isr_ticks == 16
+    assert timeline.idle_ticks == 18
+    assert timeline.unknown_ticks == 0
+    assert timeline.isr_count == 3
+    assert timeline.context_switches == 4
+    assert timeline.switches_in == {thread_a: 2, thread_b: 2}
+
+    cpu_usage = timeline.get_cpu_usage()
+    assert [(u.thread_name, u.run_ticks, u.cpu_percent) for u in cpu_usage] == [('main thread', 50, 50.0),
+                                                                                ('rx thread', 16, 16.0)]
+
+
+def test_starts_in_isr():
+    # Buffer starts in the middle of an ISR, and the interrupted thread isn't known until it logs an event
+    events = [
+        TrxEvent(isr, 0, 69, 100, [0, 0, 0, 0]),
+        TrxEvent(isr, 0, 4, 110, [0, 7, 0, 0]),
+        TrxEvent(thread_a, 1, 69, 130, [0, 0, 0, 0]),
+        TrxEvent(thread_a, 1, 69, 150, [0, 0, 0, 0]),
+    ]
+    timeline = analyze_thread_timeline(build_trx_events(events), keep_intervals=True)
+    assert timeline.intervals == [TimelineInterval(isr, 100, 110), TimelineInterval(thread_a, 130, 150)]
+    assert timeline.unknown_ticks == 20
+    assert timeline.context_switches == 0
+
+
+@pytest.mark.parametrize('filepath', demo_trx_files)
+def test_demo_time_adds_up(filepath):
+    intervals = []
+    timeline = analyze_thread_timeline(filepath, timer_counts_down=filepath == './demo_threadx.trx',
+                                       on_interval=intervals.append)
+    assert timeline.intervals is None
+    assert sum(timeline.thread_ticks.values()) + timeline.isr_ticks + timeline.idle_ticks + \
+        timeline.unknown_ticks == timeline.total_ticks
+    # Contiguous, except for unknown time
+    assert sum(interval.ticks for interval in intervals) == timeline.total_ticks - timeline.unknown_ticks
+    assert all(prev.end <= interval.start for prev, interval in zip(intervals, intervals[1:]))
+    assert sum(u.cpu_percent for u in timeline.get_cpu_usage()) <= 100
+
+
+def test_demo_threadx():
+    timeline = analyze_thread_timeline('./demo_threadx.trx', timer_counts_down=True)
+    assert timeline.total_ticks == 156206
+    assert timeline.isr_count == 3
+    busiest = timeline.get_cpu_usage()[:2]
+    assert {u.thread_name for u in busiest} == {'thread 1', 'thread 2'}
+    assert sum(u.cpu_percent for u in busiest) > 90
+
+
+def test_empty():
+    timeline = ThreadTimeline()
+    timeline.finish()
+    assert timeline.total_ticks == 0
+    assert timeline.get_cpu_usage() == []
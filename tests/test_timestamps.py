@@ -0,0 +1,93 @@
+import sys
+
+import pytest
+from trx_writer import build_trx, build_trx_events, TrxEvent, default_objects
+
+from tracex_parser.events import TimestampUnwrapper
+from tracex_parser.file_parser import iter_tracex_events, main, parse_tracex_buffer
+from tracex_parser.follow import TraceXFollower
+
+
+def test_unwrapper():
+    timestamp_unwrapper = TimestampUnwrapper(0xFF)
+    assert [timestamp_unwrapper.unwrap(timestamp) for timestamp in [250, 255, 3, 3, 200, 10, 0]] == \
+           [250, 255, 259, 259, 456, 522, 768]
+    timestamp_unwrapper = TimestampUnwrapper(0xFF, counts_down=True)
+    assert [timestamp_unwrapper.unwrap(timestamp) for timestamp in [5, 0, 250, 100]] == [250, 255, 261, 411]
+
+
+@pytest.mark.parametrize('oldest_idx', [0, 123])
+@pytest.mark.parametrize('endian_str', ['<', '>'])
+def test_unwrapped_events(oldest_idx, endian_str):
+    # The timer wraps about every 36 events
+    trx_bytes = build_trx(500, oldest_idx=oldest_idx, endian_str=endian_str, timer_valid_mask=0xFF,
+                          start_timestamp=100)
+    expected_timestamps = [100 + idx * 7 for idx in range(500)]
+
+    events, _obj_reg_map = parse_tracex_buffer(trx_bytes, unwrap_timestamps=True, tick_hz=32768)
+    assert [e.timestamp64 for e in events] == expected_timestamps
+    assert [e.timestamp for e in events] == [timestamp & 0xFF for timestamp in expected_timestamps]
+    assert [e.time_ns for e in events] == [timestamp * 1_000_000_000 // 32768 for timestamp in expected_timestamps]
+    assert [e.timestamp64 for e in iter_tracex_events(trx_bytes, unwrap_timestamps=True)] == expected_timestamps
+
+
+def test_timestamps_not_unwrapped_by_default():
+    events, _obj_reg_map = parse_tracex_buffer(build_trx(100, timer_valid_mask=0xFF))
+    assert all(e.timestamp64 == e.timestamp and e.time_ns is None for e in events)
+    # Times without unwrapping are from the masked timestamps
+    events, _obj_reg_map = parse_tracex_buffer(build_trx(100, timer_valid_mask=0xFF), tick_hz=1000)
+    assert [e.time_ns for e in events] == [e.timestamp * 1_000_000 for e in events]
+
+
+def test_count_down_timer():
+    timestamps = [(1000 - idx * 7) & 0xFF for idx in range(200)]
+    trx_bytes = build_trx_events([TrxEvent(default_objects[0].ptr, 1, 3, timestamp, [0, 0, 0, 0])
+                                  for timestamp in timestamps], timer_valid_mask=0xFF)
+    events, _obj_reg_map = parse_tracex_buffer(trx_bytes, unwrap_timestamps=True, timer_counts_down=True)
+    timestamps64 = [e.timestamp64 for e in events]
+    assert [later - earlier for earlier, later in zip(timestamps64, timestamps64[1:])] == [7] * 199
+
+
+def test_table_unwrap_matches_events():
+    table_module = pytest.importorskip('tracex_parser.table')
+    if table_module.np is None:
+        pytest.skip('numpy is not installed')
+    for timer_counts_down in [False, True]:
+        trx_bytes = build_trx(500, oldest_idx=77, timer_valid_mask=0xFFF, start_timestamp=3)
+        parse_kwargs = dict(unwrap_timestamps=True, tick_hz=3_000_000_007, timer_counts_down=timer_counts_down)
+        table = table_module.parse_tracex_table(trx_bytes, **parse_kwargs)
+        events, _obj_reg_map = parse_tracex_buffer(trx_bytes, **parse_kwargs)
+        assert table.events['time_stamp64'].tolist() == [e.timestamp64 for e in events]
+        assert table.events['time_ns'].tolist() == [e.time_ns for e in events]
+    assert 'time_stamp64' not in table_module.parse_tracex_table(trx_bytes).events.dtype.names
+
+
+def test_table_time_ns_does_not_overflow():
+    table_module = pytest.importorskip('tracex_parser.table')
+    if table_module.np is None:
+        pytest.skip('numpy is not installed')
+    time_stamps64 = table_module.np.array([0, 2 ** 40 + 12345, 2 ** 50 + 1], dtype=table_module.np.uint64)
+    assert table_module.ticks_to_ns(time_stamps64, 100_000_000).tolist() == \
+           [int(ts) * 1_000_000_000 // 100_000_000 for ts in time_stamps64]
+
+
+def test_follow_unwraps_across_snapshots():
+    num_entries = 16
+    follower = TraceXFollower(unwrap_timestamps=True)
+    timestamps64 = []
+    for num_written in [10, 20, 30, 40]:
+        first_kept = max(0, num_written - num_entries)
+        snapshot = build_trx_events([TrxEvent(default_objects[0].ptr, 1, 3, (idx * 50) & 0xFF, [0, 0, idx, 0])
+                                     for idx in range(first_kept, num_written)], num_entries=num_entries,
+                                    oldest_idx=num_written % num_entries, timer_valid_mask=0xFF)
+        timestamps64.extend(e.timestamp64 for e in follower.update(snapshot))
+    assert timestamps64 == [idx * 50 for idx in range(40)]
+
+
+def test_cli_unwrap(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['parse-trx', '-n', '--unwrap', '--timer-counts-down',
+                                      '--tick-hz', '1000000', './demo_threadx.trx'])
+    main()
+    out_lines = capsys.readouterr().out.splitlines()
+    assert 'delta ticks: 156206' in out_lines
+    assert 'delta time: 156.206 ms' in out_lines
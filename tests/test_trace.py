@@ -0,0 +1,80 @@
+from trx_writer import build_trx, default_objects
+
+from tracex_parser.cache import ParseCache
+from tracex_parser.file_parser import parse_tracex_buffer
+from tracex_parser.trace import TraceXTrace
+
+
+def test_parser_returns_trace():
+    events, obj_reg_map = parse_tracex_buffer('./demo_threadx.trx')
+    assert isinstance(events, TraceXTrace)
+    assert events.obj_reg_map is obj_reg_map
+    assert events.diagnostics is obj_reg_map.diagnostics
+    assert events.control_header['timer_valid_mask'] == 0xFFFF
+    # Still a list
+    assert events[:2] == list(events)[:2]
+    assert len(events) == 974
+
+
+def test_time_range():
+    # Timer wraps about every 36 events
+    events, _obj_reg_map = parse_tracex_buffer(build_trx(500, oldest_idx=44, timer_valid_mask=0xFF))
+    timestamps = [idx * 7 for idx in range(500)]
+
+    def expected_range(start, end):
+        return [e for e, timestamp in zip(events, timestamps) if start <= timestamp < end]
+
+    for start, end in [(0, 7), (10, 1000), (1000, 10), (3000, 3500), (3493, 10000), (-5, 1)]:
+        assert events.time_range(start, end) == expected_range(start, end)
+    assert events.time_range(3000) == expected_range(3000, 10000)
+    assert events.time_range(end=14) == events[:2]
+    assert events.time_range_slice(14, 28) == slice(2, 4)
+
+    # Same results if the parser already unwrapped them
+    unwrapped_events, _obj_reg_map = parse_tracex_buffer(build_trx(500, oldest_idx=44, timer_valid_mask=0xFF),
+                                                         unwrap_timestamps=True)
+    assert unwrapped_events.get_timestamps64() == timestamps
+    assert unwrapped_events.time_range_slice(10, 1000) == events.time_range_slice(10, 1000)
+
+
+def test_time_range_count_down_timer():
+    events, _obj_reg_map = parse_tracex_buffer('./demo_threadx.trx', timer_counts_down=True)
+    timestamps64 = events.get_timestamps64()
+    assert timestamps64 == sorted(timestamps64)
+    assert timestamps64[-1] - timestamps64[0] == 156206
+
+
+def test_positions():
+    events, _obj_reg_map = parse_tracex_buffer(build_trx(100))
+    for thread_obj in default_objects[:3]:
+        positions = events.by_thread(thread_obj.ptr)
+        assert positions == [pos for pos, e in enumerate(events) if e.thread_ptr == thread_obj.ptr]
+        assert all(e.thread_name == thread_obj.name.decode() for e in events.events_at(positions))
+    assert events.by_event_id(52) == [pos for pos, e in enumerate(events) if e.id == 52]
+    assert events.by_event_id(12345) == []
+    assert events.by_thread(0xDEAD) == []
+    assert sorted(events.thread_ptrs()) == [thread_obj.ptr for thread_obj in default_objects[:3]]
+
+
+def test_indexes_are_lazy_and_reset_on_change():
+    events, _obj_reg_map = parse_tracex_buffer(build_trx(20))
+    assert events._thread_positions is None and events._timestamps64 is None
+    positions = events.by_thread(default_objects[0].ptr)
+    assert events.by_thread(default_objects[0].ptr) is positions
+
+    last_event = events.pop()
+    assert events._thread_positions is None
+    assert len(events.time_range(0, 1000)) == 19
+    events.append(last_event)
+    assert len(events.time_range(0, 1000)) == 20
+    del events[:10]
+    assert events.by_event_id(last_event.id)[-1] == 9
+
+
+def test_cached_parse_returns_trace(tmp_path):
+    trx_bytes = build_trx(30)
+    for _ in range(2):
+        events, obj_reg_map = parse_tracex_buffer(trx_bytes, cache=ParseCache(tmp_path))
+        assert isinstance(events, TraceXTrace)
+        assert events.obj_reg_map is obj_reg_map
+
@@ -0,0 +1,154 @@
+"""
+Writes synthetic, but valid, TraceX buffers for tests and benchmarks.
+@see https://docs.microsoft.com/en-us/azure/rtos/tracex/chapter11
+"""
+import struct
+import sys
+from array import array
+from typing import NamedTuple, List, Optional, Sequence
+
+control_header_fmt = 'LLLHHLLLLLLL'
+obj_entry_fmt = 'BBBBLLL{name_size}s'
+event_entry_size = 32
+
+
+class TrxObject(NamedTuple):
+    ptr: int
+    name: bytes
+    obj_type: int = 1  # Thread
+    param_1: int = 0
+    param_2: int = 0
+
+
+default_objects = [
+    TrxObject(0x20001000, b'main thread'),
+    TrxObject(0x20001100, b'rx thread'),
+    TrxObject(0x20001200, b'tx thread'),
+    TrxObject(0x20001300, b'txBufferLock', obj_type=3),
+    TrxObject(0x20001340, b'uart mutex', obj_type=4),
+]
+
+# A mix of thread, ISR, semaphore, mutex and queue events
+default_event_ids = [1, 2, 3, 4, 52, 57, 68, 69, 83, 88]
+
+
+class TrxEvent(NamedTuple):
+    thread_ptr: int
+    thread_priority: int
+    event_id: int
+    time_stamp: int
+    info_fields: Sequence[int]
+
+
+def build_trx_events(events: Sequence[TrxEvent], num_entries: Optional[int] = None, oldest_idx: int = 0,
+                     objects: Optional[List[TrxObject]] = None, endian_str: str = '<',
+                     timer_valid_mask: int = 0xFFFFFFFF, base_address: int = 0x20010000,
+                     obj_name_size: int = 32) -> bytes:
+    """
+    Build a TraceX buffer holding the given events, in chronological order.
+    :param num_entries: Capacity of the circular event buffer, defaults to exactly fitting the events
+    :param oldest_idx: Entry index that the oldest event is placed at (i.e. buf_cur_ptr) if the buffer is full.
+    If there are less events than entries the buffer is filled from index 0, as ThreadX does.
+    """
+    columns = _events_to_columns(events)
+    return _build_trx(columns, len(events), num_entries, oldest_idx, objects, endian_str, timer_valid_mask,
+                      base_address, obj_name_size)
+
+
+def build_trx(num_events: int, num_entries: Optional[int] = None, oldest_idx: int = 0,
+              objects: Optional[List[TrxObject]] = None, event_ids: Optional[Sequence[int]] = None,
+              endian_str: str = '<', timer_valid_mask: int = 0xFFFFFFFF, start_timestamp: int = 0,
+              ticks_per_event: int = 7, base_address: int = 0x20010000, obj_name_size: int = 32) -> bytes:
+    """
+    Build a TraceX buffer with num_events generated events. Threads, event ids and arguments cycle through
+    the given objects and event ids, timestamps increase by ticks_per_event (and wrap with the timer valid mask).
+    Columns are filled with array slice assignments so that buffers of millions of events are quick to make.
+    """
+    objects = default_objects if objects is None else objects
+    event_ids = default_event_ids if event_ids is None else event_ids
+    thread_ptrs = [obj.ptr for obj in objects if obj.obj_type == 1] or [0xFFFFFFFF]
+    obj_ptrs = [obj.ptr for obj in objects] or [0]
+
+    columns = [
+        _cycle(thread_ptrs, num_events),
+        _cycle([(idx * 3) % 32 for idx in range(len(thread_ptrs))], num_events),
+        _cycle(event_ids, num_events),
+        array('I', ((start_timestamp + idx * ticks_per_event) & timer_valid_mask for idx in range(num_events))),
+        _cycle(obj_ptrs, num_events),
+        _cycle([0, 0xFFFFFFFF, 100], num_events),
+        array('I', range(num_events)),
+        _cycle([0x20008000, 0x20008100], num_events),
+    ]
+    return _build_trx(columns, num_events, num_entries, oldest_idx, objects, endian_str, timer_valid_mask,
+                      base_address, obj_name_size)
+
+
+def _cycle(values: Sequence[int], count: int) -> array:
+    repeated = array('I', values) * (count // len(values) + 1)
+    return repeated[:count]
+
+
+def _events_to_columns(events: Sequence[TrxEvent]) -> List[array]:
+    columns = [array('I') for _ in range(8)]
+    for event in events:
+        for column, value in zip(columns, [event.thread_ptr, event.thread_priority, event.event_id,
+                                           event.time_stamp, *event.info_fields]):
+            column.append(value)
+    return columns
+
+
+def _build_trx(columns: List[array], num_events: int, num_entries: Optional[int], oldest_idx: int,
+               objects: Optional[List[TrxObject]], endian_str: str, timer_valid_mask: int,
+               base_address: int, obj_name_size: int) -> bytes:
+    objects = default_objects if objects is None else objects
+    num_entries = num_events if num_entries is None else num_entries
+    if num_events > num_entries:
+        raise ValueError(f'{num_events} events do not fit in {num_entries} entries')
+    if num_events < num_entries:
+        # Buffer hasn't wrapped yet, the next event goes after the newest one
+        oldest_idx = 0
+        cur_idx = num_events
+    else:
+        cur_idx = oldest_idx % num_entries if num_entries else 0
+
+    # Interleave the columns into chronologically ordered entries
+    chrono_entries = array('I', bytes(num_events * event_entry_size))
+    for column_idx, column in enumerate(columns):
+        chrono_entries[column_idx::8] = column
+    if (endian_str == '<') != (sys.byteorder == 'little'):
+        chrono_entries.byteswap()
+    chrono_bytes = chrono_entries.tobytes()
+
+    # Place them in the circular buffer, the oldest event at oldest_idx
+    split_idx = (num_entries - oldest_idx) * event_entry_size
+    entries_bytes = chrono_bytes[split_idx:] + chrono_bytes[:split_idx]
+    entries_bytes += bytes((num_entries - num_events) * event_entry_size)
+
+    obj_entry_struct = struct.Struct(endian_str + obj_entry_fmt.format(name_size=obj_name_size))
+    obj_reg_bytes = b''.join(obj_entry_struct.pack(0, obj.obj_type, 0, 0, obj.ptr, obj.param_1, obj.param_2, obj.name)
+                             for obj in objects)
+
+    control_header_struct = struct.Struct(endian_str + control_header_fmt)
+    header_size = 4 + control_header_struct.size
+    obj_reg_start_ptr = base_address + header_size
+    buf_start_ptr = obj_reg_start_ptr + len(obj_reg_bytes)
+    buf_end_ptr = buf_start_ptr + num_entries * event_entry_size
+    buf_cur_ptr = buf_start_ptr + cur_idx * event_entry_size
+    control_header_bytes = control_header_struct.pack(
+        timer_valid_mask, base_address, obj_reg_start_ptr, 0, obj_name_size, buf_start_ptr,
+        buf_start_ptr, buf_end_ptr, buf_cur_ptr, 0, 0, 0)
+    magic_bytes = b'TXTB' if endian_str == '>' else b'BTXT'
+    return magic_bytes + control_header_bytes + obj_reg_bytes + entries_bytes
+
+
+def write_trx(filepath: str, trx_bytes: bytes):
+    with open(filepath, 'wb') as fp:
+        fp.write(trx_bytes)
+
+
+def event_tuples(events) -> list:
+    """
+    Everything that the parsed events hold, to compare events parsed in different ways
+    """
+    return [(type(e).__name__, e.thread_ptr, e.thread_priority, e.id, e.timestamp, e.timestamp64, e.time_ns,
+             e.raw_args, e.thread_name, dict(e.mapped_args), str(e)) for e in events]
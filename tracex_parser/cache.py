@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Optional, Dict, Tuple, NamedTuple
+
+from .events import TraceXEvent, ObjectRegistry, EventFilter
+from .trace import TraceXTrace
+from .file_parser import TraceXSource, open_tracex_buffer, _get_tracex_header, _get_event_entry_struct, \
+    _get_event_entry_range, _unpack_event_range, _iter_array_entry_values, _u32_typecode, _get_event_decoder, \
+    _decode_entries
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the cache file layout, or how the cached values are turned into events, changes
+cache_format_version = 1
+default_max_cache_bytes = 512 * 2 ** 20
+cache_file_suffix = '.trxc'
+
+# magic, format version, byte order of the event values, header size, number of event values
+_cache_file_header = struct.Struct('<4sHBxII')
+_cache_file_magic = b'TRXC'
+_byte_orders = ['little', 'big']
+
+
+def _get_parser_version() -> str:
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return 'unknown'
+    try:
+        return version('tracex_parser')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def default_cache_dir() -> str:
+    """
+    $XDG_CACHE_HOME/tracex_parser, or ~/.cache/tracex_parser
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'tracex_parser')
+
+
+class CachedTraceX(NamedTuple):
+    # The TraceX buffer up to the end of the object registry, as it is in the file
+    header: bytes
+    # Non-empty event entries in chronological order, 8 native byte order values per event
+    entries_values: array
+
+
+class ParseCache:
+    """
+    On-disk cache of unpacked TraceX buffers, keyed by the contents of the buffer and the parser version. Each entry
+    is a sidecar file holding the header and object registry as-is, and the event entries already rotated into
+    chronological order without the empty ones. Nothing in an entry depends on the custom events map, so the same
+    entry is used with any map.
+    A hit skips decompressing and unpacking the buffer, but the events still have to be created, which is most of the
+    time of a parse. It only pays off for compressed files and archive members.
+    The least recently used entries are deleted once the cache is larger than max_bytes.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = default_max_cache_bytes):
+        self.cache_dir = default_cache_dir() if cache_dir is None else os.fspath(cache_dir)
+        self.max_bytes = max_bytes
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.cache_dir!r}, max_bytes={self.max_bytes})'
+
+    def get_key(self, tracex_buf: bytes) -> str:
+        buf_digest = hashlib.blake2b(tracex_buf, digest_size=20).hexdigest()
+        key = hashlib.blake2b(digest_size=20)
+        key.update(f'{cache_format_version}:{_get_parser_version()}:{buf_digest}'.encode())
+        return key.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + cache_file_suffix)
+
+    def load(self, key: str) -> Optional[CachedTraceX]:
+        """
+        Returns the cache entry, or None if there isn't one (or it's unreadable)
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as fp:
+                magic, format_version, byte_order_idx, header_size, num_values = \
+                    _cache_file_header.unpack(fp.read(_cache_file_header.size))
+                if magic != _cache_file_magic or format_version != cache_format_version:
+                    raise ValueError(f'Not a version {cache_format_version} cache file')
+                header = fp.read(header_size)
+                if len(header) != header_size:
+                    raise ValueError('Truncated header')
+                # Event values are 4 byte aligned in the file
+                fp.read(-header_size % 4)
+                entries_values = array(_u32_typecode)
+                entries_values.fromfile(fp, num_values)
+            # Mark as recently used
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, IndexError, struct.error) as e:
+            logger.debug('Discarding unreadable cache entry %s: %s', entry_path, e)
+            self._remove(entry_path)
+            return None
+
+        if _byte_orders[byte_order_idx] != sys.byteorder:
+            entries_values.byteswap()
+        return CachedTraceX(header, entries_values)
+
+    def store(self, key: str, cached: CachedTraceX):
+        """
+        Atomically writes the cache entry, then evicts old entries if the cache is too big.
+        Failing to write to the cache isn't an error, the entry just won't be cached.
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(temp_fd, 'wb') as fp:
+                    fp.write(_cache_file_header.pack(_cache_file_magic, cache_format_version,
+                                                     _byte_orders.index(sys.byteorder), len(cached.header),
+                                                     len(cached.entries_values)))
+                    fp.write(cached.header)
+                    fp.write(bytes(-len(cached.header) % 4))
+                    cached.entries_values.tofile(fp)
+                os.replace(temp_path, self._entry_path(key))
+            except BaseException:
+                self._remove(temp_path)
+                raise
+        except OSError as e:
+            logger.debug('Could not write cache entry to %s: %s', self.cache_dir, e)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache fits in max_bytes
+        """
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as dir_entries:
+                for dir_entry in dir_entries:
+                    if not dir_entry.name.endswith(cache_file_suffix):
+                        continue
+                    try:
+                        entry_stat = dir_entry.stat()
+                    except FileNotFoundError:
+                        # Evicted by someone else
+                        continue
+                    entries.append((entry_stat.st_mtime_ns, entry_stat.st_size, dir_entry.path))
+        except FileNotFoundError:
+            return
+
+        total_size = sum(entry_size for _mtime, entry_size, _path in entries)
+        for _mtime, entry_size, entry_path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            self._remove(entry_path)
+            total_size -= entry_size
+
+    def clear(self):
+        self.max_bytes, max_bytes = 0, self.max_bytes
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def parse_tracex_buffer(self, filepath: TraceXSource, custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                            obj_name_decoding: str = 'ascii', unwrap_timestamps: bool = False,
+                            tick_hz: Optional[int] = None, timer_counts_down: bool = False,
+                            event_filter: Optional[EventFilter] = None) -> Tuple[TraceXTrace, ObjectRegistry]:
+        """
+        Same as file_parser.parse_tracex_buffer(), but the unpacked buffer is loaded from, or saved to, the cache.
+        The whole buffer is cached, so the same entry is used with any event_filter and custom_events_map.
+        """
+        with open_tracex_buffer(filepath) as tracex_buf:
+            key = self.get_key(tracex_buf)
+            cached = self.load(key)
+            if cached is None:
+                endian_str, control_header, obj_reg_map, obj_reg_end_idx = _get_tracex_header(tracex_buf,
+                                                                                               obj_name_decoding)
+                event_size = _get_event_entry_struct(endian_str).total_size()
+                num_entries, oldest_event_idx = _get_event_entry_range(control_header, event_size)
+                entries_values = _unpack_event_range(endian_str, tracex_buf, obj_reg_end_idx, num_entries,
+                                                     oldest_event_idx, 0, num_entries)
+                self.store(key, CachedTraceX(bytes(tracex_buf[:obj_reg_end_idx]), entries_values))
+
+        if cached is not None:
+            _endian_str, control_header, obj_reg_map, _obj_reg_end_idx = _get_tracex_header(cached.header,
+                                                                                            obj_name_decoding)
+            entries_values = cached.entries_values
+
+        decode_event = _get_event_decoder(custom_events_map, control_header, obj_reg_map, unwrap_timestamps, tick_hz,
+                                          timer_counts_down, event_filter)
+        tracex_events = _decode_entries(decode_event, _iter_array_entry_values(entries_values),
+                                        event_filter is not None)
+        tracex_events = TraceXTrace(tracex_events, obj_reg_map, control_header, unwrap_timestamps, timer_counts_down)
+        return tracex_events, obj_reg_map
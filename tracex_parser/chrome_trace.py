@@ -0,0 +1,150 @@
+import json
+from typing import Optional, Dict, TextIO, Union, Any
+
+from .events import TraceXEvent, special_thread_names, get_obj_reg_names
+from .file_parser import TraceXSource, iter_tracex_events, open_tracex_buffer, _get_tracex_header
+from .locks import LockAnalyzer, LockHold
+from .timeline import ThreadTimeline, TimelineInterval, interrupt_ptr, idle_ptr
+
+# Process that every track is in, a trace file only has the one CPU
+trace_pid = 1
+# json.dumps() with separators makes a new encoder every call
+_json_encoder = json.JSONEncoder(separators=(',', ':'))
+
+
+class ChromeTraceWriter:
+    """
+    Streams the Chrome trace event format (JSON object format) that Perfetto and chrome://tracing open, one trace
+    event at a time, so memory use doesn't grow with the trace.
+    @see https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+
+    Each thread (and the ISRs, and idle) gets a track named after it. Timestamps are unwrapped ticks converted to
+    microseconds with tick_hz, or 1 tick = 1 us if the frequency isn't known.
+    """
+    def __init__(self, output_fp: TextIO, tick_hz: Optional[int] = None, process_name: str = 'TraceX',
+                 thread_names: Optional[Dict[int, Optional[str]]] = None):
+        """
+        :param output_fp: Text file to write the JSON to, the JSON is only complete after close()
+        :param tick_hz: Frequency of the timer in Hz
+        :param process_name: Name shown for the process holding all of the tracks
+        :param thread_names: Names of the threads by pointer (e.g. from the object registry), for tracks of threads
+        that are seen running before they log an event
+        """
+        self.output_fp = output_fp
+        self.tick_hz = tick_hz
+        self.thread_names = thread_names if thread_names is not None else {}
+        self.num_trace_events = 0
+        # tid -> name of every track that has been named
+        self._track_names: Dict[int, str] = {}
+        self._num_holds = 0
+        output_fp.write('{"displayTimeUnit":"ns","traceEvents":[\n')
+        self.write_trace_event({'ph': 'M', 'name': 'process_name', 'pid': trace_pid, 'args': {'name': process_name}})
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.num_trace_events} trace events)'
+
+    def _to_us(self, ticks: int) -> Union[int, float]:
+        return ticks if self.tick_hz is None else ticks * 1e6 / self.tick_hz
+
+    def write_trace_event(self, trace_event: Dict[str, Any]):
+        if self.num_trace_events:
+            self.output_fp.write(',\n')
+        self.output_fp.write(_json_encoder.encode(trace_event))
+        self.num_trace_events += 1
+
+    def _get_track(self, thread_ptr: int, thread_name: Optional[str] = None) -> int:
+        """
+        :return: tid of the thread's track, which is named when it's first used
+        """
+        if thread_ptr not in self._track_names:
+            if thread_ptr == idle_ptr:
+                track_name = 'idle'
+            elif thread_ptr in special_thread_names:
+                track_name = special_thread_names[thread_ptr]
+            else:
+                if thread_name is None:
+                    thread_name = self.thread_names.get(thread_ptr)
+                track_name = thread_name if thread_name is not None else hex(thread_ptr)
+            self._track_names[thread_ptr] = track_name
+            self.write_trace_event({'ph': 'M', 'name': 'thread_name', 'pid': trace_pid, 'tid': thread_ptr,
+                                    'args': {'name': track_name}})
+        return thread_ptr
+
+    def add_event(self, tracex_event: TraceXEvent):
+        """
+        Instant event on the track of the thread that logged it
+        """
+        tid = self._get_track(tracex_event.thread_ptr, tracex_event.thread_name)
+        fn_str = tracex_event.fn_name if tracex_event.fn_name is not None else f'<TX ID#{tracex_event.id}>'
+        args = {arg_name: arg_val for arg_name, arg_val in tracex_event.mapped_args.items()
+                if not arg_name.startswith('_')}
+        self.write_trace_event({'ph': 'i', 's': 't', 'name': fn_str, 'cat': 'event', 'pid': trace_pid, 'tid': tid,
+                                'ts': self._to_us(tracex_event.timestamp64), 'args': args})
+
+    def add_interval(self, interval: TimelineInterval):
+        """
+        Slice on the track of the thread (or ISRs, or idle) that was running
+        """
+        tid = self._get_track(interval.thread_ptr)
+        if interval.thread_ptr == interrupt_ptr:
+            name = 'ISR' if interval.isr_num is None else f'ISR {interval.isr_num}'
+        else:
+            name = self._track_names[tid]
+        self.write_trace_event({'ph': 'X', 'name': name, 'cat': 'timeline', 'pid': trace_pid, 'tid': tid,
+                                'ts': self._to_us(interval.start), 'dur': self._to_us(interval.ticks)})
+
+    def add_lock_hold(self, lock_hold: LockHold, lock_name: Union[str, int, None] = None):
+        """
+        Async slice from the acquisition to the release of the lock, on a track of its own for the lock.
+        Async because holds of a semaphore can overlap, and a hold isn't on a single thread's track.
+        """
+        self._num_holds += 1
+        name = str(lock_name) if lock_name is not None else hex(lock_hold.obj_id)
+        args = {'thread': self._track_names.get(lock_hold.thread_ptr, hex(lock_hold.thread_ptr)),
+                'wait_us': self._to_us(lock_hold.wait_ticks)}
+        hold_event = {'cat': 'lock', 'name': name, 'pid': trace_pid, 'id': self._num_holds}
+        self.write_trace_event({'ph': 'b', 'ts': self._to_us(lock_hold.acquire_time), 'args': args, **hold_event})
+        self.write_trace_event({'ph': 'e', 'ts': self._to_us(lock_hold.release_time), **hold_event})
+
+    def close(self):
+        """
+        Finish the JSON, doesn't close the output file
+        """
+        self.output_fp.write('\n]}\n')
+
+
+def export_chrome_trace(filepath: TraceXSource, output_fp: TextIO,
+                        custom_events_map: Optional[Dict[int, TraceXEvent]] = None, tick_hz: Optional[int] = None,
+                        timer_counts_down: bool = False, with_events: bool = True, process_name: str = 'TraceX') \
+        -> ChromeTraceWriter:
+    """
+    Convert a TraceX file into a Chrome trace in a single pass over its events: an instant event for every event,
+    a slice for each stretch of time that a thread or ISR ran (from ThreadTimeline), and a slice for every lock
+    hold (from LockAnalyzer).
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param output_fp: Text file to write the JSON to
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    :param tick_hz: Frequency of the timer in Hz, otherwise ticks are written as microseconds
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    :param with_events: Write the instant events, otherwise only the slices
+    :param process_name: Name shown for the process holding all of the tracks, e.g. the file's name
+    """
+    # Opened once for the header and the events, so that compressed files are only decompressed once
+    with open_tracex_buffer(filepath) as tracex_buf:
+        _endian_str, _control_header, obj_reg_map, _obj_reg_end_idx = _get_tracex_header(tracex_buf)
+        chrome_trace_writer = ChromeTraceWriter(output_fp, tick_hz, process_name,
+                                                get_obj_reg_names(obj_reg_map).names)
+        timeline = ThreadTimeline(on_interval=chrome_trace_writer.add_interval)
+        lock_analyzer = LockAnalyzer(on_hold=lambda lock_hold: chrome_trace_writer.add_lock_hold(
+            lock_hold, lock_analyzer.locks[lock_hold.obj_id].obj_name))
+
+        for tracex_event in iter_tracex_events(tracex_buf, custom_events_map, unwrap_timestamps=True,
+                                               timer_counts_down=timer_counts_down):
+            timeline.add_event(tracex_event)
+            lock_analyzer.add_event(tracex_event)
+            if with_events:
+                chrome_trace_writer.add_event(tracex_event)
+    timeline.finish()
+    chrome_trace_writer.close()
+    return chrome_trace_writer
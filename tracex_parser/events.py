@@ -1,6 +1,11 @@
-from typing import Optional, Dict, List, Union, Any, ClassVar
+import logging
+import sys
+from collections.abc import Mapping
+from typing import Optional, Dict, List, Union, ClassVar, Iterable, Sequence, Tuple, Callable
 
-from .helpers import TraceXEventException, CStruct, TextColour
+from .helpers import TraceXEventException, CStructRecord, TextColour, ParseDiagnostics
+
+logger = logging.getLogger(__name__)
 
 
 class CommonArg:
@@ -18,24 +23,166 @@ class CommonArg:
     next_thread = 'next_thread'
 
 
+# @see https://docs.microsoft.com/en-us/azure/rtos/tracex/chapter11#thread-pointer
+special_thread_names = {
+    0xFFFFFFFF: 'INTERRUPT',
+    0xF0F0F0F0: 'INITIALIZATION',
+}
+
+
+# Policies for decoding object registry names: policy -> (encoding, errors)
+obj_name_decodings = {
+    'ascii': ('ascii', 'strict'),
+    'latin-1': ('latin-1', 'strict'),
+    'replace': ('ascii', 'replace'),
+}
+
+
+class ObjectRegistryNames:
+    """
+    Table of object pointer -> object name. Every name in the registry is decoded once up front
+    and interned, so looking up a name is a single dict probe and all events share the same strings.
+    """
+    __slots__ = ('names', 'diagnostics')
+
+    def __init__(self, obj_reg_map: Dict[int, CStructRecord], obj_name_decoding: str = 'ascii',
+                 diagnostics: Optional[ParseDiagnostics] = None):
+        if obj_name_decoding not in obj_name_decodings:
+            raise ValueError(f'Unknown object name decoding {obj_name_decoding}, '
+                             f'must be one of {list(obj_name_decodings.keys())}')
+        encoding, errors = obj_name_decodings[obj_name_decoding]
+        self.diagnostics = diagnostics if diagnostics is not None else ParseDiagnostics()
+
+        self.names: Dict[int, Optional[str]] = {}
+        for obj_ptr, obj in obj_reg_map.items():
+            raw_obj_name = obj['thread_reg_entry_obj_name']
+            try:
+                self.names[obj_ptr] = sys.intern(raw_obj_name.decode(encoding, errors))
+            except UnicodeDecodeError:
+                logger.debug('Could not decode %s into %s', raw_obj_name, encoding)
+                self.diagnostics.undecodable_names[obj_ptr] = raw_obj_name
+                self.names[obj_ptr] = None
+
+    def get(self, key_ptr: int) -> Optional[str]:
+        return self.names.get(key_ptr)
+
+
+class ObjectRegistry(dict):
+    """
+    Dict of object pointer -> object registry entry, which also carries the decoded object names.
+    """
+    def __init__(self, obj_reg_entries: Dict[int, CStructRecord], obj_name_decoding: str = 'ascii',
+                 diagnostics: Optional[ParseDiagnostics] = None):
+        super().__init__(obj_reg_entries)
+        self.names = ObjectRegistryNames(self, obj_name_decoding, diagnostics)
+
+    @property
+    def diagnostics(self) -> ParseDiagnostics:
+        """
+        Problems found in this registry, and while mapping events with it
+        """
+        return self.names.diagnostics
+
+
+class MappedArgs(Mapping):
+    """
+    Read-only dict-like view of an event's arguments, keyed by the event class' arg_map.
+    The argument names are shared by every event of the same class, only the values are stored per event.
+    """
+    __slots__ = ('_event',)
+
+    def __init__(self, event: 'TraceXEvent'):
+        self._event = event
+
+    def __getitem__(self, arg_name: str) -> Union[int, str]:
+        return self._event._get_mapped_vals()[self._event._arg_index[arg_name]]
+
+    def __setitem__(self, arg_name: str, arg_val: Union[int, str]):
+        # Kept so that code which modified the old mapped_args dict still works
+        mapped_vals = list(self._event._get_mapped_vals())
+        mapped_vals[self._event._arg_index[arg_name]] = arg_val
+        self._event._mapped_vals = tuple(mapped_vals)
+
+    def __iter__(self):
+        return iter(self._event._arg_index)
+
+    def __len__(self):
+        return len(self._event._arg_index)
+
+    def __repr__(self):
+        return repr(self._event._args_dict(self._event._get_mapped_vals()))
+
+
 class TraceXEvent:
     """
     Base class for TraceX events. It can be instantiated directly but
     the function and argument names will not be meaningful.
     """
+    __slots__ = ('thread_ptr', 'thread_priority', 'id', 'timestamp', 'timestamp64', 'time_ns', '_thread_name',
+                 '_raw_args', '_mapped_vals', '_pending_obj_reg')
+
     fn_name: Optional[str] = None
     # Underscore in the arg map means don't print it, by default print all args
     arg_map: List[str] = ['arg1', 'arg2', 'arg3', 'arg4']
+    # arg name -> index into the args, generated from arg_map
+    _arg_index: Dict[str, int] = {'arg1': 0, 'arg2': 1, 'arg3': 2, 'arg4': 3}
 
-    def __init__(self, thread_ptr: int, thread_priority: int, event_id: int, timestamp: int, fn_args: List[int]):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if len(cls.arg_map) != 4:
+            raise TraceXEventException(f'{cls.__name__} arg map must have exactly 4 entries: {cls.arg_map}')
+        cls._arg_index = {arg_name: arg_idx for arg_idx, arg_name in enumerate(cls.arg_map)}
+
+    def __init__(self, thread_ptr: int, thread_priority: int, event_id: int, timestamp: int, fn_args: Sequence[int]):
         self.thread_ptr = thread_ptr
         self.thread_priority = thread_priority
         self.id = event_id
         self.timestamp = timestamp
-        self.raw_args: List[int] = fn_args
+        # Timestamp that keeps counting up when the timer wraps, only different if unwrapping was requested
+        self.timestamp64 = timestamp
+        # Time since the timer's zero, only set if the tick frequency is known
+        self.time_ns: Optional[int] = None
+        self._raw_args: Tuple[int, ...] = tuple(fn_args)
+
+        self._thread_name: Optional[str] = None
+        # Until the object registry is applied the mapped args are the raw args
+        self._mapped_vals: Tuple[Union[int, str], ...] = self._raw_args
+        # Object registry to apply on first access of thread_name or mapped_args
+        self._pending_obj_reg: Optional[ObjectRegistryNames] = None
+
+    @property
+    def raw_args(self) -> List[int]:
+        return list(self._raw_args)
+
+    @raw_args.setter
+    def raw_args(self, fn_args: Sequence[int]):
+        self._raw_args = tuple(fn_args)
+
+    @property
+    def mapped_args(self) -> MappedArgs:
+        return MappedArgs(self)
 
-        self.thread_name: Optional[str] = None
-        self.mapped_args: Dict[str, Union[int, str]] = self._generate_arg_dict(self.arg_map)
+    @mapped_args.setter
+    def mapped_args(self, mapped_args: Dict[str, Union[int, str]]):
+        self._get_mapped_vals()  # Don't let a pending object registry overwrite these later
+        self._mapped_vals = tuple(mapped_args[arg_name] for arg_name in self.arg_map)
+
+    @property
+    def thread_name(self) -> Optional[str]:
+        if self._pending_obj_reg is not None:
+            self._apply_pending_object_registry()
+        return self._thread_name
+
+    @thread_name.setter
+    def thread_name(self, thread_name: Optional[str]):
+        if self._pending_obj_reg is not None:
+            self._apply_pending_object_registry()
+        self._thread_name = thread_name
+
+    def _get_mapped_vals(self) -> Tuple[Union[int, str], ...]:
+        if self._pending_obj_reg is not None:
+            self._apply_pending_object_registry()
+        return self._mapped_vals
 
     def as_str(self, txt_colour: Optional[TextColour] = None):
         # So we don't have to worry about checking if colours are valid
@@ -44,10 +191,11 @@ class TraceXEvent:
         else:
             colour = txt_colour
 
-        thread_str = self.thread_name if self.thread_name is not None else self.thread_ptr
+        thread_name = self.thread_name
+        thread_str = thread_name if thread_name is not None else self.thread_ptr
         fn_str = self.fn_name if self.fn_name is not None else f'<TX ID#{self.id}>'
         arg_strs = []
-        for arg_name, arg_val in self.mapped_args.items():
+        for arg_name, arg_val in self._args_dict(self._get_mapped_vals()).items():
             if arg_name.startswith('_'):
                 # Don't print arg names that start with an underscore
                 continue
@@ -65,54 +213,83 @@ class TraceXEvent:
     def __repr__(self):
         return self.as_str(None)
 
-    def _generate_arg_dict(self, arg_names: List[str]) -> Dict[str, Any]:
-        if len(self.arg_map) != 4:
-            raise TraceXEventException(f'{self.__class__.__name__} arg map must have exactly 4 entries: {self.arg_map}')
-        return {k: v for k, v in zip(arg_names, self.raw_args)}
+    def _args_dict(self, arg_vals: Sequence[Union[int, str]]) -> Dict[str, Union[int, str]]:
+        return {arg_name: arg_vals[arg_idx] for arg_name, arg_idx in self._arg_index.items()}
 
-    def _map_ptr_to_obj_reg_name(self, obj_reg_map: Dict[int, CStruct], key_ptr: int) -> Optional[str]:
-        if key_ptr in obj_reg_map:
-            raw_obj_name = obj_reg_map[key_ptr]['thread_reg_entry_obj_name']
-            try:
-                return raw_obj_name.decode('ASCII')
-            except UnicodeDecodeError:
-                print(f'{self.__class__.__name__}: Could not decode {raw_obj_name} into ascii')
-                return None
-        print(f'Cant find {hex(key_ptr)} in objreg')
-        return None
+    def defer_object_registry(self, obj_reg_names: ObjectRegistryNames):
+        """
+        Apply the object registry lazily, the first time thread_name or mapped_args is accessed
+        """
+        self._pending_obj_reg = obj_reg_names
+
+    def apply_object_registry(self, obj_reg_map: Union[Dict[int, CStructRecord], ObjectRegistryNames]):
+        self._pending_obj_reg = get_obj_reg_names(obj_reg_map)
+        self._resolve_object_registry()
+
+    def _apply_pending_object_registry(self):
+        obj_reg_names = self._pending_obj_reg
+        self._pending_obj_reg = None
+        # Through apply_object_registry() so that subclasses that override it are applied lazily too
+        self.apply_object_registry(obj_reg_names)
 
-    def apply_object_registry(self, obj_reg_map: Dict[int, CStruct]):
-        # Change mapped arguments to strings if they can be found in the registry
+    def _resolve_object_registry(self):
+        obj_reg_names = self._pending_obj_reg
+        self._pending_obj_reg = None
+
+        # Change mapped arguments to strings if they can be found in the registry. Always from the raw args, so that
+        # applying a registry again doesn't look the names up as pointers.
+        mapped_vals = list(self._raw_args)
         args_to_map = [CommonArg.obj_id, CommonArg.thread_ptr, CommonArg.next_thread]
         for arg_to_map in args_to_map:
-            if arg_to_map in self.mapped_args.keys():
-                obj_reg_name = self._map_ptr_to_obj_reg_name(obj_reg_map, self.mapped_args[arg_to_map])
+            if arg_to_map in self._arg_index:
+                arg_idx = self._arg_index[arg_to_map]
+                obj_reg_name = obj_reg_names.get(mapped_vals[arg_idx])
                 if obj_reg_name is not None:
-                    self.mapped_args[arg_to_map] = obj_reg_name
+                    mapped_vals[arg_idx] = obj_reg_name
                 else:
-                    print(f'Failed to map {arg_to_map} in {self.__class__.__name__}:{self.mapped_args}')
+                    obj_reg_names.diagnostics.add_unresolved(mapped_vals[arg_idx], arg_to_map)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug('Failed to map %s %s in %s:%s', arg_to_map, hex(mapped_vals[arg_idx]),
+                                     self.__class__.__name__, self._args_dict(mapped_vals))
 
         # Make the thread names nicer
         # @see https://docs.microsoft.com/en-us/azure/rtos/tracex/chapter11#thread-pointer
-        if self.thread_ptr == 0xFFFFFFFF:
-            self.thread_name = 'INTERRUPT'
-        elif self.thread_ptr == 0xF0F0F0F0:
-            self.thread_name = 'INITIALIZATION'
+        if self.thread_ptr in special_thread_names:
+            self._thread_name = special_thread_names[self.thread_ptr]
         else:
             # Try to find time slice thread_ptr in the registry
-            obj_reg_name = self._map_ptr_to_obj_reg_name(obj_reg_map, self.thread_ptr)
+            obj_reg_name = obj_reg_names.get(self.thread_ptr)
             if obj_reg_name is not None:
-                self.thread_name = obj_reg_name
+                self._thread_name = obj_reg_name
             else:
-                print(f'Failed to map thread_ptr in {self.__class__.__name__}:{self.mapped_args}')
+                obj_reg_names.diagnostics.add_unresolved(self.thread_ptr, CommonArg.thread_ptr)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Failed to map thread_ptr %s in %s:%s',
+                                 hex(self.thread_ptr), self.__class__.__name__, self._args_dict(mapped_vals))
 
         # Make timeouts nicer
-        if CommonArg.timeout in self.mapped_args.keys():
+        if CommonArg.timeout in self._arg_index:
+            arg_idx = self._arg_index[CommonArg.timeout]
             # Replace if it's in the lookup, no replacement otherwise
-            self.mapped_args[CommonArg.timeout] = {
+            mapped_vals[arg_idx] = {
                 0: 'NoWait',
                 0xFFFFFFFF: 'WaitForever',
-            }.get(self.mapped_args[CommonArg.timeout], self.mapped_args[CommonArg.timeout])
+            }.get(mapped_vals[arg_idx], mapped_vals[arg_idx])
+
+        mapped_vals = tuple(mapped_vals)
+        # Share the raw args tuple if nothing was actually mapped
+        self._mapped_vals = self._raw_args if mapped_vals == self._raw_args else mapped_vals
+
+
+def get_obj_reg_names(obj_reg_map: Union[Dict[int, CStructRecord], ObjectRegistryNames]) -> ObjectRegistryNames:
+    """
+    Get the decoded names of an object registry, only decoding them if they haven't been already
+    """
+    if isinstance(obj_reg_map, ObjectRegistryNames):
+        return obj_reg_map
+    if isinstance(obj_reg_map, ObjectRegistry):
+        return obj_reg_map.names
+    return ObjectRegistryNames(obj_reg_map)
 
 
 def tracex_event_factory(class_name: str, fn_name: Optional[str] = None, arg_map: Optional[List] = None,
@@ -128,6 +305,8 @@ def tracex_event_factory(class_name: str, fn_name: Optional[str] = None, arg_map
         class_params = {
             'fn_name': funct_name,
         }
+    # No per-instance __dict__, events only hold what's in TraceXEvent.__slots__
+    class_params['__slots__'] = ()
     return type(class_name, (TraceXEvent,), class_params)
 
 
@@ -206,28 +385,194 @@ event_id_map = {
 }
 
 
+class TimestampUnwrapper:
+    """
+    Turns the timer's masked timestamps into ones that keep counting up, by counting how many times the timer has
+    wrapped. Timestamps have to be given in buffer order. If the timer wraps more than once between two events it
+    can't be noticed, so the unwrapped timestamps are only correct if events are more frequent than that.
+    Timers that count down (e.g. SysTick) are unwrapped into the number of ticks counted since the timer was at its
+    maximum, so they count up as well.
+    """
+    __slots__ = ('timer_valid_mask', 'counts_down', 'modulus', 'wrap_offset', 'last_timestamp')
+
+    def __init__(self, timer_valid_mask: int = 0xFFFFFFFF, counts_down: bool = False):
+        self.timer_valid_mask = timer_valid_mask
+        self.counts_down = counts_down
+        # Timestamps are masked, so the timer wraps at the mask + 1
+        self.modulus = timer_valid_mask + 1
+        self.wrap_offset = 0
+        self.last_timestamp = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.wrap_offset // self.modulus} wraps)'
+
+    def unwrap(self, timestamp: int) -> int:
+        if self.counts_down:
+            timestamp = self.timer_valid_mask - timestamp
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            self.wrap_offset += self.modulus
+        self.last_timestamp = timestamp
+        return timestamp + self.wrap_offset
+
+
+class EventFilter:
+    """
+    Which events to keep while parsing. Checked against the raw event entries, before any event is created.
+    Every condition that is given has to match.
+    """
+    __slots__ = ('event_ids', 'thread_ptrs', 'time_range')
+
+    def __init__(self, event_ids: Optional[Iterable[int]] = None, thread_ptrs: Optional[Iterable[int]] = None,
+                 time_range: Optional[Tuple[Optional[int], Optional[int]]] = None):
+        """
+        :param event_ids: Only keep events with these ids
+        :param thread_ptrs: Only keep events of these threads (or special_thread_names pointers)
+        :param time_range: (start, end) timestamps to keep events from start up to (not including) end, either can
+        be None. Compared against timestamp64 if the timestamps are unwrapped, otherwise the masked timestamp.
+        """
+        self.event_ids = frozenset(event_ids) if event_ids is not None else None
+        self.thread_ptrs = frozenset(thread_ptrs) if thread_ptrs is not None else None
+        self.time_range = tuple(time_range) if time_range is not None else None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(event_ids={self.event_ids}, thread_ptrs={self.thread_ptrs}, ' \
+               f'time_range={self.time_range})'
+
+
+class EventDecoder:
+    """
+    Per-parse event id -> event class lookup. The built-in and custom events are merged into one flat table
+    indexed by event id, with custom events taking priority, so finding an event's class is one list index.
+    """
+    __slots__ = ('class_table', 'custom_events_map', 'timer_valid_mask', 'obj_reg_names', 'timestamp_unwrapper',
+                 'tick_hz', 'event_filter')
+    # Event ids are 16 bit in practice, anything larger falls back to a dict lookup
+    table_size = 0x10000
+
+    def __init__(self, custom_events_map: Optional[Dict[int, TraceXEvent]] = None, timer_valid_mask: int = 0xFFFFFFFF,
+                 obj_reg_names: Optional[ObjectRegistryNames] = None,
+                 timestamp_unwrapper: Optional[TimestampUnwrapper] = None, tick_hz: Optional[int] = None,
+                 event_filter: Optional[EventFilter] = None):
+        """
+        :param timestamp_unwrapper: Sets the events' timestamp64, events have to be decoded in buffer order
+        :param tick_hz: Frequency of the timer in Hz, sets the events' time_ns
+        :param event_filter: Events to keep, the decoder returns None for the rest
+        """
+        self.custom_events_map = custom_events_map if custom_events_map else {}
+        self.timer_valid_mask = timer_valid_mask
+        self.obj_reg_names = obj_reg_names
+        self.timestamp_unwrapper = timestamp_unwrapper
+        self.tick_hz = tick_hz
+        self.event_filter = event_filter
+
+        self.class_table = [TraceXEvent] * self.table_size
+        for events_map in [event_id_map, self.custom_events_map]:
+            for event_id, event_class in events_map.items():
+                if 0 <= event_id < self.table_size:
+                    self.class_table[event_id] = event_class
+
+    def get_event_class(self, event_id: int) -> ClassVar:
+        if event_id < self.table_size:
+            return self.class_table[event_id]
+        return self.custom_events_map.get(event_id, TraceXEvent)
+
+    def get_decoder(self) -> Callable[[Tuple[int, ...]], Optional[TraceXEvent]]:
+        """
+        Get a function that creates an event straight from the raw entry values:
+        (thread_ptr, thread_priority, event_id, time_stamp, info_field_1, ..., info_field_4)
+        If there is an event filter the function returns None for the events that don't match it.
+        This is the innermost loop of the parser, so everything it needs is bound locally.
+        """
+        class_table = self.class_table
+        table_size = self.table_size
+        get_event_class = self.get_event_class
+        timer_valid_mask = self.timer_valid_mask
+        obj_reg_names = self.obj_reg_names
+
+        def decode_event(entry_values: Tuple[int, ...]) -> TraceXEvent:
+            event_id = entry_values[2]
+            event_class = class_table[event_id] if event_id < table_size else get_event_class(event_id)
+            x_event = event_class(entry_values[0], entry_values[1], event_id,
+                                  entry_values[3] & timer_valid_mask, entry_values[4:])
+            # The object registry is applied lazily, decoded names are shared between all the events
+            x_event._pending_obj_reg = obj_reg_names
+            return x_event
+
+        if self.timestamp_unwrapper is None and self.tick_hz is None and self.event_filter is None:
+            return decode_event
+
+        # Only pay for the timestamp conversions and filtering if they're wanted
+        unwrap = self.timestamp_unwrapper.unwrap if self.timestamp_unwrapper is not None else None
+        tick_hz = self.tick_hz
+        if self.event_filter is not None:
+            return self._get_filtered_decoder(decode_event, unwrap, tick_hz)
+
+        def decode_timed_event(entry_values: Tuple[int, ...]) -> TraceXEvent:
+            x_event = decode_event(entry_values)
+            if unwrap is not None:
+                x_event.timestamp64 = unwrap(x_event.timestamp)
+            if tick_hz is not None:
+                x_event.time_ns = x_event.timestamp64 * 1_000_000_000 // tick_hz
+            return x_event
+        return decode_timed_event
+
+    def _get_filtered_decoder(self, decode_event: Callable[[Tuple[int, ...]], TraceXEvent],
+                              unwrap: Optional[Callable[[int], int]], tick_hz: Optional[int]) \
+            -> Callable[[Tuple[int, ...]], Optional[TraceXEvent]]:
+        event_ids = self.event_filter.event_ids
+        thread_ptrs = self.event_filter.thread_ptrs
+        time_range = self.event_filter.time_range
+        timer_valid_mask = self.timer_valid_mask
+        start_time, end_time = time_range if time_range is not None else (None, None)
+        if start_time is None:
+            start_time = 0
+        if end_time is None:
+            end_time = float('inf')
+
+        if unwrap is None and tick_hz is None and time_range is None:
+            # Most common case, only look at the ids and threads
+            def decode_filtered_event(entry_values: Tuple[int, ...]) -> Optional[TraceXEvent]:
+                if event_ids is not None and entry_values[2] not in event_ids:
+                    return None
+                if thread_ptrs is not None and entry_values[0] not in thread_ptrs:
+                    return None
+                return decode_event(entry_values)
+            return decode_filtered_event
+
+        def decode_filtered_timed_event(entry_values: Tuple[int, ...]) -> Optional[TraceXEvent]:
+            # Every entry has to be unwrapped, to count the timer wraps of the filtered out events as well
+            timestamp64 = entry_values[3] & timer_valid_mask
+            if unwrap is not None:
+                timestamp64 = unwrap(timestamp64)
+            if event_ids is not None and entry_values[2] not in event_ids:
+                return None
+            if thread_ptrs is not None and entry_values[0] not in thread_ptrs:
+                return None
+            if not start_time <= timestamp64 < end_time:
+                return None
+            x_event = decode_event(entry_values)
+            x_event.timestamp64 = timestamp64
+            if tick_hz is not None:
+                x_event.time_ns = timestamp64 * 1_000_000_000 // tick_hz
+            return x_event
+        return decode_filtered_timed_event
+
+
 def convert_event(raw_event, custom_events_map: Optional[Dict] = None) -> TraceXEvent:
     event_id = raw_event['event_id']
-    raw_event_args = [raw_event['info_field_1'], raw_event['info_field_2'],
-                      raw_event['info_field_3'], raw_event['info_field_4']]
-
-    args = [raw_event['thread_ptr'], raw_event['thread_priority'], event_id,
-            raw_event['time_stamp'], raw_event_args]
     if custom_events_map and event_id in custom_events_map:
         # Check custom events first
-        return custom_events_map[event_id](*args)
-    elif event_id in event_id_map:
-        return event_id_map[event_id](*args)
+        event_class = custom_events_map[event_id]
     else:
-        # We don't have a lookup, create a base event
-        return TraceXEvent(*args)
+        # If we don't have a lookup, create a base event
+        event_class = event_id_map.get(event_id, TraceXEvent)
+    return event_class(raw_event['thread_ptr'], raw_event['thread_priority'], event_id, raw_event['time_stamp'],
+                       (raw_event['info_field_1'], raw_event['info_field_2'],
+                        raw_event['info_field_3'], raw_event['info_field_4']))
 
 
-def convert_events(raw_events: List, obj_reg_map: Dict[int, CStruct],
+def convert_events(raw_events: Iterable, obj_reg_map: Dict[int, CStructRecord],
                    custom_events_map: Optional[Dict[int, TraceXEvent]] = None) -> List[TraceXEvent]:
-    x_events = []
-    for raw_event in raw_events:
-        x_event = convert_event(raw_event, custom_events_map)
-        x_event.apply_object_registry(obj_reg_map)
-        x_events.append(x_event)
-    return x_events
+    decode_event = EventDecoder(custom_events_map, obj_reg_names=get_obj_reg_names(obj_reg_map)).get_decoder()
+    # Records are in the same order as the raw entry values
+    return [decode_event(tuple(raw_event.values())) for raw_event in raw_events]
@@ -0,0 +1,252 @@
+import bisect
+import colorsys
+import functools
+import os
+import zlib
+from typing import Optional, Dict, List, Iterable, NamedTuple, Sequence, Union, Any
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+from .events import TraceXEvent, CommonArg
+from .file_parser import TraceXSource, iter_tracex_events
+from .patterns import EventPattern, PatternMatcher
+
+# Rows per worksheet that Excel can open, including the header row
+excel_max_rows = 1048576
+header_row = ['time', 'actor', 'event']
+# Width of the header_row columns, in characters
+column_widths = [12, 24, 100]
+custom_event_id_start = 4096
+
+
+class MetaPattern(NamedTuple):
+    """
+    Pattern whose matching rows are marked in meta columns. The pattern's name is formatted with its Var bindings
+    (e.g. ``'{mutex}'``) to name each match.
+    """
+    pattern: EventPattern
+    # '#rrggbb' background colour of the matched rows
+    colour: str
+
+
+class MetaSection(NamedTuple):
+    name: str
+    bg_colour: str
+    # Positions of the first and last events of the section
+    start_idx: int
+    end_idx: int
+
+
+@functools.lru_cache(maxsize=4096)
+def hash_colour(value: Any) -> str:
+    """
+    Colour that is always the same for the same value, as '#rrggbb'
+    """
+    # Not a security hash, which FIPS builds would refuse (e.g. md5)
+    hue = (zlib.crc32(str(value).encode()) & 0xFFFF) / 0x10000
+    red, green, blue = colorsys.hls_to_rgb(hue, 0.4, 0.7)
+    return f'#{round(red * 255):02x}{round(green * 255):02x}{round(blue * 255):02x}'
+
+
+def shift_hue(colour: str, hue_offset: float) -> str:
+    """
+    :param colour: '#rrggbb' colour
+    :param hue_offset: Fraction of the colour wheel to rotate the hue by
+    """
+    hue, lightness, saturation = colorsys.rgb_to_hls(*(int(colour[idx:idx + 2], 16) / 255 for idx in (1, 3, 5)))
+    red, green, blue = colorsys.hls_to_rgb((hue + hue_offset) % 1.0, lightness, saturation)
+    return f'#{round(red * 255):02x}{round(green * 255):02x}{round(blue * 255):02x}'
+
+
+class FormatCache:
+    """
+    Creates one workbook format per distinct set of format properties, instead of one per cell
+    """
+    def __init__(self, workbook: 'xlsxwriter.Workbook'):
+        self.workbook = workbook
+        self._formats: Dict[tuple, 'xlsxwriter.format.Format'] = {}
+
+    def __len__(self):
+        return len(self._formats)
+
+    def get(self, **properties: Any) -> 'xlsxwriter.format.Format':
+        key = tuple(sorted(properties.items()))
+        cell_format = self._formats.get(key)
+        if cell_format is None:
+            cell_format = self.workbook.add_format(properties)
+            self._formats[key] = cell_format
+        return cell_format
+
+
+def match_meta_sections(events: Iterable[TraceXEvent], meta_patterns: Sequence[MetaPattern],
+                        custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                        obj_names: Optional[Dict[int, str]] = None) -> List[MetaSection]:
+    """
+    Match every meta pattern in one pass over the events
+    :return: Meta sections of each pattern in turn, by start. Neighbouring sections alternate between two shades of
+    the pattern's colour, so that they can be told apart.
+    """
+    obj_names = obj_names if obj_names is not None else {}
+    pattern_matcher = PatternMatcher([meta_pattern.pattern for meta_pattern in meta_patterns], custom_events_map)
+    pattern_idxs = {meta_pattern.pattern.name: pattern_idx for pattern_idx, meta_pattern in enumerate(meta_patterns)}
+    pattern_matches = sorted(pattern_matcher.match(events),
+                             key=lambda match: (pattern_idxs[match.pattern_name], match.start_idx))
+
+    meta_sections = []
+    for meta_idx, pattern_match in enumerate(pattern_matches):
+        bindings = {var_name: obj_names.get(var_val, var_val) for var_name, var_val in pattern_match.bindings.items()}
+        hue_offset = -0.03 if meta_idx % 2 == 0 else 0.03
+        bg_colour = shift_hue(meta_patterns[pattern_idxs[pattern_match.pattern_name]].colour, hue_offset)
+        meta_sections.append(MetaSection(pattern_match.pattern_name.format(**bindings), bg_colour,
+                                         pattern_match.start_idx, pattern_match.end_idx))
+    return meta_sections
+
+
+class ExcelExporter:
+    """
+    Writes events into a workbook row by row, in xlsxwriter's constant memory mode: each row is flushed to disk
+    before the next one is written, so memory use doesn't grow with the trace. A new worksheet is started whenever
+    one is full (``max_rows``, Excel's limit by default).
+
+    Every event is one row of time, actor and event, with the actor and object arguments coloured by their name.
+    Rows inside meta sections get a cell for each of them after the event.
+    """
+    def __init__(self, output_filepath: Union[str, os.PathLike], meta_sections: Sequence[MetaSection] = (),
+                 obj_names: Optional[Dict[int, str]] = None, max_rows: int = excel_max_rows):
+        """
+        :param meta_sections: Meta sections of the events, by their position in the events that will be written
+        :param obj_names: Names of objects that aren't in the object registry, by pointer
+        :param max_rows: Rows per worksheet, including the header row
+        """
+        if xlsxwriter is None:
+            raise ImportError('ExcelExporter requires xlsxwriter to be installed')
+        if max_rows < 2:
+            raise ValueError(f'Worksheets need room for the header and an event, not {max_rows} rows')
+        self.workbook = xlsxwriter.Workbook(os.fspath(output_filepath), {'constant_memory': True})
+        self.formats = FormatCache(self.workbook)
+        self.obj_names = obj_names if obj_names is not None else {}
+        self.max_rows = max_rows
+        self.worksheets = []
+        self.num_events = 0
+        self._worksheet = None
+        self._row = max_rows
+        # Sections that haven't started yet, by start. Sections that are running, in meta index order.
+        self._pending_sections = sorted(enumerate(meta_sections), key=lambda indexed: indexed[1].start_idx,
+                                        reverse=True)
+        self._active_sections: List[tuple] = []
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.num_events} events, {len(self.worksheets)} worksheets)'
+
+    def _add_worksheet(self):
+        sheet_num = len(self.worksheets) + 1
+        self._worksheet = self.workbook.add_worksheet('events' if sheet_num == 1 else f'events {sheet_num}')
+        self.worksheets.append(self._worksheet)
+        for col, column_width in enumerate(column_widths):
+            self._worksheet.set_column(col, col, column_width)
+        self._worksheet.freeze_panes(1, 0)
+        header_format = self.formats.get(bold=True)
+        for col, column_name in enumerate(header_row):
+            self._worksheet.write_string(0, col, column_name, header_format)
+        self._row = 1
+
+    def _write_event_cell(self, row: int, tracex_event: TraceXEvent):
+        fn_str = str(tracex_event.id if tracex_event.fn_name is None else tracex_event.fn_name)
+        # Alternating formats and strings, a format applies to the string after it
+        cell_parts: List[Any] = []
+        if tracex_event.id >= custom_event_id_start:
+            cell_parts += [self.formats.get(bold=True), fn_str, '(']
+        else:
+            cell_parts.append(fn_str + '(')
+        arg_strs = []
+        for arg_name, arg_val in tracex_event.mapped_args.items():
+            if arg_name.startswith('_'):
+                # Don't print arg names that start with an underscore, like as_str()
+                continue
+            if isinstance(arg_val, int):
+                arg_val = self.obj_names.get(arg_val, hex(arg_val)) if arg_name == CommonArg.obj_id else hex(arg_val)
+            arg_strs.append((arg_name, arg_val))
+        for arg_num, (arg_name, arg_val) in enumerate(arg_strs):
+            separator = ',' if arg_num < len(arg_strs) - 1 else ''
+            if arg_name == CommonArg.obj_id:
+                cell_parts += [self.formats.get(font_color=hash_colour(arg_val)), f'{arg_name}={arg_val}', separator]
+            elif isinstance(cell_parts[-1], str):
+                cell_parts[-1] += f'{arg_name}={arg_val}{separator}'
+            else:
+                cell_parts.append(f'{arg_name}={arg_val}{separator}')
+        if isinstance(cell_parts[-1], str):
+            cell_parts[-1] += ')'
+        else:
+            cell_parts.append(')')
+
+        # Empty strings can't be written
+        cell_parts = [cell_part for cell_part in cell_parts if cell_part != '']
+        if any(not isinstance(cell_part, str) for cell_part in cell_parts):
+            self._worksheet.write_rich_string(row, 2, *cell_parts)
+        else:
+            self._worksheet.write_string(row, 2, ''.join(cell_parts))
+
+    def write_event(self, tracex_event: TraceXEvent):
+        if self._row >= self.max_rows:
+            self._add_worksheet()
+        row = self._row
+        self._row += 1
+        event_idx = self.num_events
+        self.num_events += 1
+        worksheet = self._worksheet
+
+        worksheet.write_number(row, 0, tracex_event.timestamp)
+        thread_name = tracex_event.thread_name
+        thread_str = str(thread_name if thread_name is not None else hex(tracex_event.thread_ptr))
+        worksheet.write_string(row, 1, thread_str, self.formats.get(font_color=hash_colour(thread_str)))
+        self._write_event_cell(row, tracex_event)
+
+        pending_sections = self._pending_sections
+        while pending_sections and pending_sections[-1][1].start_idx <= event_idx:
+            bisect.insort(self._active_sections, pending_sections.pop())
+        if self._active_sections:
+            self._active_sections = [(meta_idx, meta_section) for meta_idx, meta_section in self._active_sections
+                                     if meta_section.end_idx >= event_idx]
+            for col, (meta_idx, meta_section) in enumerate(self._active_sections, start=len(header_row)):
+                worksheet.write_string(row, col, f'{meta_section.name}|{meta_idx}',
+                                       self.formats.get(bg_color=meta_section.bg_colour))
+
+    def write_events(self, tracex_events: Iterable[TraceXEvent]):
+        write_event = self.write_event
+        for tracex_event in tracex_events:
+            write_event(tracex_event)
+
+    def close(self):
+        if not self.worksheets:
+            self._add_worksheet()
+        self.workbook.close()
+
+
+def export_excel(filepath: TraceXSource, output_filepath: Union[str, os.PathLike],
+                 custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                 meta_patterns: Sequence[MetaPattern] = (), obj_names: Optional[Dict[int, str]] = None,
+                 max_rows: int = excel_max_rows) -> ExcelExporter:
+    """
+    Convert a TraceX file into an Excel workbook, streaming the events from the file into the workbook.
+    If there are meta patterns the events are streamed twice, once to match them and once to write the rows.
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param output_filepath: Path of the .xlsx file to write
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    :param meta_patterns: Patterns to mark in meta columns
+    :param obj_names: Names of objects that aren't in the object registry, by pointer
+    :param max_rows: Rows per worksheet, including the header row
+    """
+    meta_sections = []
+    if meta_patterns:
+        meta_sections = match_meta_sections(iter_tracex_events(filepath, custom_events_map), meta_patterns,
+                                            custom_events_map, obj_names)
+    excel_exporter = ExcelExporter(output_filepath, meta_sections, obj_names, max_rows)
+    try:
+        excel_exporter.write_events(iter_tracex_events(filepath, custom_events_map))
+    finally:
+        excel_exporter.close()
+    return excel_exporter
@@ -2,25 +2,249 @@
 
 import struct
 import argparse
-import copy
+import bz2
+import contextlib
+import functools
+import gzip
+import io
+import itertools
+import json
+import logging
+import lzma
+import mmap
+import os
+import shutil
 import sys
-from typing import Tuple, Optional, Dict, List
-from collections import deque
-
-from .helpers import TraceXParseException, CStruct, TextColour
-from .events import TraceXEvent, convert_events
+import tarfile
+import tempfile
+import time
+import zipfile
+import zlib
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Tuple, Optional, Dict, List, Union, Iterator, Iterable, NamedTuple, BinaryIO, Callable, Any, \
+    TYPE_CHECKING
+
+from .helpers import TraceXParseException, CStruct, CStructRecord, TextColour, ParseDiagnostics
+from .events import TraceXEvent, ObjectRegistry, EventDecoder, EventFilter, TimestampUnwrapper
+from .trace import TraceXTrace
+
+if TYPE_CHECKING:
+    from .cache import ParseCache
+
+logger = logging.getLogger(__name__)
 
 parser = argparse.ArgumentParser(description="""
 TraceX parser module, intended as a library but can be used as a standalone script""")
 parser.add_argument('input_trxs', nargs='+', action='store',
-                    help='Path to the input trx file(s) that contains TraceX event data')
+                    help='Path to the input trx file(s) that contains TraceX event data. They can be compressed '
+                         '(gzip, xz, bzip2), or tar/zip archives of trx files')
 parser.add_argument('-v', '--verbose', action='count', default=0,
-                    help='Set the verbosity of logging')
+                    help='Set the verbosity of logging: -v event histogram, -vv all events, -vvv parsing debug logs')
 parser.add_argument('-n', '--nocolor', action='store_true', help='Never color the output')
 parser.add_argument('-c', '--color', action='store_true', help='Always color the output')
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help='Number of files to parse in parallel, 0 to use all CPUs. Output is always in input order')
+parser.add_argument('--cache', action='store_true',
+                    help='Load and save unpacked files in a cache, which saves decompressing them again with -vv')
+parser.add_argument('--cache-dir', default=None,
+                    help='Directory to cache unpacked files in (implies --cache), defaults to '
+                         '$XDG_CACHE_HOME/tracex_parser')
+parser.add_argument('-u', '--unwrap', action='store_true',
+                    help='Keep counting ticks when the timer wraps, instead of using the masked timestamps')
+parser.add_argument('--timer-counts-down', action='store_true',
+                    help='The timer counts down (e.g. SysTick), for --unwrap')
+parser.add_argument('--tick-hz', type=int, default=None, help='Frequency of the timer, to also show times')
+parser.add_argument('-f', '--follow', action='store_true',
+                    help='Keep re-reading the (single) input file as new snapshots of the buffer are written to it, '
+                         'printing only the new events')
+parser.add_argument('--interval', type=float, default=1.0, help='Seconds between re-reading the file with --follow')
+parser.add_argument('--fleet-histogram', action='store_true',
+                    help='After all files, print a histogram of the events across all of them')
+parser.add_argument('--json', action='store_true',
+                    help="Print each file's summary as a line of JSON instead, and the fleet histogram as the "
+                         "last line")
+parser.add_argument('--export', choices=['chrome'], default=None,
+                    help='Convert each file instead of printing it. chrome: Chrome trace event JSON, for Perfetto '
+                         'or chrome://tracing')
+parser.add_argument('-o', '--output', default=None,
+                    help="File to --export to, '-' for stdout. Defaults to the input's name with a .trace.json "
+                         "extension")
+
+
+class ArchiveMember(NamedTuple):
+    """
+    A TraceX file inside of a tar or zip archive
+    """
+    archive_path: str
+    member_name: str
+    # Contents of a tar member. Tars can only be read in order, so each member is read as the tar is listed instead of
+    # reading the tar from the start again for every member. Zip members are opened when they're parsed.
+    data: Optional[bytes] = None
+
+    def __str__(self):
+        return f'{self.archive_path}:{self.member_name}'
+
+    def __repr__(self):
+        data_str = '' if self.data is None else f', <{len(self.data)} bytes>'
+        return f'{self.__class__.__name__}({self.archive_path!r}, {self.member_name!r}{data_str})'
+
+
+# Anything that can be parsed: a path to a (possibly compressed) file, an archive member,
+# or a buffer that is already in memory
+TraceXSource = Union[str, os.PathLike, ArchiveMember, bytes, bytearray, memoryview, mmap.mmap]
+
+# Magic numbers at the start of compressed files, and how to decompress them
+compression_magics = {
+    b'\x1f\x8b': gzip.open,
+    b'\xfd7zXZ\x00': lzma.open,
+    b'BZh': bz2.open,
+}
+# Decompressed dumps bigger than this are spooled to a temporary file instead of being kept in memory
+max_in_memory_decompressed_bytes = 64 * 2 ** 20
+decompress_chunk_bytes = 2 ** 20
+# What a missing, truncated or corrupt (possibly compressed) file can raise while it's parsed
+file_parse_errors = (OSError, EOFError, TraceXParseException, struct.error, zlib.error, lzma.LZMAError,
+                     zipfile.BadZipFile, tarfile.TarError)
+
+
+def _get_decompressor(fp: BinaryIO) -> Optional[Callable[[BinaryIO], BinaryIO]]:
+    """
+    Sniffs the start of the (peekable) file for a compression magic number
+    """
+    file_start = fp.peek(max(len(magic) for magic in compression_magics))
+    for magic, decompressor in compression_magics.items():
+        if file_start.startswith(magic):
+            return decompressor
+    return None
+
 
+def _is_tarfile(filepath: Union[str, os.PathLike]) -> bool:
+    try:
+        return tarfile.is_tarfile(filepath)
+    except file_parse_errors:
+        # Missing or corrupt, which is reported when it's parsed
+        return False
 
-def get_endian_str(buf: bytes) -> Tuple[str, int]:
+
+def iter_archive_members(filepath: Union[str, os.PathLike]) -> Iterator[Union[str, ArchiveMember]]:
+    """
+    Yields an ArchiveMember for every file in a tar (optionally compressed) or zip archive,
+    or just the path if it isn't an archive.
+    The tar is read once, front to back, and each member's contents are read as it's yielded.
+    """
+    if zipfile.is_zipfile(filepath):
+        with zipfile.ZipFile(filepath) as zip_archive:
+            for zip_info in zip_archive.infolist():
+                if not zip_info.is_dir():
+                    yield ArchiveMember(os.fspath(filepath), zip_info.filename)
+    elif _is_tarfile(filepath):
+        # Streaming mode, so that nothing is ever read twice
+        try:
+            with tarfile.open(filepath, 'r|*') as tar_archive:
+                for tar_info in tar_archive:
+                    if tar_info.isfile():
+                        with tar_archive.extractfile(tar_info) as member_fp:
+                            member_data = member_fp.read()
+                        yield ArchiveMember(os.fspath(filepath), tar_info.name, member_data)
+        except file_parse_errors as e:
+            # Keep the members that were read, a truncated archive shouldn't stop the rest of the inputs
+            logger.warning('Could not read the rest of %s: %s', filepath, e)
+    else:
+        yield filepath
+
+
+@contextmanager
+def _open_archive_member(archive_member: ArchiveMember) -> Iterator[BinaryIO]:
+    if zipfile.is_zipfile(archive_member.archive_path):
+        with zipfile.ZipFile(archive_member.archive_path) as zip_archive:
+            with zip_archive.open(archive_member.member_name) as member_fp:
+                yield member_fp
+    else:
+        with tarfile.open(archive_member.archive_path) as tar_archive:
+            member_fp = tar_archive.extractfile(archive_member.member_name)
+            if member_fp is None:
+                raise TraceXParseException(f'{archive_member} is not a file')
+            with member_fp:
+                yield member_fp
+
+
+@contextmanager
+def _read_tracex_stream(fp: BinaryIO) -> Iterator[Union[bytes, bytearray, mmap.mmap]]:
+    """
+    Reads a (possibly compressed) stream in chunks. Small dumps are kept in memory, bigger ones are spooled to a
+    temporary file which is then memory mapped, so memory use stays bounded.
+    """
+    if not hasattr(fp, 'peek'):
+        fp = io.BufferedReader(fp)
+    decompressor = _get_decompressor(fp)
+    with (decompressor(fp) if decompressor else contextlib.nullcontext(fp)) as data_fp:
+        tracex_data = bytearray()
+        while len(tracex_data) <= max_in_memory_decompressed_bytes:
+            chunk = data_fp.read(decompress_chunk_bytes)
+            if not chunk:
+                yield tracex_data
+                return
+            tracex_data += chunk
+
+        with tempfile.TemporaryFile() as spool_fp:
+            spool_fp.write(tracex_data)
+            del tracex_data
+            shutil.copyfileobj(data_fp, spool_fp, decompress_chunk_bytes)
+            spool_fp.flush()
+            tracex_mmap = mmap.mmap(spool_fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield tracex_mmap
+            finally:
+                tracex_mmap.close()
+
+
+@contextmanager
+def open_tracex_buffer(source: TraceXSource) -> Iterator[Union[bytes, bytearray, memoryview, mmap.mmap]]:
+    """
+    Context manager that provides a buffer for the parsing functions to decode in place.
+    Files are memory mapped (read-only) so that nothing is copied into Python objects,
+    in-memory buffers are passed through as-is.
+    Compressed files (gzip, xz, bzip2) and archive members are decompressed as they are read.
+    :param source: Path to a TraceX file, an ArchiveMember, or a bytes/bytearray/memoryview/mmap containing the
+    TraceX data
+    """
+    if isinstance(source, (bytes, bytearray, mmap.mmap)):
+        yield source
+        return
+    if isinstance(source, memoryview):
+        # The parsing functions work in byte offsets
+        yield source if source.format == 'B' and source.ndim == 1 else source.cast('B')
+        return
+    if isinstance(source, ArchiveMember):
+        if source.data is not None:
+            with _read_tracex_stream(io.BytesIO(source.data)) as tracex_buf:
+                yield tracex_buf
+            return
+        with _open_archive_member(source) as member_fp, _read_tracex_stream(member_fp) as tracex_buf:
+            yield tracex_buf
+        return
+
+    with open(source, 'rb') as fp:
+        if _get_decompressor(fp) is not None:
+            with _read_tracex_stream(fp) as tracex_buf:
+                yield tracex_buf
+            return
+        try:
+            tracex_mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and non-regular files (pipes, etc.) can't be mapped
+            yield fp.read()
+            return
+        try:
+            yield tracex_mmap
+        finally:
+            tracex_mmap.close()
+
+
+def get_endian_str(buf: bytes, start_idx: int = 0) -> Tuple[str, int]:
     """
     Returns the endianness of the TraceX dump based on the first couple bytes
     """
@@ -28,12 +252,14 @@ def get_endian_str(buf: bytes) -> Tuple[str, int]:
     magic_str_size = len(magic_file_str)
     magic_file_number_big = int('0x' + magic_file_str.hex(), 16)
     magic_file_number_little = int('0x' + magic_file_str[::-1].hex(), 16)
+    if len(buf) < start_idx + magic_str_size:
+        raise TraceXParseException(f'Buffer is too small to contain a TraceX header: {len(buf)} bytes')
     # unpack assuming big endian
-    header_id = struct.unpack('>L', buf[0:magic_str_size])[0]
+    header_id = struct.unpack_from('>L', buf, start_idx)[0]
     if header_id == magic_file_number_big:
-        return '>', magic_str_size
+        return '>', start_idx + magic_str_size
     elif header_id == magic_file_number_little:
-        return '<', magic_str_size
+        return '<', start_idx + magic_str_size
     else:
         raise TraceXParseException(f'Invalid magic number: {hex(header_id)}')
 
@@ -58,16 +284,21 @@ def get_control_header(endian_str: str, buf: bytes, start_idx: int) -> Tuple[CSt
         ('L', 'reserved4'),
     ])
     control_header_end_idx = start_idx + control_header.total_size()
-    control_header.unpack(buf[start_idx:control_header_end_idx])
+    control_header.unpack(buf, start_idx)
     return control_header, control_header_end_idx
 
 
-def get_object_registry(endian_str: str, buf: bytes, start_idx: int, control_header: CStruct) \
-        -> Tuple[Dict[int, CStruct], int]:
+def get_object_registry(endian_str: str, buf: bytes, start_idx: int, control_header: CStruct,
+                        obj_name_decoding: str = 'ascii', diagnostics: Optional[ParseDiagnostics] = None) \
+        -> Tuple[ObjectRegistry, int]:
     """
     @see https://docs.microsoft.com/en-us/azure/rtos/tracex/chapter11#event-trace-object-registry
-    Unpacks the object registry into a list of dict-like CStructs
+    Unpacks the object registry into a map of pointer to dict-like CStructRecords.
+    The object names are decoded once here with obj_name_decoding ('ascii', 'latin-1' or 'replace').
+    Problems with the registry, and with mapping events using it, are counted in diagnostics.
     """
+    if diagnostics is None:
+        diagnostics = ParseDiagnostics()
     object_name_len = control_header['obj_reg_name_size']
     object_entry = CStruct(endian_str, [
         ('B', 'obj_reg_entry_obj_available **'),
@@ -87,36 +318,28 @@ def get_object_registry(endian_str: str, buf: bytes, start_idx: int, control_hea
             f'Object registry range does not match object size: {obj_reg_addr_range}, {object_size}')
     num_objects = obj_reg_addr_range // object_size
 
-    object_entry_start_idx = start_idx
+    object_entries_end_idx = start_idx + num_objects * object_size
     object_registry_arr = []
-    for obj_idx in range(num_objects):
-        object_entry.clear()
-        object_entry_end_idx = object_entry_start_idx + object_size
-        object_entry.unpack(buf[object_entry_start_idx:object_entry_end_idx])
+    for object_entry_record in object_entry.iter_unpack(buf, start_idx, num_objects):
         # trim trailing NULs
-        object_entry['thread_reg_entry_obj_name'] = object_entry['thread_reg_entry_obj_name'].strip(b'\0')
-        object_registry_arr.append(copy.deepcopy(object_entry))
-        object_entry_start_idx += object_size
+        object_entry_record['thread_reg_entry_obj_name'] = object_entry_record['thread_reg_entry_obj_name'].strip(b'\0')
+        object_registry_arr.append(object_entry_record)
 
     obj_reg_map = {}
     for obj in object_registry_arr:
         obj_ptr = obj['thread_reg_entry_obj_ptr']
         if obj_ptr != 0x0 and obj_ptr in obj_reg_map:
-            print(f'{obj} is has the same address of {obj_reg_map[obj_ptr]} in the object registry! Not overwriting')
+            logger.debug('%s is has the same address of %s in the object registry! Not overwriting',
+                         obj, obj_reg_map[obj_ptr])
+            diagnostics.duplicate_objs[obj_ptr] += 1
             continue
         obj_reg_map[obj_ptr] = obj
 
-    return obj_reg_map, object_entry_start_idx
+    return ObjectRegistry(obj_reg_map, obj_name_decoding, diagnostics), object_entries_end_idx
 
 
-def get_event_entries(endian_str: str, buf: bytes, start_idx: int, control_header: CStruct) \
-        -> Tuple[List[CStruct], int]:
-    """
-    @see https://docs.microsoft.com/en-us/azure/rtos/tracex/chapter11#event-trace-entries
-    Unpacks the TraceX events into a list of dict-like CStructs.
-    Events are sorted by their place in the buffer.
-    """
-    event_entry = CStruct(endian_str, [
+def _get_event_entry_struct(endian_str: str) -> CStruct:
+    return CStruct(endian_str, [
         ('L', 'thread_ptr'),
         ('L', 'thread_priority'),
         ('L', 'event_id'),
@@ -126,68 +349,436 @@ def get_event_entries(endian_str: str, buf: bytes, start_idx: int, control_heade
         ('L', 'info_field_3'),
         ('L', 'info_field_4'),
     ])
-    event_size = event_entry.total_size()
 
+
+def _get_event_entry_range(control_header: CStruct, event_size: int) -> Tuple[int, int]:
+    """
+    Returns the number of event entries in the buffer, and the index of the oldest entry
+    """
     event_entry_addr_range = (control_header['buf_end_ptr'] - control_header['buf_start_ptr'])
     if event_entry_addr_range % event_size != 0:
         raise TraceXParseException(
             f'Event entries range does not match event size: {event_entry_addr_range}, {event_size}')
     num_entries = event_entry_addr_range // event_size
 
-    event_entry_start_idx = start_idx
-    raw_events = []
-    for event_idx in range(num_entries):
-        event_entry.clear()
-        object_entry_end_idx = event_entry_start_idx + event_size
-        event_entry.unpack(buf[event_entry_start_idx:object_entry_end_idx])
+    # The current pointer is where the next event will be written, i.e. the oldest event in the buffer
+    if not control_header['buf_start_ptr'] <= control_header['buf_cur_ptr'] <= control_header['buf_end_ptr']:
+        raise TraceXParseException(
+            f'Event buffer current pointer {hex(control_header["buf_cur_ptr"])} is outside of the event buffer: '
+            f'{hex(control_header["buf_start_ptr"])}-{hex(control_header["buf_end_ptr"])}')
+    oldest_event_idx = (control_header['buf_cur_ptr'] - control_header['buf_start_ptr']) // event_size
+    return num_entries, oldest_event_idx % num_entries if num_entries else 0
+
+
+def _iter_event_entry_values(endian_str: str, buf: bytes, start_idx: int, control_header: CStruct) \
+        -> Iterator[Tuple[int, ...]]:
+    """
+    Lazily unpacks the non-empty TraceX events into tuples of raw values, ordered by their place in the buffer.
+    The circular buffer is read as two index ranges: from the oldest entry to the end of the buffer,
+    then from the start of the buffer up to the oldest entry.
+    The timer valid mask is NOT applied to the timestamps.
+    """
+    event_entry = _get_event_entry_struct(endian_str)
+    event_size = event_entry.total_size()
+    num_entries, oldest_event_idx = _get_event_entry_range(control_header, event_size)
+
+    entry_ranges = [
+        (start_idx + oldest_event_idx * event_size, num_entries - oldest_event_idx),
+        (start_idx, oldest_event_idx),
+    ]
+    for range_start_idx, range_num_entries in entry_ranges:
+        for entry_values in event_entry.iter_unpack_values(buf, range_start_idx, range_num_entries):
+            if entry_values[2] != 0:
+                yield entry_values
 
+
+def iter_event_entries(endian_str: str, buf: bytes, start_idx: int, control_header: CStruct) \
+        -> Iterator[CStructRecord]:
+    """
+    @see https://docs.microsoft.com/en-us/azure/rtos/tracex/chapter11#event-trace-entries
+    Lazily unpacks the TraceX events into dict-like CStructRecords, ordered by their place in the buffer.
+    The circular buffer is read as two index ranges: from the oldest entry to the end of the buffer,
+    then from the start of the buffer up to the oldest entry. Empty entries are skipped.
+    """
+    event_entry = _get_event_entry_struct(endian_str)
+    timer_valid_mask = control_header['timer_valid_mask']
+    for entry_values in _iter_event_entry_values(endian_str, buf, start_idx, control_header):
+        event_entry_record = event_entry.make_record(entry_values)
         # Apply the timer valid mask to the timestamp
-        event_entry['time_stamp'] = control_header['timer_valid_mask'] & event_entry['time_stamp']
+        event_entry_record['time_stamp'] &= timer_valid_mask
+        yield event_entry_record
 
-        if event_entry['event_id'] != 0:
-            raw_events.append(copy.deepcopy(event_entry))
-        event_entry_start_idx += event_size
 
-    # Even though we have a timestamp, events are ordered in the way they were placed in the buffer
-    oldest_event_idx = (control_header['buf_end_ptr'] - control_header['buf_cur_ptr']) // event_size
-    raw_events_deque = deque(raw_events)
-    raw_events_deque.rotate(oldest_event_idx)
-    raw_events_sorted = list(raw_events_deque)
+def get_event_entries(endian_str: str, buf: bytes, start_idx: int, control_header: CStruct) \
+        -> Tuple[List[CStructRecord], int]:
+    """
+    @see https://docs.microsoft.com/en-us/azure/rtos/tracex/chapter11#event-trace-entries
+    Unpacks the TraceX events into a list of dict-like CStructRecords.
+    Events are sorted by their place in the buffer.
+    """
+    event_size = _get_event_entry_struct(endian_str).total_size()
+    num_entries, _oldest_event_idx = _get_event_entry_range(control_header, event_size)
+    raw_events_sorted = list(iter_event_entries(endian_str, buf, start_idx, control_header))
+    return raw_events_sorted, start_idx + num_entries * event_size
 
-    return raw_events_sorted, event_entry_start_idx
 
+# Typecode of an unsigned 32 bit array, for holding event entries as flat arrays
+_u32_typecode = 'I' if array('I').itemsize == 4 else 'L'
 
-def parse_tracex_buffer(filepath: str, custom_events_map: Optional[Dict[int, TraceXEvent]] = None) \
-        -> Tuple[List[TraceXEvent], Dict[int, CStruct]]:
+
+def _get_chunk_entry_ranges(num_entries: int, oldest_event_idx: int, chunk_start: int, chunk_end: int) \
+        -> List[Tuple[int, int]]:
     """
-    Parse a TraceX binary dump (canonically .trx) into a list of TraceXEvent classes
-    :param filepath: Path to where the TraceX file is
-    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
-    events.
-    :return: List of TraceX events
+    Converts a range of chronological event indexes (0 is the oldest entry) into the (start, end) entry index ranges
+    that they are at in the circular buffer. There are two ranges if the chunk wraps around the end of the buffer.
     """
-    # Overall format is control header, object registry entries, trace/event entries
-    with open(filepath, 'rb') as fp:
-        tracex_buf = fp.read()
+    first_idx = oldest_event_idx + chunk_start
+    last_idx = oldest_event_idx + chunk_end
+    if last_idx <= num_entries:
+        return [(first_idx, last_idx)]
+    if first_idx >= num_entries:
+        return [(first_idx - num_entries, last_idx - num_entries)]
+    return [(first_idx, num_entries), (0, last_idx - num_entries)]
+
+
+def _unpack_event_range(endian_str: str, tracex_buf: bytes, start_idx: int, num_entries: int, oldest_event_idx: int,
+                        chunk_start: int, chunk_end: int, keep_empty: bool = False) -> array:
+    """
+    Copies a chronological range of raw event entries into a flat array of unsigned ints (8 per event)
+    in native byte order, without any empty entries. The timer valid mask is NOT applied to the timestamps.
+    :param keep_empty: Keep the empty entries (event id 0), for callers that skip them themselves
+    """
+    event_size = _get_event_entry_struct(endian_str).total_size()
+    entries_values = array(_u32_typecode)
+    for range_start, range_end in _get_chunk_entry_ranges(num_entries, oldest_event_idx, chunk_start, chunk_end):
+        range_bytes = tracex_buf[start_idx + range_start * event_size:start_idx + range_end * event_size]
+        if len(range_bytes) != (range_end - range_start) * event_size:
+            raise TraceXParseException(f'Buffer is too small to contain {num_entries} event entries: '
+                                       f'{len(tracex_buf)} bytes')
+        entries_values.frombytes(range_bytes)
+    if (endian_str == '<') != (sys.byteorder == 'little'):
+        entries_values.byteswap()
+    if not keep_empty and 0 in entries_values[2::8]:
+        entries_values = array(_u32_typecode, (value
+                                               for entry_values in _iter_array_entry_values(entries_values)
+                                               if entry_values[2] != 0
+                                               for value in entry_values))
+    return entries_values
+
+
+def _iter_array_entry_values(entries_values: array) -> Iterator[Tuple[int, ...]]:
+    """
+    Splits a flat array of event entry values back into a tuple per event
+    """
+    return zip(*[iter(entries_values)] * 8)
+
 
+def _get_tracex_header(tracex_buf: bytes, obj_name_decoding: str = 'ascii',
+                       diagnostics: Optional[ParseDiagnostics] = None) -> Tuple[str, CStruct, ObjectRegistry, int]:
+    """
+    Unpacks everything before the event entries.
+    :return: endian string, control header, object registry, index of the first event entry
+    """
+    # Overall format is control header, object registry entries, trace/event entries
     # Read control header id to figure out endianness
     endian_str, header_id_end_idx = get_endian_str(tracex_buf)
     # Unpack the rest of the control header
     control_header, control_header_end_idx = get_control_header(endian_str, tracex_buf, header_id_end_idx)
 
     # Unpack object entries
-    obj_reg_map, obj_reg_end_idx = get_object_registry(endian_str, tracex_buf, control_header_end_idx, control_header)
+    obj_reg_map, obj_reg_end_idx = get_object_registry(endian_str, tracex_buf, control_header_end_idx, control_header,
+                                                       obj_name_decoding, diagnostics)
+    return endian_str, control_header, obj_reg_map, obj_reg_end_idx
+
+
+def _get_event_decoder(custom_events_map: Optional[Dict[int, TraceXEvent]], control_header: CStruct,
+                       obj_reg_map: ObjectRegistry, unwrap_timestamps: bool = False,
+                       tick_hz: Optional[int] = None, timer_counts_down: bool = False,
+                       event_filter: Optional[EventFilter] = None) \
+        -> Callable[[Tuple[int, ...]], Optional[TraceXEvent]]:
+    timestamp_unwrapper = None
+    if unwrap_timestamps:
+        timestamp_unwrapper = TimestampUnwrapper(control_header['timer_valid_mask'], timer_counts_down)
+    event_decoder = EventDecoder(custom_events_map, control_header['timer_valid_mask'], obj_reg_map.names,
+                                 timestamp_unwrapper, tick_hz, event_filter)
+    return event_decoder.get_decoder()
+
+
+def _decode_entries(decode_event: Callable[[Tuple[int, ...]], Optional[TraceXEvent]],
+                    entries_values: Iterator[Tuple[int, ...]], filtered: bool) -> List[TraceXEvent]:
+    if filtered:
+        return [tracex_event for tracex_event in map(decode_event, entries_values) if tracex_event is not None]
+    return [decode_event(entry_values) for entry_values in entries_values]
+
+
+def iter_tracex_events(filepath: TraceXSource, custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                       obj_name_decoding: str = 'ascii', diagnostics: Optional[ParseDiagnostics] = None,
+                       unwrap_timestamps: bool = False, tick_hz: Optional[int] = None,
+                       timer_counts_down: bool = False, event_filter: Optional[EventFilter] = None) \
+        -> Iterator[TraceXEvent]:
+    """
+    Lazily parse a TraceX binary dump (canonically .trx), yielding TraceXEvent classes in buffer order.
+    Only one event is decoded at a time, so the consumer can stop early without paying for the whole buffer.
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    :param obj_name_decoding: How to decode object registry names: 'ascii', 'latin-1' or 'replace' (undecodable
+    bytes are replaced)
+    :param diagnostics: Counts problems found while parsing, such as pointers that aren't in the object registry
+    :param unwrap_timestamps: Set each event's timestamp64, which keeps counting up when the timer wraps
+    :param tick_hz: Frequency of the timer in Hz, to set each event's time_ns (from timestamp64)
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    :param event_filter: Only yield the events that match, the rest are skipped without being decoded
+    :return: Generator of TraceX events
+    """
+    with open_tracex_buffer(filepath) as tracex_buf:
+        endian_str, control_header, obj_reg_map, obj_reg_end_idx = _get_tracex_header(tracex_buf, obj_name_decoding,
+                                                                                       diagnostics)
+        decode_event = _get_event_decoder(custom_events_map, control_header, obj_reg_map, unwrap_timestamps, tick_hz,
+                                          timer_counts_down, event_filter)
+        for entry_values in _iter_event_entry_values(endian_str, tracex_buf, obj_reg_end_idx, control_header):
+            tracex_event = decode_event(entry_values)
+            if tracex_event is not None:
+                yield tracex_event
+
+
+def parse_tracex_buffer(filepath: TraceXSource, custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                        obj_name_decoding: str = 'ascii', cache: Optional['ParseCache'] = None,
+                        unwrap_timestamps: bool = False, tick_hz: Optional[int] = None,
+                        timer_counts_down: bool = False, event_filter: Optional[EventFilter] = None) \
+        -> Tuple[TraceXTrace, ObjectRegistry]:
+    """
+    Parse a TraceX binary dump (canonically .trx) into a list of TraceXEvent classes
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    :param obj_name_decoding: How to decode object registry names: 'ascii', 'latin-1' or 'replace' (undecodable
+    bytes are replaced)
+    :param cache: cache.ParseCache to load the unpacked buffer from, or save it to
+    :param unwrap_timestamps: Set each event's timestamp64, which keeps counting up when the timer wraps
+    :param tick_hz: Frequency of the timer in Hz, to set each event's time_ns (from timestamp64)
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    :param event_filter: Only keep the events that match. Filtering is done on the raw event entries, so the events
+    that don't match are never created.
+    :return: List of TraceX events (a TraceXTrace, which can also find events by time, thread and event id),
+    and the object registry. Problems found while parsing, such as pointers that aren't in the object registry,
+    are counted in the object registry's ``diagnostics``
+    """
+    if cache is not None:
+        return cache.parse_tracex_buffer(filepath, custom_events_map, obj_name_decoding, unwrap_timestamps,
+                                         tick_hz, timer_counts_down, event_filter)
+
+    with open_tracex_buffer(filepath) as tracex_buf:
+        endian_str, control_header, obj_reg_map, obj_reg_end_idx = _get_tracex_header(tracex_buf, obj_name_decoding)
+
+        # Unpack trace/event entries, converting them straight into more human-understandable events.
+        # The object registry is applied to the events lazily.
+        decode_event = _get_event_decoder(custom_events_map, control_header, obj_reg_map, unwrap_timestamps, tick_hz,
+                                          timer_counts_down, event_filter)
+        entries_values = _iter_event_entry_values(endian_str, tracex_buf, obj_reg_end_idx, control_header)
+        tracex_events = _decode_entries(decode_event, entries_values, event_filter is not None)
+    tracex_events = TraceXTrace(tracex_events, obj_reg_map, control_header, unwrap_timestamps, timer_counts_down)
+    return tracex_events, obj_reg_map
 
-    # Unpack trace/event entries
-    raw_events, _event_end_idx = get_event_entries(endian_str, tracex_buf, obj_reg_end_idx, control_header)
-    # Could do some error checking here about the event end idx, but I don't think it would be worth it
 
-    # Convert raw events to more human-understandable events, then apply the object registry
-    tracex_events = convert_events(raw_events, obj_reg_map, custom_events_map)
-    return tracex_events, obj_reg_map
+class TraceXFileSummary(NamedTuple):
+    """
+    Everything that parse-trx prints about a single file. Small enough to send back from worker processes.
+    """
+    filepath: str
+    total_events: int
+    obj_reg_size: int
+    delta_ticks: int
+    # Only known if the tick frequency is given
+    delta_ns: Optional[int]
+    # Event name -> number of events, only filled in if requested
+    events_histogram: Dict[str, int]
+    # Only filled in if requested
+    event_strs: List[str]
+    diagnostic_lines: List[str]
+
+
+def summarize_tracex_file(filepath: TraceXSource, with_histogram: bool = False, with_events: bool = False,
+                          colour: Optional[TextColour] = None, cache: Optional['ParseCache'] = None,
+                          unwrap_timestamps: bool = False, tick_hz: Optional[int] = None,
+                          timer_counts_down: bool = False) -> TraceXFileSummary:
+    """
+    Parse a TraceX file and summarize it
+    :param filepath: Path to where the TraceX file is
+    :param with_histogram: Count the number of each type of event
+    :param with_events: Render every event to a string, with colour. Otherwise no events are created at all, the
+    totals and histogram are counted straight from the event entries
+    :param cache: Cache to parse the file through, only used if the events are rendered
+    :param unwrap_timestamps: Count the ticks through timer wraps
+    :param tick_hz: Frequency of the timer, to also give the time between the first and last events
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    """
+    if not with_events:
+        # Only the totals are needed, which are counted without creating any events
+        from .stats import get_tracex_stats, get_events_histogram
+        tracex_stats = get_tracex_stats(filepath, unwrap_timestamps=unwrap_timestamps,
+                                        timer_counts_down=timer_counts_down)
+        total_ns = None
+        if tick_hz is not None:
+            total_ns = 0
+            if tracex_stats.total_events:
+                # The same as the events' time_ns
+                total_ns = (tracex_stats.last_timestamp * 1_000_000_000 // tick_hz -
+                            tracex_stats.first_timestamp * 1_000_000_000 // tick_hz)
+        return TraceXFileSummary(
+            filepath=str(filepath),
+            total_events=tracex_stats.total_events,
+            obj_reg_size=tracex_stats.obj_reg_size,
+            delta_ticks=tracex_stats.delta_ticks,
+            delta_ns=total_ns,
+            events_histogram=get_events_histogram(tracex_stats.event_id_counts) if with_histogram else {},
+            event_strs=[],
+            diagnostic_lines=tracex_stats.diagnostics.summary_lines(),
+        )
+
+    tracex_events, obj_reg_map = parse_tracex_buffer(filepath, cache=cache, unwrap_timestamps=unwrap_timestamps,
+                                                     tick_hz=tick_hz, timer_counts_down=timer_counts_down)
+    total_ticks = tracex_events[-1].timestamp64 - tracex_events[0].timestamp64 if tracex_events else 0
+    total_ns = None
+    if tick_hz is not None:
+        total_ns = tracex_events[-1].time_ns - tracex_events[0].time_ns if tracex_events else 0
+
+    events_histogram = {}
+    if with_histogram:
+        for tracex_event in tracex_events:
+            event_id = tracex_event.fn_name if tracex_event.fn_name else str(tracex_event.id)
+            if event_id in events_histogram:
+                events_histogram[event_id] += 1
+            else:
+                events_histogram[event_id] = 1
+
+    event_strs = [tracex_event.as_str(colour) for tracex_event in tracex_events] if with_events else []
+    return TraceXFileSummary(
+        filepath=str(filepath),
+        total_events=len(tracex_events),
+        obj_reg_size=len(obj_reg_map.keys()),
+        delta_ticks=total_ticks,
+        delta_ns=total_ns,
+        events_histogram=events_histogram,
+        event_strs=event_strs,
+        diagnostic_lines=obj_reg_map.diagnostics.summary_lines(),
+    )
+
+
+def print_histogram(events_histogram: Dict[str, int], colour: TextColour):
+    sorted_event_names = sorted(events_histogram.keys(), key=lambda k: events_histogram[k], reverse=True)
+    max_event_name_len = max((len(e_id) for e_id in sorted_event_names), default=0)
+    for event_id in sorted_event_names:
+        event_colour = colour.blu if isinstance(event_id, str) else colour.yel
+        print(f'{event_colour}{event_id:<{max_event_name_len + 1}}{events_histogram[event_id]}{colour.rst}')
+
+
+def print_file_summary(file_summary: TraceXFileSummary, verbose: int, colour: TextColour):
+    print(f'{colour.wte}total events: {file_summary.total_events}{colour.rst}')
+    print(f'{colour.wte}object registry size: {file_summary.obj_reg_size}{colour.rst}')
+    print(f'{colour.wte}delta ticks: {file_summary.delta_ticks}{colour.rst}')
+    if file_summary.delta_ns is not None:
+        print(f'{colour.wte}delta time: {file_summary.delta_ns / 1e6:.3f} ms{colour.rst}')
+
+    if verbose > 0:
+        print(f'{colour.grn}Event Histogram:{colour.rst}')
+        print_histogram(file_summary.events_histogram, colour)
+
+    if verbose > 1:
+        print(f'{colour.grn}All events:{colour.rst}')
+        for event_str in file_summary.event_strs:
+            print(event_str)
+
+    # Only report parsing problems once, in summary
+    for diagnostic_line in file_summary.diagnostic_lines:
+        print(f'{colour.yel}{diagnostic_line}{colour.rst}')
+
+
+def print_file_summary_json(file_summary: TraceXFileSummary, verbose: int):
+    file_summary_dict = file_summary._asdict()
+    if verbose < 1:
+        del file_summary_dict['events_histogram']
+    if verbose < 2:
+        del file_summary_dict['event_strs']
+    print(json.dumps(file_summary_dict))
+
+
+def follow_tracex_file(filepath: str, interval: float, colour: TextColour, max_snapshots: Optional[int] = None,
+                       unwrap_timestamps: bool = False, tick_hz: Optional[int] = None, timer_counts_down: bool = False):
+    """
+    Print the events in a TraceX file, then every new event each time the file is updated with a new snapshot
+    :param max_snapshots: Stop after this many snapshots, otherwise follow forever
+    :param unwrap_timestamps: Count the ticks through timer wraps, across all the snapshots
+    :param tick_hz: Frequency of the timer, to set the events' times
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    """
+    from .follow import TraceXFollower
+    follower = TraceXFollower(unwrap_timestamps=unwrap_timestamps, tick_hz=tick_hz, timer_counts_down=timer_counts_down)
+    overruns = 0
+    while max_snapshots is None or follower.snapshots < max_snapshots:
+        try:
+            new_events = follower.update(filepath)
+        except (OSError, TraceXParseException, struct.error) as e:
+            # The snapshot might be half written, try again next time
+            print(f'{colour.yel}Could not parse {filepath}: {e}{colour.rst}')
+            new_events = []
+        if follower.overruns != overruns:
+            overruns = follower.overruns
+            print(f'{colour.yel}Buffer overrun, events have been lost since the last snapshot{colour.rst}')
+        for tracex_event in new_events:
+            print(tracex_event.as_str(colour))
+        sys.stdout.flush()
+        if max_snapshots is None or follower.snapshots < max_snapshots:
+            time.sleep(interval)
+
+
+def get_export_filepath(input_source: Union[str, ArchiveMember]) -> str:
+    """
+    Default --export output path, next to the input file (or archive)
+    """
+    if isinstance(input_source, ArchiveMember):
+        member_stem = os.path.splitext(os.path.basename(input_source.member_name))[0]
+        return f'{os.path.splitext(input_source.archive_path)[0]}_{member_stem}.trace.json'
+    return f'{os.path.splitext(input_source)[0]}.trace.json'
+
+
+def export_tracex_files(input_sources: Iterable[Union[str, ArchiveMember]], output_filepath: Optional[str],
+                        tick_hz: Optional[int], timer_counts_down: bool):
+    """
+    Write each file as a Chrome trace
+    """
+    from .chrome_trace import export_chrome_trace
+    for input_source in input_sources:
+        if output_filepath == '-':
+            export_chrome_trace(input_source, sys.stdout, tick_hz=tick_hz, timer_counts_down=timer_counts_down,
+                                process_name=str(input_source))
+            continue
+        export_filepath = output_filepath if output_filepath is not None else get_export_filepath(input_source)
+        print(f'Exporting {input_source} to {export_filepath}')
+        with open(export_filepath, 'w') as export_fp:
+            export_chrome_trace(input_source, export_fp, tick_hz=tick_hz, timer_counts_down=timer_counts_down,
+                                process_name=str(input_source))
+
+
+def _map_in_order(executor: ProcessPoolExecutor, fn: Callable, items: Iterable[Any], max_pending: int) \
+        -> Iterator[Tuple[Any, Callable[[], Any]]]:
+    """
+    Like executor.map(), but only max_pending items are taken from the iterable at a time, instead of all of them
+    :return: Each item and a function that waits for its result (raising fn's exception), in order
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(fn, item)))
+        if len(pending) >= max_pending:
+            item, future = pending.popleft()
+            yield item, future.result
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result
 
 
 def main():
+    from .cache import ParseCache
     args = parser.parse_args()
 
     from signal import signal, SIGPIPE, SIG_DFL
@@ -207,37 +798,95 @@ def main():
     #  1  |    0    |   1   |   1
     #  1  |    1    |   0   |   0
     #  1  |    1    |   1   |   1
-    have_colours = (sys.stdout.isatty() and not args.nocolor) or args.color
+    have_colours = ((sys.stdout.isatty() and not args.nocolor) or args.color) and not args.json
     colour = TextColour(have_colours)
 
-    for input_filepath in args.input_trxs:
-        print(f'Parsing {input_filepath}')
-        tracex_events, obj_reg_map = parse_tracex_buffer(input_filepath)
-        print(f'{colour.wte}total events: {len(tracex_events)}{colour.rst}')
-        print(f'{colour.wte}object registry size: {len(obj_reg_map.keys())}{colour.rst}')
-        total_ticks = tracex_events[-1].timestamp - tracex_events[0].timestamp
-        print(f'{colour.wte}delta ticks: {total_ticks}{colour.rst}')
-
-        if args.verbose > 0:
-            print(f'{colour.grn}Event Histogram:{colour.rst}')
-            events_histogram = {}
-            for tracex_event in tracex_events:
-                event_id = tracex_event.fn_name if tracex_event.fn_name else str(tracex_event.id)
-                if event_id in events_histogram:
-                    events_histogram[event_id] += 1
+    if args.verbose > 2:
+        # Per-event parsing details
+        logging.basicConfig(level=logging.DEBUG)
+
+    if args.follow:
+        if len(args.input_trxs) != 1:
+            parser.error('--follow only takes one input file')
+        try:
+            follow_tracex_file(args.input_trxs[0], args.interval, colour, unwrap_timestamps=args.unwrap,
+                               tick_hz=args.tick_hz, timer_counts_down=args.timer_counts_down)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Archives are parsed member by member, as they're read
+    input_sources = (input_source for input_filepath in args.input_trxs
+                     for input_source in iter_archive_members(input_filepath))
+
+    if args.export is not None:
+        if args.output is not None:
+            # Only read as far as a second file
+            input_sources = list(itertools.islice(input_sources, 2))
+            if len(input_sources) != 1:
+                parser.error('--output only takes one input file, leave it out to export next to each input file')
+        export_tracex_files(input_sources, args.output, args.tick_hz, args.timer_counts_down)
+        return
+
+    use_cache = args.cache or args.cache_dir is not None
+    summarize_file = functools.partial(summarize_tracex_file,
+                                       with_histogram=args.verbose > 0 or args.fleet_histogram,
+                                       with_events=args.verbose > 1,
+                                       colour=colour,
+                                       cache=ParseCache(args.cache_dir) if use_cache else None,
+                                       unwrap_timestamps=args.unwrap,
+                                       tick_hz=args.tick_hz,
+                                       timer_counts_down=args.timer_counts_down)
+    fleet_histogram = Counter()
+    num_files = 0
+    num_failed_files = 0
+    if args.jobs == 1:
+        file_summaries = ((input_source, functools.partial(summarize_file, input_source))
+                          for input_source in input_sources)
+        executor = None
+    else:
+        max_workers = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        # The summaries are waited for in input order. Only a few files are read ahead, archive members are held in
+        # memory until they've been parsed.
+        file_summaries = _map_in_order(executor, summarize_file, input_sources, max_workers * 2)
+
+    try:
+        for input_source, get_file_summary in file_summaries:
+            if not args.json:
+                print(f'Parsing {input_source}')
+                sys.stdout.flush()
+            try:
+                file_summary = get_file_summary()
+            except file_parse_errors as e:
+                # Carry on with the rest of the fleet
+                if args.json:
+                    print(json.dumps({'filepath': str(input_source), 'error': str(e)}))
                 else:
-                    events_histogram[event_id] = 1
-            sorted_event_names = sorted(events_histogram.keys(), key=lambda k: events_histogram[k], reverse=True)
-            max_event_name_len = max(len(e_id) for e_id in sorted_event_names)
-            for event_id in sorted_event_names:
-                event_colour = colour.blu if isinstance(event_id, str) else colour.yel
-                print(f'{event_colour}{event_id:<{max_event_name_len + 1}}{events_histogram[event_id]}{colour.rst}')
-
-        if args.verbose > 1:
-            print(f'{colour.grn}All events:{colour.rst}')
-            for tracex_event in tracex_events:
-                print(tracex_event.as_str(colour))
+                    print(f'{colour.yel}Could not parse {input_source}: {e}{colour.rst}')
+                num_failed_files += 1
+                continue
+            num_files += 1
+            if args.json:
+                print_file_summary_json(file_summary, args.verbose)
+            else:
+                print_file_summary(file_summary, args.verbose, colour)
+            fleet_histogram.update(file_summary.events_histogram)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if args.fleet_histogram and args.json:
+        print(json.dumps({'files': num_files, 'failed_files': num_failed_files,
+                          'fleet_histogram': dict(fleet_histogram)}))
+    elif args.fleet_histogram:
+        failed_str = f', {num_failed_files} could not be parsed' if num_failed_files else ''
+        print(f'{colour.grn}Fleet Event Histogram ({num_files} files{failed_str}):{colour.rst}')
+        print_histogram(dict(fleet_histogram), colour)
 
 
 if __name__ == '__main__':
-    main()
+    # Run the package's copy of this module, not this __main__ one, so that the classes that are passed around
+    # (e.g. ArchiveMember) are the same classes that the rest of the package imports
+    from tracex_parser.file_parser import main as file_parser_main
+    file_parser_main()
@@ -0,0 +1,117 @@
+from typing import Optional, Dict, List
+
+from .events import TraceXEvent, EventDecoder, EventFilter, TimestampUnwrapper
+from .file_parser import TraceXSource, open_tracex_buffer, _get_tracex_header, _get_event_entry_struct, \
+    _get_event_entry_range, _unpack_event_range, _iter_array_entry_values, _decode_entries
+
+# Control header fields that must stay the same for two snapshots to be of the same trace buffer
+_buffer_layout_fields = [
+    'timer_valid_mask',
+    'trace_base_address',
+    'obj_reg_start_pointer',
+    'obj_reg_name_size',
+    'obj_reg_end_pointer',
+    'buf_start_ptr',
+    'buf_end_ptr',
+]
+
+
+def _get_entry_bytes(tracex_buf: bytes, start_idx: int, event_size: int, num_entries: int, entry_idx: int) -> bytes:
+    entry_start_idx = start_idx + (entry_idx % num_entries if num_entries else 0) * event_size
+    return bytes(tracex_buf[entry_start_idx:entry_start_idx + event_size])
+
+
+class TraceXFollower:
+    """
+    Incrementally parses repeated snapshots of the same TraceX buffer, e.g. dumped from a running target every few
+    seconds. Each update() only decodes the entries written since the previous snapshot, i.e. from the previous
+    buf_cur_ptr up to the new one, wrapping around the end of the buffer if needed.
+
+    If the newest entry of the previous snapshot has been overwritten the target has written a whole buffer's worth
+    of events (or has been restarted) in between, so every event in the new snapshot is new. Those are all returned,
+    and the overrun is counted in ``overruns``.
+    """
+    def __init__(self, custom_events_map: Optional[Dict[int, TraceXEvent]] = None, obj_name_decoding: str = 'ascii',
+                 unwrap_timestamps: bool = False, tick_hz: Optional[int] = None, timer_counts_down: bool = False,
+                 event_filter: Optional[EventFilter] = None):
+        """
+        :param unwrap_timestamps: Set each event's timestamp64, which keeps counting up across all the snapshots
+        :param tick_hz: Frequency of the timer in Hz, to set each event's time_ns
+        :param timer_counts_down: The timer counts down instead of up, for unwrapping
+        :param event_filter: Only return the new events that match
+        """
+        self.custom_events_map = custom_events_map
+        self.obj_name_decoding = obj_name_decoding
+        self.unwrap_timestamps = unwrap_timestamps
+        self.tick_hz = tick_hz
+        self.timer_counts_down = timer_counts_down
+        self.event_filter = event_filter
+        self._timestamp_unwrapper = None
+        # Of the latest snapshot
+        self.control_header = None
+        self.obj_reg_map = None
+        self.snapshots = 0
+        self.overruns = 0
+        self._buffer_layout = None
+        # Index of the oldest entry (where the next one will be written) and the bytes of the newest entry
+        self._oldest_event_idx = 0
+        self._newest_entry_bytes = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.snapshots} snapshots, {self.overruns} overruns)'
+
+    def reset(self):
+        """
+        Forget the previous snapshot, the next update() returns every event in the buffer
+        """
+        self._buffer_layout = None
+        self._newest_entry_bytes = None
+
+    def update(self, filepath: TraceXSource) -> List[TraceXEvent]:
+        """
+        Parse a new snapshot of the buffer
+        :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+        :return: Events written since the previous snapshot, oldest first. The first snapshot returns all its events.
+        """
+        with open_tracex_buffer(filepath) as tracex_buf:
+            endian_str, control_header, obj_reg_map, obj_reg_end_idx = _get_tracex_header(tracex_buf,
+                                                                                           self.obj_name_decoding)
+            event_size = _get_event_entry_struct(endian_str).total_size()
+            num_entries, oldest_event_idx = _get_event_entry_range(control_header, event_size)
+            newest_entry_bytes = _get_entry_bytes(tracex_buf, obj_reg_end_idx, event_size, num_entries,
+                                                  oldest_event_idx - 1)
+
+            buffer_layout = (endian_str,) + tuple(control_header[field_name] for field_name in _buffer_layout_fields)
+            new_buffer = buffer_layout != self._buffer_layout
+            if new_buffer:
+                # First snapshot, or a different buffer altogether
+                new_entries_start = oldest_event_idx
+                num_new_entries = num_entries
+            elif _get_entry_bytes(tracex_buf, obj_reg_end_idx, event_size, num_entries,
+                                  self._oldest_event_idx - 1) != self._newest_entry_bytes:
+                # The previous snapshot's newest entry has been overwritten
+                self.overruns += 1
+                new_entries_start = oldest_event_idx
+                num_new_entries = num_entries
+            else:
+                new_entries_start = self._oldest_event_idx
+                num_new_entries = (oldest_event_idx - self._oldest_event_idx) % num_entries if num_entries else 0
+
+            entries_values = _unpack_event_range(endian_str, tracex_buf, obj_reg_end_idx, num_entries,
+                                                 new_entries_start, 0, num_new_entries)
+
+        self.snapshots += 1
+        self.control_header = control_header
+        self.obj_reg_map = obj_reg_map
+        self._buffer_layout = buffer_layout
+        self._oldest_event_idx = oldest_event_idx
+        self._newest_entry_bytes = newest_entry_bytes
+
+        if self.unwrap_timestamps and new_buffer:
+            # After an overrun the timer is assumed to have wrapped at most once while events were being missed
+            self._timestamp_unwrapper = TimestampUnwrapper(control_header['timer_valid_mask'], self.timer_counts_down)
+        # The object registry can gain objects between snapshots, so always decode with the newest one
+        event_decoder = EventDecoder(self.custom_events_map, control_header['timer_valid_mask'], obj_reg_map.names,
+                                     self._timestamp_unwrapper, self.tick_hz, self.event_filter)
+        return _decode_entries(event_decoder.get_decoder(), _iter_array_entry_values(entries_values),
+                               self.event_filter is not None)
@@ -1,5 +1,6 @@
 import struct
-from typing import Tuple, List
+from collections import Counter
+from typing import Tuple, List, Iterator, Optional, Dict
 
 
 class TraceXBaseException(Exception):
@@ -14,15 +15,37 @@ class TraceXEventException(TraceXBaseException):
     pass
 
 
+class CStructRecord(dict):
+    """
+    Lightweight dict of unpacked field values, as produced by CStruct.unpack_from
+    """
+    def __repr__(self):
+        return str({k: hex(v) if isinstance(v, int) else v
+                    for k, v in self.items()
+                    if 'reserved' not in k
+                    })
+
+
 class CStruct:
     """
-    Dict-like helper class to help unpack raw binary data into a dictionary
+    Dict-like helper class to help unpack raw binary data into a dictionary.
+    The field list is compiled once into a single struct.Struct, so whole
+    entries are decoded with one call.
     """
     def __init__(self, endian_str: str, fields: List[Tuple[str, str]]):
         self.data = {}
         self.endian_str = endian_str
         self.fields = fields
 
+        # How many values each field unpacks to, e.g. 'L' -> 1, '2H' -> 2, '32s' -> 1
+        self._field_counts = []
+        for struct_def, _field_name in fields:
+            field_struct = struct.Struct(endian_str + struct_def)
+            self._field_counts.append(len(field_struct.unpack(bytes(field_struct.size))))
+        self._field_names = [field_name for _struct_def, field_name in fields]
+        self._single_values = all(count == 1 for count in self._field_counts)
+        self.compiled = struct.Struct(endian_str + ''.join(struct_def for struct_def, _field_name in fields))
+
     def __repr__(self):
         return str({k: hex(v) if isinstance(v, int) else v
                     for k, v in self.data.items()
@@ -38,24 +61,107 @@ class CStruct:
     def clear(self):
         self.data = {}
 
-    def total_size(self):
-        size = 0
-        for field in self.fields:
-            size += struct.calcsize(self.endian_str + field[0])
-        return size
-
-    def unpack(self, data: bytes):
-        offset = 0
-        for struct_def, field_name in self.fields:
-            struct_format = self.endian_str + struct_def
-            field_size = struct.calcsize(struct_format)
-            unpacked_data = struct.unpack(struct_format, data[offset:offset + field_size])
-            if len(unpacked_data) == 1:
-                # unpack tuple
-                self.data[field_name] = unpacked_data[0]
-            else:
-                self.data[field_name] = unpacked_data
-            offset += field_size
+    def total_size(self) -> int:
+        return self.compiled.size
+
+    def make_record(self, values: Tuple) -> CStructRecord:
+        if self._single_values:
+            return CStructRecord(zip(self._field_names, values))
+        record = CStructRecord()
+        value_idx = 0
+        for field_name, count in zip(self._field_names, self._field_counts):
+            # unpack tuple if there's only a single value for the field
+            record[field_name] = values[value_idx] if count == 1 else values[value_idx:value_idx + count]
+            value_idx += count
+        return record
+
+    def unpack(self, data: bytes, offset: int = 0):
+        self.data = self.make_record(self.compiled.unpack_from(data, offset))
+
+    def unpack_from(self, buf: bytes, offset: int = 0) -> CStructRecord:
+        """
+        Unpack a single entry at buf[offset] into a new record, without touching self.data
+        """
+        return self.make_record(self.compiled.unpack_from(buf, offset))
+
+    def iter_unpack(self, buf: bytes, offset: int = 0, count: Optional[int] = None) -> Iterator[CStructRecord]:
+        """
+        Unpack consecutive entries in place, starting at buf[offset].
+        If count is not given then entries are unpacked until the end of buf.
+        """
+        for values in self.iter_unpack_values(buf, offset, count):
+            yield self.make_record(values)
+
+    def iter_unpack_values(self, buf: bytes, offset: int = 0, count: Optional[int] = None) -> Iterator[Tuple]:
+        """
+        Same as iter_unpack, but yields the raw tuples of values instead of records
+        """
+        entry_size = self.compiled.size
+        if count is None:
+            count = (len(buf) - offset) // entry_size
+        # Slicing a memoryview doesn't copy, the entries are decoded straight out of buf
+        region = memoryview(buf)[offset:offset + count * entry_size]
+        if len(region) != count * entry_size:
+            region.release()
+            raise struct.error(f'unpack requires a buffer of {count * entry_size} bytes at offset {offset}')
+        region_iter = self.compiled.iter_unpack(region)
+        try:
+            yield from region_iter
+        finally:
+            # Release our view of buf as soon as we're done (or abandoned), so that mmaps can be closed
+            del region_iter
+            region.release()
+
+
+class ParseDiagnostics:
+    """
+    Per-parse counters of problems found while parsing, so that they can be reported once in summary
+    instead of on every event. Per-event details are logged at DEBUG level.
+    """
+    def __init__(self):
+        # object pointer -> number of times it couldn't be found in the object registry
+        self.unresolved_ptrs: Counter = Counter()
+        # argument name -> number of times it couldn't be mapped to an object name
+        self.unresolved_args: Counter = Counter()
+        # object pointer -> raw name that could not be decoded
+        self.undecodable_names: Dict[int, bytes] = {}
+        # object pointer -> number of duplicate object registry entries that were ignored
+        self.duplicate_objs: Counter = Counter()
+
+    def __bool__(self):
+        return bool(self.unresolved_ptrs or self.undecodable_names or self.duplicate_objs)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({"; ".join(self.summary_lines())})'
+
+    def add_unresolved(self, key_ptr: int, arg_name: str):
+        self.unresolved_ptrs[key_ptr] += 1
+        self.unresolved_args[arg_name] += 1
+
+    def merge(self, other: 'ParseDiagnostics'):
+        self.unresolved_ptrs.update(other.unresolved_ptrs)
+        self.unresolved_args.update(other.unresolved_args)
+        self.undecodable_names.update(other.undecodable_names)
+        self.duplicate_objs.update(other.duplicate_objs)
+
+    def summary_lines(self, max_ptrs: int = 5) -> List[str]:
+        lines = []
+        if self.unresolved_ptrs:
+            total_unresolved = sum(self.unresolved_ptrs.values())
+            by_arg_str = ', '.join(f'{arg_name}={count}' for arg_name, count in self.unresolved_args.most_common())
+            lines.append(f'unresolved object pointers: {total_unresolved} '
+                         f'({len(self.unresolved_ptrs)} unique) by arg: {by_arg_str}')
+            most_common_str = ', '.join(f'{hex(key_ptr)}={count}'
+                                        for key_ptr, count in self.unresolved_ptrs.most_common(max_ptrs))
+            lines.append(f'most unresolved pointers: {most_common_str}')
+        if self.undecodable_names:
+            undecodable_str = ', '.join(f'{hex(key_ptr)}={raw_name}'
+                                        for key_ptr, raw_name in self.undecodable_names.items())
+            lines.append(f'undecodable object names: {undecodable_str}')
+        if self.duplicate_objs:
+            duplicate_str = ', '.join(hex(key_ptr) for key_ptr in self.duplicate_objs)
+            lines.append(f'duplicate object registry addresses: {duplicate_str}')
+        return lines
 
 
 class TextColour:
@@ -0,0 +1,237 @@
+from collections import deque
+from typing import Optional, Dict, List, Iterable, NamedTuple, Callable, Union, Deque, Tuple
+
+from .events import TraceXEvent, EventFilter, CommonArg
+from .file_parser import TraceXSource, iter_tracex_events
+
+mutex_get_id = 52
+mutex_put_id = 57
+sem_get_id = 83
+sem_put_id = 88
+sem_ceil_put_id = 80
+lock_event_ids = [mutex_get_id, mutex_put_id, sem_get_id, sem_put_id, sem_ceil_put_id]
+# TX_NO_WAIT, the get fails straight away if the lock isn't available
+no_wait = 0
+
+
+class LockHold(NamedTuple):
+    """
+    One acquisition of a mutex or semaphore, from the get to the put, in unwrapped ticks
+    """
+    obj_id: int
+    thread_ptr: int
+    # When the get was called, and when the lock was actually given to the thread
+    request_time: int
+    acquire_time: int
+    release_time: int
+    # Semaphores can be put by a different thread (or ISR) than the one that got them
+    release_thread_ptr: int
+
+    @property
+    def wait_ticks(self) -> int:
+        return self.acquire_time - self.request_time
+
+    @property
+    def hold_ticks(self) -> int:
+        return self.release_time - self.acquire_time
+
+
+class DurationStats:
+    """
+    Count, total, maximum and a power of two histogram of durations, in constant memory
+    """
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        # bit length of the duration -> count, i.e. bucket n holds durations up to 2 ** n - 1
+        self.buckets: Dict[int, int] = {}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(count={self.count}, mean={self.mean:.1f}, max={self.max})'
+
+    def add(self, ticks: int):
+        self.count += 1
+        self.total += ticks
+        if ticks > self.max:
+            self.max = ticks
+        bucket = ticks.bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def distribution(self) -> Dict[int, int]:
+        """
+        Upper bound of each bucket (in ticks, inclusive) -> number of durations in it, in increasing order
+        """
+        return {2 ** bucket - 1: self.buckets[bucket] for bucket in sorted(self.buckets)}
+
+
+class LockStats:
+    """
+    Everything measured about one mutex or semaphore
+    """
+    __slots__ = ('obj_id', 'obj_name', 'kind', 'acquisitions', 'contended', 'failed', 'unmatched_releases', 'wait',
+                 'hold')
+
+    def __init__(self, obj_id: int, obj_name: Union[str, int, None], kind: str):
+        self.obj_id = obj_id
+        self.obj_name = obj_name
+        # 'mutex' or 'semaphore'
+        self.kind = kind
+        self.acquisitions = 0
+        # Gets that had to wait for the lock
+        self.contended = 0
+        # Gets that didn't wait (TX_NO_WAIT) and didn't get the lock
+        self.failed = 0
+        # Puts without a get, e.g. a semaphore used for signalling or a lock taken before the start of the buffer
+        self.unmatched_releases = 0
+        # Of every acquisition, and of every released acquisition
+        self.wait = DurationStats()
+        self.hold = DurationStats()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.obj_name!r}, {self.kind}, acquisitions={self.acquisitions}, ' \
+               f'contended={self.contended})'
+
+
+class LockAnalyzer:
+    """
+    Pairs the gets and puts of mutexes and semaphores in a single pass over the events, with a table of the open
+    acquisitions of each object. Events have to be given in buffer order and with unwrapped timestamps
+    (unwrap_timestamps=True), any other events are ignored.
+
+    A get waits if the mutex is owned by another thread (the owner is logged with the mtxGet), or if the semaphore's
+    count is 0. Waiting threads are given the lock in the order they asked for it, when it's put. A semaphore put
+    releases the putting thread's acquisition, or the oldest acquisition of the semaphore if the thread doesn't have
+    one.
+    """
+    def __init__(self, on_hold: Optional[Callable[[LockHold], None]] = None):
+        """
+        :param on_hold: Called with every acquisition as soon as it's released
+        """
+        self.on_hold = on_hold
+        self.locks: Dict[int, LockStats] = {}
+        # obj_id -> thread_ptr -> (request_time, acquire_time) of every acquisition that hasn't been released yet
+        self._open_acquisitions: Dict[int, Dict[int, Deque[Tuple[int, int]]]] = {}
+        # obj_id -> (thread_ptr, request_time) of the threads waiting for it
+        self._waiting: Dict[int, Deque[Tuple[int, int]]] = {}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({len(self.locks)} locks)'
+
+    def _get_lock_stats(self, tracex_event: TraceXEvent, obj_id: int, kind: str) -> LockStats:
+        lock_stats = self.locks.get(obj_id)
+        if lock_stats is None:
+            lock_stats = LockStats(obj_id, tracex_event.mapped_args[CommonArg.obj_id], kind)
+            self.locks[obj_id] = lock_stats
+        return lock_stats
+
+    def _acquire(self, lock_stats: LockStats, thread_ptr: int, request_time: int, acquire_time: int):
+        lock_stats.acquisitions += 1
+        lock_stats.wait.add(acquire_time - request_time)
+        thread_acquisitions = self._open_acquisitions.setdefault(lock_stats.obj_id, {})
+        if thread_ptr not in thread_acquisitions:
+            thread_acquisitions[thread_ptr] = deque()
+        thread_acquisitions[thread_ptr].append((request_time, acquire_time))
+
+    def _get(self, lock_stats: LockStats, thread_ptr: int, timestamp: int, available: bool, wait_option: int):
+        if available:
+            self._acquire(lock_stats, thread_ptr, timestamp, timestamp)
+        elif wait_option == no_wait:
+            lock_stats.failed += 1
+        else:
+            lock_stats.contended += 1
+            if lock_stats.obj_id not in self._waiting:
+                self._waiting[lock_stats.obj_id] = deque()
+            self._waiting[lock_stats.obj_id].append((thread_ptr, timestamp))
+
+    def _put(self, lock_stats: LockStats, thread_ptr: int, timestamp: int, wakes_waiter: bool):
+        thread_acquisitions = self._open_acquisitions.get(lock_stats.obj_id)
+        if thread_acquisitions:
+            # The putting thread's own acquisition, otherwise the oldest one
+            if thread_ptr in thread_acquisitions:
+                acquired_thread_ptr = thread_ptr
+            else:
+                acquired_thread_ptr = min(thread_acquisitions, key=lambda ptr: thread_acquisitions[ptr][0][1])
+            request_time, acquire_time = thread_acquisitions[acquired_thread_ptr].popleft()
+            if not thread_acquisitions[acquired_thread_ptr]:
+                del thread_acquisitions[acquired_thread_ptr]
+            lock_stats.hold.add(timestamp - acquire_time)
+            if self.on_hold is not None:
+                self.on_hold(LockHold(lock_stats.obj_id, acquired_thread_ptr, request_time, acquire_time, timestamp,
+                                      thread_ptr))
+        else:
+            lock_stats.unmatched_releases += 1
+
+        waiting = self._waiting.get(lock_stats.obj_id)
+        if wakes_waiter and waiting:
+            waiting_thread_ptr, request_time = waiting.popleft()
+            self._acquire(lock_stats, waiting_thread_ptr, request_time, timestamp)
+
+    def add_event(self, tracex_event: TraceXEvent):
+        event_id = tracex_event.id
+        if event_id not in lock_event_ids:
+            return
+        thread_ptr = tracex_event.thread_ptr
+        timestamp = tracex_event.timestamp64
+        obj_id, arg_2, arg_3, _arg_4 = tracex_event.raw_args
+
+        if event_id == mutex_get_id:
+            # obj_id, wait_option, owner, ownership count
+            lock_stats = self._get_lock_stats(tracex_event, obj_id, 'mutex')
+            if arg_3 == thread_ptr:
+                # Nested get of a mutex that the thread already owns
+                return
+            self._get(lock_stats, thread_ptr, timestamp, arg_3 == 0, arg_2)
+        elif event_id == mutex_put_id:
+            # obj_id, owner, ownership count
+            lock_stats = self._get_lock_stats(tracex_event, obj_id, 'mutex')
+            if arg_3 > 1:
+                # Nested put, the thread still owns the mutex
+                return
+            self._put(lock_stats, thread_ptr, timestamp, True)
+        elif event_id == sem_get_id:
+            # obj_id, wait_option, count
+            lock_stats = self._get_lock_stats(tracex_event, obj_id, 'semaphore')
+            self._get(lock_stats, thread_ptr, timestamp, arg_3 > 0, arg_2)
+        else:
+            # obj_id, count, number of suspended threads
+            lock_stats = self._get_lock_stats(tracex_event, obj_id, 'semaphore')
+            self._put(lock_stats, thread_ptr, timestamp, arg_3 > 0)
+
+    def add_events(self, tracex_events: Iterable[TraceXEvent]):
+        add_event = self.add_event
+        for tracex_event in tracex_events:
+            add_event(tracex_event)
+
+    def get_top_contended(self, num_locks: Optional[int] = 10) -> List[LockStats]:
+        """
+        The locks that threads waited the longest for in total, then the ones that were waited for most often
+        """
+        contended_locks = [lock_stats for lock_stats in self.locks.values() if lock_stats.contended]
+        contended_locks.sort(key=lambda lock_stats: (lock_stats.wait.total, lock_stats.contended), reverse=True)
+        return contended_locks[:num_locks]
+
+
+def analyze_locks(filepath: TraceXSource, custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                  timer_counts_down: bool = False, on_hold: Optional[Callable[[LockHold], None]] = None) \
+        -> LockAnalyzer:
+    """
+    Stream the mutex and semaphore events of a TraceX file through a LockAnalyzer. Every other event is skipped
+    without being decoded.
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    :param on_hold: Called with every acquisition as soon as it's released
+    """
+    lock_analyzer = LockAnalyzer(on_hold)
+    lock_analyzer.add_events(iter_tracex_events(filepath, custom_events_map, unwrap_timestamps=True,
+                                                timer_counts_down=timer_counts_down,
+                                                event_filter=EventFilter(lock_event_ids)))
+    return lock_analyzer
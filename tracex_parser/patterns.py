@@ -0,0 +1,306 @@
+from typing import Optional, Dict, List, Iterable, Iterator, NamedTuple, Sequence, Set, Tuple, Union, Any
+
+from .events import TraceXEvent, EventDecoder, event_id_map
+from .file_parser import TraceXSource, iter_tracex_events
+
+
+class Var(NamedTuple):
+    """
+    Placeholder for an argument value. The first step that matches binds it to the event's (mapped) argument value,
+    every later step has to have the same value.
+    """
+    name: str
+
+
+class EventStep:
+    """
+    One event of a pattern: the event id or function name, and the values that its arguments must have.
+    Argument values are compared against both the mapped value (e.g. an object's name) and the raw value,
+    or are a Var.
+    """
+    __slots__ = ('event', 'args')
+
+    def __init__(self, event: Union[int, str], **args: Any):
+        self.event = event
+        self.args = args
+
+    def __repr__(self):
+        arg_strs = [f'{arg_name}={arg_val!r}' for arg_name, arg_val in self.args.items()]
+        return f'{self.__class__.__name__}({self.event!r}{"".join(", " + arg_str for arg_str in arg_strs)})'
+
+
+class EventPattern:
+    """
+    Named sequence of event steps, which have to be consecutive events unless separated by an ``...`` (Ellipsis),
+    which skips any number of events up to the first one that matches the next step.
+    e.g. ``EventPattern('lock', [EventStep('mtxGet', obj_id=Var('m')), ..., EventStep('mtxPut', obj_id=Var('m'))])``
+    """
+    def __init__(self, name: str, steps: Sequence[Union[EventStep, type(Ellipsis)]]):
+        self.name = name
+        self.steps = list(steps)
+        if not self.steps or self.steps[0] is Ellipsis or self.steps[-1] is Ellipsis:
+            raise ValueError(f'Pattern {name} has to start and end with an event step')
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.name!r}, {self.steps})'
+
+
+class PatternMatch(NamedTuple):
+    pattern_name: str
+    # Positions of the first and last matching events in the stream
+    start_idx: int
+    end_idx: int
+    # Var name -> bound value
+    bindings: Dict[str, Any]
+
+
+class _CompiledStep(NamedTuple):
+    event_id: int
+    # (arg name, index into the args, expected value or Var) of every argument that is checked
+    arg_checks: Tuple[Tuple[str, int, Any], ...]
+    # If other events can come before this step
+    after_gap: bool
+    # (arg name, index into the args, expected value or Var bound by an earlier step) of the argument that partial
+    # matches waiting for this step are looked up by
+    index_arg: Optional[Tuple[str, int, Any]]
+
+
+class _PartialMatch:
+    """
+    A pattern that has matched up to step_idx. Partial matches that started at different events but have reached the
+    same step with the same bindings will match the same events from then on, so they're kept as one partial match
+    with all of their start positions.
+    """
+    __slots__ = ('pattern_idx', 'step_idx', 'start_idxs', 'bindings', 'waiting_key')
+
+    def __init__(self, pattern_idx: int, step_idx: int, start_idxs: List[int], bindings: Dict[str, Any],
+                 waiting_key: Optional[tuple] = None):
+        self.pattern_idx = pattern_idx
+        # The step that has to match next
+        self.step_idx = step_idx
+        self.start_idxs = start_idxs
+        self.bindings = bindings
+        # Key in PatternMatcher._waiting_keys, if it's waiting behind a gap
+        self.waiting_key = waiting_key
+
+
+class PatternMatcher:
+    """
+    Matches any number of event patterns at once, in a single pass over the events.
+    The patterns are compiled into a table of event id -> patterns starting with it. Partial matches are kept by the
+    event id they need next (and the argument value it needs), so each event is only checked against the partial matches
+    that it could continue, and partial matches that needed consecutive events are dropped as soon as they don't
+    match.
+    Matches can overlap, every event that starts a pattern starts its own match. Partial matches waiting behind a gap
+    for the same step with the same bindings are merged, so starts that never end don't make later events slower.
+    """
+    def __init__(self, patterns: Sequence[EventPattern], custom_events_map: Optional[Dict[int, TraceXEvent]] = None):
+        """
+        :param custom_events_map: Custom events that steps refer to by function name or argument name
+        """
+        self.patterns = list(patterns)
+        event_decoder = EventDecoder(custom_events_map)
+        fn_name_ids = {event_class.fn_name: event_id
+                       for events_map in [event_id_map, event_decoder.custom_events_map]
+                       for event_id, event_class in events_map.items()}
+
+        self._compiled_patterns: List[List[_CompiledStep]] = []
+        # Event id -> indexes of the patterns that start with it
+        self._starts: Dict[int, List[int]] = {}
+        for pattern_idx, pattern in enumerate(self.patterns):
+            compiled_steps = []
+            after_gap = False
+            bound_vars = set()
+            for step in pattern.steps:
+                if step is Ellipsis:
+                    after_gap = True
+                    continue
+                compiled_steps.append(self._compile_step(pattern, step, after_gap, bound_vars, fn_name_ids,
+                                                         event_decoder))
+                bound_vars.update(arg_val.name for arg_val in step.args.values() if isinstance(arg_val, Var))
+                after_gap = False
+            self._compiled_patterns.append(compiled_steps)
+            self._starts.setdefault(compiled_steps[0].event_id, []).append(pattern_idx)
+        self.reset()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({len(self.patterns)} patterns)'
+
+    @staticmethod
+    def _compile_step(pattern: EventPattern, step: EventStep, after_gap: bool, bound_vars: Set[str],
+                      fn_name_ids: Dict[str, int], event_decoder: EventDecoder) -> _CompiledStep:
+        if isinstance(step.event, str):
+            if step.event not in fn_name_ids:
+                raise ValueError(f'Pattern {pattern.name} has an unknown event {step.event}')
+            event_id = fn_name_ids[step.event]
+        else:
+            event_id = step.event
+        event_class = event_decoder.get_event_class(event_id)
+        arg_checks = []
+        index_arg = None
+        for arg_name, arg_val in step.args.items():
+            if arg_name not in event_class.arg_map:
+                raise ValueError(f'Pattern {pattern.name}: {event_class.fn_name or event_id} has no argument '
+                                 f'{arg_name}, only {event_class.arg_map}')
+            arg_checks.append((arg_name, event_class.arg_map.index(arg_name), arg_val))
+            if index_arg is None and (not isinstance(arg_val, Var) or arg_val.name in bound_vars):
+                index_arg = arg_checks[-1]
+        return _CompiledStep(event_id, tuple(arg_checks), after_gap, index_arg)
+
+    def reset(self):
+        """
+        Forget all partial matches, and start counting event positions from 0 again
+        """
+        self._event_idx = 0
+        # Partial matches that can skip events, by the event id that they need next
+        self._waiting: Dict[int, List[_PartialMatch]] = {}
+        # The same for partial matches whose next step needs an argument value (a constant or an already bound Var),
+        # so that e.g. a mtxPut is only checked against the partial matches of its own mutex:
+        # event id -> (arg name, arg index) -> value -> partial matches
+        self._waiting_by_value: Dict[int, Dict[Tuple[str, int], Dict[Any, List[_PartialMatch]]]] = {}
+        # Partial matches that need the very next event
+        self._consecutive: List[_PartialMatch] = []
+        # (pattern index, step index, bindings) -> the partial match waiting for that step with those bindings
+        self._waiting_keys: Dict[tuple, _PartialMatch] = {}
+
+    @staticmethod
+    def _match_step(step: _CompiledStep, tracex_event: TraceXEvent, bindings: Dict[str, Any]) \
+            -> Optional[Dict[str, Any]]:
+        """
+        :return: The bindings after the event matched the step, None if it doesn't match
+        """
+        if tracex_event.id != step.event_id:
+            return None
+        if not step.arg_checks:
+            return bindings
+        raw_args = tracex_event.raw_args
+        mapped_args = tracex_event.mapped_args
+        for arg_name, arg_idx, arg_val in step.arg_checks:
+            if isinstance(arg_val, Var):
+                mapped_val = mapped_args[arg_name]
+                if arg_val.name not in bindings:
+                    bindings = dict(bindings)
+                    bindings[arg_val.name] = mapped_val
+                elif bindings[arg_val.name] != mapped_val:
+                    return None
+            # Raw values first, mapping the args needs the object registry
+            elif arg_val != raw_args[arg_idx] and arg_val != mapped_args[arg_name]:
+                return None
+        return bindings
+
+    def _advance_waiting(self, waiting: List[_PartialMatch], tracex_event: TraceXEvent,
+                         advanced: List[Tuple[_PartialMatch, Dict[str, Any]]]) -> List[_PartialMatch]:
+        """
+        Add the partial matches that the event continues to advanced
+        :return: The partial matches that are still waiting
+        """
+        still_waiting = []
+        for partial_match in waiting:
+            step = self._compiled_patterns[partial_match.pattern_idx][partial_match.step_idx]
+            bindings = self._match_step(step, tracex_event, partial_match.bindings)
+            if bindings is not None:
+                del self._waiting_keys[partial_match.waiting_key]
+                advanced.append((partial_match, bindings))
+            else:
+                still_waiting.append(partial_match)
+        return still_waiting
+
+    def feed(self, tracex_event: TraceXEvent) -> List[PatternMatch]:
+        """
+        Match the next event of the stream
+        :return: Every pattern match that ends at this event
+        """
+        event_idx = self._event_idx
+        self._event_idx = event_idx + 1
+        event_id = tracex_event.id
+        if not self._consecutive and event_id not in self._starts and event_id not in self._waiting and \
+                event_id not in self._waiting_by_value:
+            # Most events don't have anything to do with the patterns
+            return []
+        # (partial match, bindings) of every partial match that this event continues
+        advanced = []
+
+        consecutive, self._consecutive = self._consecutive, []
+        for partial_match in consecutive:
+            step = self._compiled_patterns[partial_match.pattern_idx][partial_match.step_idx]
+            bindings = self._match_step(step, tracex_event, partial_match.bindings)
+            if bindings is not None:
+                advanced.append((partial_match, bindings))
+
+        waiting = self._waiting.get(event_id)
+        if waiting:
+            self._waiting[event_id] = self._advance_waiting(waiting, tracex_event, advanced)
+        waiting_by_arg = self._waiting_by_value.get(event_id)
+        if waiting_by_arg:
+            raw_args = tracex_event.raw_args
+            for (arg_name, arg_idx), waiting_by_value in waiting_by_arg.items():
+                # Values can be given as the raw or the mapped value
+                mapped_val = tracex_event.mapped_args[arg_name]
+                for arg_val in {mapped_val, raw_args[arg_idx]}:
+                    waiting = waiting_by_value.get(arg_val)
+                    if waiting:
+                        still_waiting = self._advance_waiting(waiting, tracex_event, advanced)
+                        if still_waiting:
+                            waiting_by_value[arg_val] = still_waiting
+                        else:
+                            del waiting_by_value[arg_val]
+
+        for pattern_idx in self._starts.get(event_id, ()):
+            bindings = self._match_step(self._compiled_patterns[pattern_idx][0], tracex_event, {})
+            if bindings is not None:
+                advanced.append((_PartialMatch(pattern_idx, 0, [event_idx], {}), bindings))
+
+        pattern_matches = []
+        for partial_match, bindings in advanced:
+            pattern_idx = partial_match.pattern_idx
+            compiled_steps = self._compiled_patterns[pattern_idx]
+            next_step_idx = partial_match.step_idx + 1
+            if next_step_idx == len(compiled_steps):
+                pattern_name = self.patterns[pattern_idx].name
+                pattern_matches.extend(PatternMatch(pattern_name, start_idx, event_idx, bindings)
+                                       for start_idx in sorted(partial_match.start_idxs))
+                continue
+            next_step = compiled_steps[next_step_idx]
+            if not next_step.after_gap:
+                self._consecutive.append(_PartialMatch(pattern_idx, next_step_idx, partial_match.start_idxs, bindings))
+                continue
+
+            waiting_key = (pattern_idx, next_step_idx, tuple(bindings.items()))
+            waiting_match = self._waiting_keys.get(waiting_key)
+            if waiting_match is not None:
+                waiting_match.start_idxs.extend(partial_match.start_idxs)
+                continue
+            next_partial_match = _PartialMatch(pattern_idx, next_step_idx, list(partial_match.start_idxs), bindings,
+                                               waiting_key)
+            self._waiting_keys[waiting_key] = next_partial_match
+            if next_step.index_arg is not None:
+                arg_name, arg_idx, arg_val = next_step.index_arg
+                waiting_by_arg = self._waiting_by_value.setdefault(next_step.event_id, {})
+                waiting_by_value = waiting_by_arg.setdefault((arg_name, arg_idx), {})
+                if isinstance(arg_val, Var):
+                    arg_val = bindings[arg_val.name]
+                waiting_by_value.setdefault(arg_val, []).append(next_partial_match)
+            else:
+                self._waiting.setdefault(next_step.event_id, []).append(next_partial_match)
+        return pattern_matches
+
+    def match(self, tracex_events: Iterable[TraceXEvent]) -> Iterator[PatternMatch]:
+        """
+        Match a stream of events, yielding each pattern match as soon as its last event is seen
+        """
+        feed = self.feed
+        for tracex_event in tracex_events:
+            yield from feed(tracex_event)
+
+
+def match_patterns(filepath: TraceXSource, patterns: Sequence[EventPattern],
+                   custom_events_map: Optional[Dict[int, TraceXEvent]] = None) -> Iterator[PatternMatch]:
+    """
+    Stream the events of a TraceX file through a PatternMatcher. The match positions are positions in the buffer.
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param patterns: Patterns to match
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    """
+    pattern_matcher = PatternMatcher(patterns, custom_events_map)
+    return pattern_matcher.match(iter_tracex_events(filepath, custom_events_map))
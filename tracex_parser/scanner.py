@@ -0,0 +1,155 @@
+import struct
+from typing import Optional, Dict, List, Tuple, Union, Iterator, NamedTuple, Sequence
+
+from .helpers import TraceXParseException
+from .events import TraceXEvent, ObjectRegistry
+from .file_parser import TraceXSource, open_tracex_buffer, get_endian_str, get_control_header, get_object_registry, \
+    _get_event_entry_struct, _get_event_entry_range, parse_tracex_buffer
+
+# How the TraceX control header starts, for either endianness
+tracex_magics = [b'TXTB', b'BTXT']
+
+
+class MemorySegment(NamedTuple):
+    """
+    A range of target memory that is in the dump, e.g. a PT_LOAD program header of a core file
+    """
+    file_offset: int
+    address: int
+    size: int
+
+
+class TraceXBufferLocation(NamedTuple):
+    # Where in the dump the control header is
+    offset: int
+    endian_str: str
+    # Target address of the control header
+    trace_base_address: int
+    # From the start of the control header to the end of the event entries
+    size: int
+    num_objects: int
+    num_entries: int
+
+
+def iter_magic_offsets(dump_buf: bytes, start_idx: int = 0) -> Iterator[int]:
+    """
+    Finds every possible TraceX control header in the dump, in order, by searching for both magic numbers.
+    The search is done by mmap/bytes find(), so nothing is copied out of the dump.
+    """
+    if isinstance(dump_buf, memoryview):
+        # Memoryviews can't be searched, this is the only case where the dump is copied
+        dump_buf = dump_buf.tobytes()
+    next_offsets = {magic: dump_buf.find(magic, start_idx) for magic in tracex_magics}
+    while True:
+        found_offsets = [(offset, magic) for magic, offset in next_offsets.items() if offset != -1]
+        if not found_offsets:
+            return
+        offset, magic = min(found_offsets)
+        yield offset
+        next_offsets[magic] = dump_buf.find(magic, offset + 1)
+
+
+def _get_segment_address(address_map: Sequence[MemorySegment], offset: int) -> Optional[int]:
+    for segment in address_map:
+        if segment.file_offset <= offset < segment.file_offset + segment.size:
+            return segment.address + offset - segment.file_offset
+    return None
+
+
+def check_tracex_header(dump_buf: bytes, offset: int,
+                        address_map: Union[int, Sequence[MemorySegment], None] = None) -> TraceXBufferLocation:
+    """
+    Checks that there is a consistent TraceX buffer at this offset of the dump. ThreadX lays the buffer out as the
+    control header, then the object registry, then the event entries, which all have to fit in the dump.
+    :param address_map: Target address of the start of the dump, or the memory segments in the dump. If given,
+    the control header's trace_base_address has to be the target address of the offset.
+    :raises TraceXParseException: If it isn't a valid buffer
+    """
+    endian_str, header_id_end_idx = get_endian_str(dump_buf, offset)
+    try:
+        control_header, control_header_end_idx = get_control_header(endian_str, dump_buf, header_id_end_idx)
+    except struct.error:
+        raise TraceXParseException(f'Buffer is too small to contain a TraceX control header at {hex(offset)}')
+    base_address = control_header['trace_base_address']
+
+    if address_map is not None:
+        if isinstance(address_map, int):
+            address_map = [MemorySegment(0, address_map, len(dump_buf))]
+        offset_address = _get_segment_address(address_map, offset)
+        if offset_address != base_address:
+            raise TraceXParseException(f'Control header at {hex(offset)} says that it is at {hex(base_address)} in '
+                                       f'the target, which is not at that offset of the dump')
+
+    expected_layout = [
+        ('obj_reg_start_pointer', base_address + control_header_end_idx - offset),
+        ('buf_start_ptr', control_header['obj_reg_end_pointer']),
+    ]
+    for field_name, expected_ptr in expected_layout:
+        if control_header[field_name] != expected_ptr:
+            raise TraceXParseException(f'Control header at {hex(offset)} has {field_name} '
+                                       f'{hex(control_header[field_name])}, expected {hex(expected_ptr)}')
+    layout_ptr_names = ['obj_reg_start_pointer', 'obj_reg_end_pointer', 'buf_cur_ptr', 'buf_end_ptr']
+    for start_ptr_name, end_ptr_name in zip(layout_ptr_names, layout_ptr_names[1:]):
+        if control_header[end_ptr_name] < control_header[start_ptr_name]:
+            raise TraceXParseException(f'Control header at {hex(offset)} has {end_ptr_name} '
+                                       f'{hex(control_header[end_ptr_name])} before {start_ptr_name} '
+                                       f'{hex(control_header[start_ptr_name])}')
+    if control_header['obj_reg_name_size'] == 0:
+        raise TraceXParseException(f'Control header at {hex(offset)} has an object name size of 0')
+    buffer_size = control_header['buf_end_ptr'] - base_address
+    if buffer_size < 0 or offset + buffer_size > len(dump_buf):
+        raise TraceXParseException(f'Buffer at {hex(offset)} of {buffer_size} bytes does not fit in the dump')
+
+    # The same checks as parsing the buffer
+    try:
+        obj_reg_map, obj_reg_end_idx = get_object_registry(endian_str, dump_buf, control_header_end_idx,
+                                                           control_header)
+        num_entries, _oldest_event_idx = _get_event_entry_range(control_header,
+                                                                _get_event_entry_struct(endian_str).total_size())
+    except struct.error as e:
+        raise TraceXParseException(f'Buffer at {hex(offset)} is cut off: {e}') from e
+    return TraceXBufferLocation(offset, endian_str, base_address, buffer_size, len(obj_reg_map), num_entries)
+
+
+def scan_tracex_buffers(dump_buf: bytes, address_map: Union[int, Sequence[MemorySegment], None] = None) \
+        -> List[TraceXBufferLocation]:
+    """
+    Finds every valid TraceX buffer in a RAM dump or core file, see check_tracex_header()
+    """
+    buffer_locations = []
+    next_offset = 0
+    for offset in iter_magic_offsets(dump_buf):
+        if offset < next_offset:
+            # Inside of the previous buffer, e.g. an object name that happens to start with the magic
+            continue
+        try:
+            buffer_location = check_tracex_header(dump_buf, offset, address_map)
+        except TraceXParseException:
+            continue
+        buffer_locations.append(buffer_location)
+        next_offset = offset + buffer_location.size
+    return buffer_locations
+
+
+def parse_tracex_dump(filepath: TraceXSource, custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                      obj_name_decoding: str = 'ascii', address_map: Union[int, Sequence[MemorySegment], None] = None) \
+        -> List[Tuple[TraceXBufferLocation, List[TraceXEvent], ObjectRegistry]]:
+    """
+    Parse every TraceX buffer in a RAM dump or core file. The dump is memory mapped and each buffer is parsed in place.
+    :param filepath: Path to the dump, or a bytes-like object holding it
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    :param obj_name_decoding: How to decode object registry names: 'ascii', 'latin-1' or 'replace'
+    :param address_map: Target address of the start of the dump, or the memory segments in the dump, used to reject
+    anything that isn't at the address it says it is at
+    :return: Where each buffer is, and its events and object registry
+    """
+    tracex_buffers = []
+    with open_tracex_buffer(filepath) as dump_buf:
+        with memoryview(dump_buf) as dump_view:
+            for buffer_location in scan_tracex_buffers(dump_buf, address_map):
+                with dump_view[buffer_location.offset:buffer_location.offset + buffer_location.size] as tracex_view:
+                    tracex_events, obj_reg_map = parse_tracex_buffer(tracex_view, custom_events_map,
+                                                                     obj_name_decoding)
+                tracex_buffers.append((buffer_location, tracex_events, obj_reg_map))
+    return tracex_buffers
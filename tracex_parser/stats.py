@@ -0,0 +1,125 @@
+from array import array
+from collections import Counter
+from itertools import compress
+from typing import Optional, Dict, NamedTuple, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .helpers import CStruct, ParseDiagnostics
+from .events import TraceXEvent, EventDecoder, TimestampUnwrapper
+from .file_parser import TraceXSource, open_tracex_buffer, _get_tracex_header, _get_event_entry_struct, \
+    _get_event_entry_range, _unpack_event_range
+
+
+class TraceXStats(NamedTuple):
+    """
+    Totals of a TraceX buffer, counted straight from the raw event entries without creating any events
+    """
+    total_events: int
+    obj_reg_size: int
+    # Event id -> number of events
+    event_id_counts: Dict[int, int]
+    # Timestamps of the oldest and newest events (unwrapped if requested), None if there are no events
+    first_timestamp: Optional[int]
+    last_timestamp: Optional[int]
+    control_header: CStruct
+    diagnostics: ParseDiagnostics
+
+    @property
+    def delta_ticks(self) -> int:
+        if self.first_timestamp is None:
+            return 0
+        return self.last_timestamp - self.first_timestamp
+
+
+def _count_event_ids(entries_values: array) -> Dict[int, int]:
+    event_ids = entries_values[2::8]
+    if np is not None and len(event_ids):
+        event_ids = np.frombuffer(event_ids, dtype=np.uint32)
+        if int(event_ids.max()) < EventDecoder.table_size:
+            id_counts = np.bincount(event_ids)
+            present_ids = np.flatnonzero(id_counts)
+        else:
+            # Custom event ids can be anything, don't make a count for every possible id
+            present_ids, id_counts = np.unique(event_ids, return_counts=True)
+            id_counts = dict(zip(present_ids.tolist(), id_counts.tolist()))
+        event_id_counts = {event_id: int(id_counts[event_id]) for event_id in present_ids.tolist()}
+    else:
+        event_id_counts = dict(Counter(event_ids))
+    # Empty entries
+    event_id_counts.pop(0, None)
+    return event_id_counts
+
+
+def _get_first_last_timestamps(entries_values: array, timer_valid_mask: int, unwrap_timestamps: bool,
+                               timer_counts_down: bool) -> Tuple[Optional[int], Optional[int]]:
+    if np is not None:
+        entries = np.frombuffer(entries_values, dtype=np.uint32).reshape(-1, 8)
+        # Only the timestamps of the non-empty entries
+        time_stamps = entries[entries[:, 2] != 0, 3] & np.uint32(timer_valid_mask)
+        if len(time_stamps) == 0:
+            return None, None
+        if unwrap_timestamps:
+            from .table import get_unwrapped_timestamps
+            time_stamps = get_unwrapped_timestamps(time_stamps, timer_valid_mask, timer_counts_down)
+        return int(time_stamps[0]), int(time_stamps[-1])
+
+    time_stamps = [time_stamp & timer_valid_mask
+                   for time_stamp in compress(entries_values[3::8], entries_values[2::8])]
+    if not time_stamps:
+        return None, None
+    if not unwrap_timestamps:
+        return time_stamps[0], time_stamps[-1]
+    unwrap = TimestampUnwrapper(timer_valid_mask, timer_counts_down).unwrap
+    time_stamps64 = [unwrap(time_stamp) for time_stamp in time_stamps]
+    return time_stamps64[0], time_stamps64[-1]
+
+
+def get_tracex_stats(filepath: TraceXSource, obj_name_decoding: str = 'ascii', unwrap_timestamps: bool = False,
+                     timer_counts_down: bool = False) -> TraceXStats:
+    """
+    Count the events of a TraceX binary dump (canonically .trx) without parsing them into TraceXEvents.
+    The event region is copied out in one go, then the ids are counted with NumPy's bincount if it's installed,
+    otherwise with a Counter.
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param obj_name_decoding: How to decode object registry names: 'ascii', 'latin-1' or 'replace'
+    :param unwrap_timestamps: Count the ticks between the first and last events through timer wraps
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    """
+    with open_tracex_buffer(filepath) as tracex_buf:
+        endian_str, control_header, obj_reg_map, obj_reg_end_idx = _get_tracex_header(tracex_buf, obj_name_decoding)
+        event_size = _get_event_entry_struct(endian_str).total_size()
+        num_entries, oldest_event_idx = _get_event_entry_range(control_header, event_size)
+        entries_values = _unpack_event_range(endian_str, tracex_buf, obj_reg_end_idx, num_entries, oldest_event_idx,
+                                             0, num_entries, keep_empty=True)
+
+    event_id_counts = _count_event_ids(entries_values)
+    first_timestamp, last_timestamp = _get_first_last_timestamps(entries_values, control_header['timer_valid_mask'],
+                                                                 unwrap_timestamps, timer_counts_down)
+    return TraceXStats(
+        total_events=sum(event_id_counts.values()),
+        obj_reg_size=len(obj_reg_map.keys()),
+        event_id_counts=event_id_counts,
+        first_timestamp=first_timestamp,
+        last_timestamp=last_timestamp,
+        control_header=control_header,
+        diagnostics=obj_reg_map.diagnostics,
+    )
+
+
+def get_events_histogram(event_id_counts: Dict[int, int],
+                         custom_events_map: Optional[Dict[int, TraceXEvent]] = None) -> Dict[str, int]:
+    """
+    Event id counts keyed by the event's name instead (or the id as a string for unknown events),
+    the same as parse-trx's histogram
+    """
+    event_decoder = EventDecoder(custom_events_map)
+    events_histogram = {}
+    for event_id, count in event_id_counts.items():
+        fn_name = event_decoder.get_event_class(event_id).fn_name
+        event_name = fn_name if fn_name else str(event_id)
+        events_histogram[event_name] = events_histogram.get(event_name, 0) + count
+    return events_histogram
@@ -0,0 +1,130 @@
+from typing import Optional, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .helpers import CStruct
+from .events import ObjectRegistry, special_thread_names
+from .file_parser import TraceXSource, open_tracex_buffer, _get_tracex_header, _get_event_entry_range
+
+# Columns of a raw event entry, in the order they are in the buffer
+event_entry_fields = [
+    'thread_ptr',
+    'thread_priority',
+    'event_id',
+    'time_stamp',
+    'info_field_1',
+    'info_field_2',
+    'info_field_3',
+    'info_field_4',
+]
+
+
+def _event_entry_dtype(endian_str: str) -> 'np.dtype':
+    return np.dtype([(field_name, f'{endian_str}u4') for field_name in event_entry_fields])
+
+
+def get_unwrapped_timestamps(time_stamps: 'np.ndarray', timer_valid_mask: int, counts_down: bool = False) \
+        -> 'np.ndarray':
+    """
+    Vectorized events.TimestampUnwrapper: timestamps that keep counting up when the timer wraps
+    :param time_stamps: Masked timestamps in buffer order
+    :return: uint64 timestamps
+    """
+    time_stamps64 = time_stamps.astype(np.uint64)
+    if counts_down:
+        time_stamps64 = np.uint64(timer_valid_mask) - time_stamps64
+    if len(time_stamps64) > 1:
+        # Every time the timestamp goes backwards the timer has wrapped
+        num_wraps = np.cumsum(time_stamps64[1:] < time_stamps64[:-1], dtype=np.uint64)
+        time_stamps64[1:] += num_wraps * np.uint64(timer_valid_mask + 1)
+    return time_stamps64
+
+
+def ticks_to_ns(time_stamps64: 'np.ndarray', tick_hz: int) -> 'np.ndarray':
+    """
+    Vectorized TraceXEvent.time_ns, split into whole seconds and the remainder so that it doesn't overflow
+    """
+    tick_hz = np.uint64(tick_hz)
+    ns_per_s = np.uint64(1_000_000_000)
+    return time_stamps64 // tick_hz * ns_per_s + time_stamps64 % tick_hz * ns_per_s // tick_hz
+
+
+class EventTable:
+    """
+    Columnar representation of a TraceX buffer.
+    All events are held in a single NumPy structured array with the raw event entry fields,
+    plus a ``thread_name`` column holding an index into ``thread_names``.
+    Unwrapped timestamps and times in nanoseconds are added as ``time_stamp64`` and ``time_ns`` columns if requested.
+    """
+    def __init__(self, events: 'np.ndarray', thread_names: List[Optional[str]],
+                 obj_reg_map: ObjectRegistry, control_header: CStruct):
+        self.events = events
+        self.thread_names = thread_names
+        self.obj_reg_map = obj_reg_map
+        self.control_header = control_header
+
+    def __len__(self):
+        return len(self.events)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({len(self)} events, {len(self.thread_names)} threads)'
+
+    def thread_name_of(self, thread_name_code: int) -> Optional[str]:
+        return self.thread_names[thread_name_code]
+
+
+def parse_tracex_table(filepath: TraceXSource, obj_name_decoding: str = 'ascii', unwrap_timestamps: bool = False,
+                       tick_hz: Optional[int] = None, timer_counts_down: bool = False) -> EventTable:
+    """
+    Parse a TraceX binary dump (canonically .trx) into a columnar EventTable. Requires NumPy.
+    The whole event region is decoded at once, the timer valid mask, empty entry filtering and
+    buffer rotation are all vectorized.
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param obj_name_decoding: How to decode object registry names: 'ascii', 'latin-1' or 'replace'
+    :param unwrap_timestamps: Add a ``time_stamp64`` column, which keeps counting up when the timer wraps
+    :param tick_hz: Frequency of the timer in Hz, adds a ``time_ns`` column (from ``time_stamp64``)
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    :return: EventTable with events sorted by their place in the buffer
+    """
+    if np is None:
+        raise ImportError('parse_tracex_table() requires numpy to be installed')
+
+    with open_tracex_buffer(filepath) as tracex_buf:
+        endian_str, control_header, obj_reg_map, obj_reg_end_idx = _get_tracex_header(tracex_buf, obj_name_decoding)
+
+        raw_dtype = _event_entry_dtype(endian_str)
+        num_entries, oldest_event_idx = _get_event_entry_range(control_header, raw_dtype.itemsize)
+        raw_entries = np.frombuffer(tracex_buf, dtype=raw_dtype, count=num_entries, offset=obj_reg_end_idx)
+        # Events are ordered in the way they were placed in the buffer, oldest first
+        rotated_entries = np.concatenate((raw_entries[oldest_event_idx:], raw_entries[:oldest_event_idx]))
+        # Don't hold on to the view of tracex_buf, so that it can be unmapped
+        del raw_entries
+
+    valid_entries = rotated_entries[rotated_entries['event_id'] != 0]
+    time_fields = [('time_stamp64', '=u8')] if unwrap_timestamps or tick_hz is not None else []
+    if tick_hz is not None:
+        time_fields.append(('time_ns', '=u8'))
+    table_dtype = np.dtype([(field_name, '=u4') for field_name in event_entry_fields] + [('thread_name', '=i4')] +
+                           time_fields)
+    events = np.empty(len(valid_entries), dtype=table_dtype)
+    for field_name in event_entry_fields:
+        events[field_name] = valid_entries[field_name]
+    events['time_stamp'] &= control_header['timer_valid_mask']
+    if time_fields:
+        if unwrap_timestamps:
+            events['time_stamp64'] = get_unwrapped_timestamps(events['time_stamp'], control_header['timer_valid_mask'],
+                                                              timer_counts_down)
+        else:
+            events['time_stamp64'] = events['time_stamp']
+    if tick_hz is not None:
+        events['time_ns'] = ticks_to_ns(events['time_stamp64'], tick_hz)
+
+    thread_ptrs, thread_name_codes = np.unique(events['thread_ptr'], return_inverse=True)
+    events['thread_name'] = thread_name_codes.reshape(-1)
+    thread_names = [special_thread_names.get(int(thread_ptr), obj_reg_map.names.names.get(int(thread_ptr)))
+                    for thread_ptr in thread_ptrs]
+
+    return EventTable(events, thread_names, obj_reg_map, control_header)
@@ -0,0 +1,217 @@
+from typing import Optional, Dict, List, Iterable, NamedTuple, Callable
+
+from .events import TraceXEvent, special_thread_names
+from .file_parser import TraceXSource, iter_tracex_events
+
+# Context pointers, the same as the thread pointers of the events logged from them
+interrupt_ptr = 0xFFFFFFFF
+# No thread is ready, ThreadX is waiting for an interrupt
+idle_ptr = 0
+
+isr_enter_id = 3
+isr_exit_id = 4
+# Scheduling event id -> index of the arg holding the thread that runs next (0 for idle)
+next_thread_arg_idxs = {
+    1: 3,  # threadResume
+    2: 3,  # threadSuspend
+    5: 0,  # timeSlice
+    109: 1,  # threadRelinquish
+}
+thread_resume_id = 1
+
+
+class TimelineInterval(NamedTuple):
+    """
+    Stretch of time that one context was running for, in unwrapped ticks
+    """
+    # Thread pointer, interrupt_ptr for ISRs or idle_ptr when nothing was running
+    thread_ptr: int
+    start: int
+    end: int
+    # Only for ISRs, isr_num of the outermost ISR
+    isr_num: Optional[int] = None
+
+    @property
+    def ticks(self) -> int:
+        return self.end - self.start
+
+
+class ThreadCpuUsage(NamedTuple):
+    thread_ptr: int
+    thread_name: Optional[str]
+    run_ticks: int
+    cpu_percent: float
+    # Number of times the thread was switched to, returning to it after an ISR doesn't count
+    switches_in: int
+
+
+class ThreadTimeline:
+    """
+    Reconstructs which thread was running over time from a stream of events, in a single pass.
+    Events have to be given in buffer order and with unwrapped timestamps (unwrap_timestamps=True).
+
+    Time is attributed to the context running after each event: a thread, an ISR (nested ISRs count once) or idle.
+    What runs next is taken from the next_thread args of the scheduling events (threadSuspend, timeSlice,
+    threadRelinquish, and threadResume if it's set), and from the thread pointer of every event, which shows what was
+    actually running. Time before anything is known about the running context, at the start of the buffer, is
+    counted as ``unknown_ticks``.
+    """
+    def __init__(self, on_interval: Optional[Callable[[TimelineInterval], None]] = None, keep_intervals: bool = False):
+        """
+        :param on_interval: Called with every interval as soon as it ends
+        :param keep_intervals: Also keep every interval in ``intervals``, which grows with the trace
+        """
+        self.on_interval = on_interval
+        self.intervals: Optional[List[TimelineInterval]] = [] if keep_intervals else None
+        self.first_timestamp: Optional[int] = None
+        self.last_timestamp: Optional[int] = None
+        self.thread_ticks: Dict[int, int] = {}
+        self.switches_in: Dict[int, int] = {}
+        self.thread_names: Dict[int, Optional[str]] = {}
+        self.idle_ticks = 0
+        self.isr_ticks = 0
+        self.unknown_ticks = 0
+        self.context_switches = 0
+        self.isr_count = 0
+        self.isr_depth = 0
+        # What is running right now (None if unknown), and since when
+        self._running: Optional[int] = None
+        self._running_since: Optional[int] = None
+        self._isr_num: Optional[int] = None
+        # Thread that runs once there are no ISRs running
+        self._next_thread: Optional[int] = None
+        # Last thread (or idle) that ran outside of an ISR
+        self._last_thread: Optional[int] = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({len(self.thread_ticks)} threads, {self.context_switches} context switches)'
+
+    @property
+    def total_ticks(self) -> int:
+        if self.first_timestamp is None:
+            return 0
+        return self.last_timestamp - self.first_timestamp
+
+    def _switch_to(self, context_ptr: Optional[int], timestamp: int, isr_num: Optional[int] = None):
+        running = self._running
+        if context_ptr == running and context_ptr != interrupt_ptr:
+            return
+
+        ticks = timestamp - self._running_since
+        if running is None:
+            self.unknown_ticks += ticks
+        else:
+            if running == idle_ptr:
+                self.idle_ticks += ticks
+            elif running == interrupt_ptr:
+                self.isr_ticks += ticks
+            else:
+                self.thread_ticks[running] = self.thread_ticks.get(running, 0) + ticks
+            if self.intervals is not None or self.on_interval is not None:
+                interval = TimelineInterval(running, self._running_since, timestamp, self._isr_num)
+                if self.intervals is not None:
+                    self.intervals.append(interval)
+                if self.on_interval is not None:
+                    self.on_interval(interval)
+
+        if context_ptr == interrupt_ptr:
+            self.isr_count += 1
+        elif context_ptr is not None:
+            if context_ptr != idle_ptr and self._last_thread is not None and context_ptr != self._last_thread:
+                self.context_switches += 1
+                self.switches_in[context_ptr] = self.switches_in.get(context_ptr, 0) + 1
+            self._last_thread = context_ptr
+        self._running = context_ptr
+        self._running_since = timestamp
+        self._isr_num = isr_num
+
+    def add_event(self, tracex_event: TraceXEvent):
+        timestamp = tracex_event.timestamp64
+        if self.first_timestamp is None:
+            self.first_timestamp = self._running_since = timestamp
+        self.last_timestamp = timestamp
+        event_id = tracex_event.id
+        thread_ptr = tracex_event.thread_ptr
+
+        if event_id == isr_enter_id:
+            if self.isr_depth == 0:
+                self._switch_to(interrupt_ptr, timestamp, tracex_event.raw_args[1])
+            self.isr_depth += 1
+            return
+        if event_id == isr_exit_id:
+            if self.isr_depth > 1:
+                self.isr_depth -= 1
+            else:
+                self.isr_depth = 0
+                self._switch_to(self._next_thread, timestamp)
+            return
+
+        if thread_ptr != interrupt_ptr and thread_ptr not in self.thread_names:
+            self.thread_names[thread_ptr] = tracex_event.thread_name
+
+        if thread_ptr == interrupt_ptr:
+            if self.isr_depth == 0:
+                # The isrEnter happened before the start of the buffer
+                self.isr_depth = 1
+                self._switch_to(interrupt_ptr, timestamp)
+        elif thread_ptr != self._running:
+            # Logged by a thread that wasn't known to be running, it must have been switched to.
+            # Also ends any ISR whose isrExit is missing.
+            self.isr_depth = 0
+            self._next_thread = thread_ptr
+            self._switch_to(thread_ptr, timestamp)
+
+        next_thread_arg_idx = next_thread_arg_idxs.get(event_id)
+        if next_thread_arg_idx is not None:
+            next_thread = tracex_event.raw_args[next_thread_arg_idx]
+            # ThreadX only fills threadResume's next_thread in if it preempts the running thread
+            if next_thread != idle_ptr or event_id != thread_resume_id:
+                self._next_thread = next_thread
+                if self.isr_depth == 0:
+                    self._switch_to(next_thread, timestamp)
+
+    def add_events(self, tracex_events: Iterable[TraceXEvent]):
+        add_event = self.add_event
+        for tracex_event in tracex_events:
+            add_event(tracex_event)
+
+    def finish(self):
+        """
+        End the interval that is still running at the last event
+        """
+        if self._running_since is not None:
+            self._switch_to(None, self.last_timestamp)
+
+    def get_cpu_usage(self) -> List[ThreadCpuUsage]:
+        """
+        Run time of every thread, busiest first. The percentages are of the time between the first and last events.
+        """
+        total_ticks = self.total_ticks
+        thread_usages = []
+        for thread_ptr, run_ticks in self.thread_ticks.items():
+            thread_name = special_thread_names.get(thread_ptr, self.thread_names.get(thread_ptr))
+            cpu_percent = 100 * run_ticks / total_ticks if total_ticks else 0.0
+            thread_usages.append(ThreadCpuUsage(thread_ptr, thread_name, run_ticks, cpu_percent,
+                                                self.switches_in.get(thread_ptr, 0)))
+        return sorted(thread_usages, key=lambda thread_usage: thread_usage.run_ticks, reverse=True)
+
+
+def analyze_thread_timeline(filepath: TraceXSource, custom_events_map: Optional[Dict[int, TraceXEvent]] = None,
+                            timer_counts_down: bool = False,
+                            on_interval: Optional[Callable[[TimelineInterval], None]] = None,
+                            keep_intervals: bool = False) -> ThreadTimeline:
+    """
+    Stream every event of a TraceX file through a ThreadTimeline, memory use doesn't grow with the trace
+    unless keep_intervals is set.
+    :param filepath: Path to where the TraceX file is, or a bytes-like object holding the dump
+    :param custom_events_map: Dictionary of {id: TraceXEvents} to map custom events (id >= 4096) into human-readable
+    events.
+    :param timer_counts_down: The timer counts down instead of up, for unwrapping
+    :param on_interval: Called with every interval as soon as it ends
+    :param keep_intervals: Keep every interval in the timeline's ``intervals``
+    """
+    timeline = ThreadTimeline(on_interval, keep_intervals)
+    timeline.add_events(iter_tracex_events(filepath, custom_events_map, unwrap_timestamps=True,
+                                           timer_counts_down=timer_counts_down))
+    timeline.finish()
+    return timeline
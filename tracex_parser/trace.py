@@ -0,0 +1,114 @@
+from bisect import bisect_left
+from typing import Optional, Dict, List, Iterable
+
+from .helpers import CStruct, ParseDiagnostics
+from .events import TraceXEvent, ObjectRegistry, TimestampUnwrapper
+
+
+class TraceXTrace(list):
+    """
+    List of TraceX events in buffer order, with indexes for finding events by time, thread and event id.
+    The indexes are built on first use and kept until the list is modified.
+    """
+    def __init__(self, events: Iterable[TraceXEvent] = (), obj_reg_map: Optional[ObjectRegistry] = None,
+                 control_header: Optional[CStruct] = None, timestamps_unwrapped: bool = False,
+                 timer_counts_down: bool = False):
+        """
+        :param timestamps_unwrapped: The events' timestamp64 is already unwrapped, otherwise it's done for the index
+        :param timer_counts_down: The timer counts down instead of up, for unwrapping
+        """
+        super().__init__(events)
+        self.obj_reg_map = obj_reg_map
+        self.control_header = control_header
+        self.timestamps_unwrapped = timestamps_unwrapped
+        self.timer_counts_down = timer_counts_down
+        self._clear_indexes()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({len(self)} events)'
+
+    @property
+    def diagnostics(self) -> Optional[ParseDiagnostics]:
+        return self.obj_reg_map.diagnostics if self.obj_reg_map is not None else None
+
+    def _clear_indexes(self):
+        self._timestamps64: Optional[List[int]] = None
+        self._thread_positions: Optional[Dict[int, List[int]]] = None
+        self._event_id_positions: Optional[Dict[int, List[int]]] = None
+
+    def get_timestamps64(self) -> List[int]:
+        """
+        Unwrapped timestamp of every event, which always count up
+        """
+        if self._timestamps64 is None:
+            if self.timestamps_unwrapped:
+                self._timestamps64 = [tracex_event.timestamp64 for tracex_event in self]
+            else:
+                timer_valid_mask = self.control_header['timer_valid_mask'] if self.control_header else 0xFFFFFFFF
+                unwrap = TimestampUnwrapper(timer_valid_mask, self.timer_counts_down).unwrap
+                self._timestamps64 = [unwrap(tracex_event.timestamp) for tracex_event in self]
+        return self._timestamps64
+
+    def time_range_slice(self, start: Optional[int] = None, end: Optional[int] = None) -> slice:
+        """
+        Positions of the events from start up to (not including) end, in unwrapped ticks
+        """
+        timestamps64 = self.get_timestamps64()
+        start_pos = 0 if start is None else bisect_left(timestamps64, start)
+        end_pos = len(timestamps64) if end is None else bisect_left(timestamps64, end)
+        return slice(start_pos, max(start_pos, end_pos))
+
+    def time_range(self, start: Optional[int] = None, end: Optional[int] = None) -> List[TraceXEvent]:
+        """
+        Events from start up to (not including) end, in unwrapped ticks
+        """
+        return self[self.time_range_slice(start, end)]
+
+    def _get_positions_index(self, attr_name: str) -> Dict[int, List[int]]:
+        positions_index = {}
+        for event_pos, tracex_event in enumerate(self):
+            key = getattr(tracex_event, attr_name)
+            if key in positions_index:
+                positions_index[key].append(event_pos)
+            else:
+                positions_index[key] = [event_pos]
+        return positions_index
+
+    def by_thread(self, thread_ptr: int) -> List[int]:
+        """
+        Positions of the events of a thread (or interrupt/initialization)
+        """
+        if self._thread_positions is None:
+            self._thread_positions = self._get_positions_index('thread_ptr')
+        return self._thread_positions.get(thread_ptr, [])
+
+    def by_event_id(self, event_id: int) -> List[int]:
+        """
+        Positions of the events with this id
+        """
+        if self._event_id_positions is None:
+            self._event_id_positions = self._get_positions_index('id')
+        return self._event_id_positions.get(event_id, [])
+
+    def thread_ptrs(self) -> List[int]:
+        if self._thread_positions is None:
+            self._thread_positions = self._get_positions_index('thread_ptr')
+        return list(self._thread_positions.keys())
+
+    def events_at(self, positions: Iterable[int]) -> List[TraceXEvent]:
+        return [self[event_pos] for event_pos in positions]
+
+
+def _clearing_indexes(list_method):
+    def modify_list(self, *args, **kwargs):
+        self._clear_indexes()
+        return list_method(self, *args, **kwargs)
+    modify_list.__name__ = list_method.__name__
+    modify_list.__doc__ = list_method.__doc__
+    return modify_list
+
+
+# Any change to the list makes the indexes stale
+for _method_name in ['__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend', 'insert', 'pop',
+                     'remove', 'clear', 'sort', 'reverse']:
+    setattr(TraceXTrace, _method_name, _clearing_indexes(getattr(list, _method_name)))